@@ -0,0 +1,187 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+test_bezier
+-----------
+
+Tests for the viol cubic bezier utilities.
+
+:copyright: Copyright (c) 2021 Bit Harmony Ltd. All rights reserved. See AUTHORS.
+:license: PROPRIETARY, see LICENSE for details.
+"""
+
+import io
+import os
+import unittest
+from contextlib import redirect_stdout
+import numpy as np
+from svgpathtools import Path, Line, CubicBezier, QuadraticBezier
+from viol.lib.bezier import (bezier_fit_closed, path_bpoints, bezier_eval, bezier_split, bezier_area,
+                             bezier_length_bounds, BezierPath)
+from viol.lib.outline import outline_load
+from viol.cmds.scan import Body, Clothoid, path_compare
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', '..', 'data')
+
+
+class TestBezierMetrics(unittest.TestCase):
+
+    def setUp(self):
+        # a closed, counterclockwise, mix of segment types
+        self.path = Path(Line(0, 10), CubicBezier(10, 14 + 3j, 12 + 8j, 10 + 10j),
+                         QuadraticBezier(10 + 10j, 5 + 15j, 10j), Line(10j, 0))
+
+    def test_bpoints(self):
+        bpoints = path_bpoints(self.path)
+        self.assertEqual(bpoints.shape, (4, 4))
+        for seg, bp in zip(self.path, bpoints):
+            for t in (0.0, 0.3, 1.0):
+                self.assertAlmostEqual(seg.point(t), CubicBezier(*bp).point(t))
+
+    def test_area(self):
+        bpoints = path_bpoints(self.path)
+        self.assertAlmostEqual(bezier_area(bpoints), self.path.area())
+        self.assertAlmostEqual(bezier_area(bpoints[::-1, ::-1]), -self.path.area())
+
+    def test_length_bounds(self):
+        lower, upper = bezier_length_bounds(path_bpoints(self.path))
+        self.assertLessEqual(lower, self.path.length())
+        self.assertGreaterEqual(upper, self.path.length())
+
+    def test_split(self):
+        bpoints = path_bpoints(self.path)
+        pieces = bezier_split(bpoints, [1, 3, 2, 1])
+        self.assertEqual(pieces.shape, (7, 4))
+        # the pieces of the cubic trace it exactly, and join end to start
+        np.testing.assert_allclose(bezier_eval(pieces[1:4], [0.0, 0.5]).ravel(),
+                                   bezier_eval(bpoints[1:2], np.arange(6) / 6.0).ravel())
+        np.testing.assert_allclose(pieces[:-1, 3], pieces[1:, 0])
+        self.assertAlmostEqual(bezier_area(pieces), bezier_area(bpoints))
+
+
+class TestBezierFit(unittest.TestCase):
+
+    def test_circle(self):
+        pts = 100 * np.exp(2j * np.pi * np.arange(200) / 200)
+        path = bezier_fit_closed(pts, max_error=0.1)
+        self.assertTrue(path.isclosed())
+        self.assertLess(len(path), 20)
+        self.assertAlmostEqual(bezier_area(path_bpoints(path)), np.pi * 100 ** 2, delta=0.01 * np.pi * 100 ** 2)
+
+
+class TestBezierPath(unittest.TestCase):
+
+    def setUp(self):
+        # a closed, counterclockwise, mix of segment types
+        self.path = Path(Line(0, 10), CubicBezier(10, 14 + 3j, 12 + 8j, 10 + 10j),
+                         QuadraticBezier(10 + 10j, 5 + 15j, 10j), Line(10j, 0))
+        self.bpath = BezierPath.from_path(self.path)
+
+    def test_svgpathtools(self):
+        # the same T is the same point as for an svgpathtools Path, segment boundaries included
+        T = np.concatenate([np.linspace(0.0, 1.0, 101), [self.path.t2T(1, 0.0), self.path.t2T(2, 1.0)]])
+        np.testing.assert_allclose(self.bpath.point(T), [self.path.point(t) for t in T], atol=1e-9)
+        np.testing.assert_allclose(self.bpath.tangent(T[1:-3]), [self.path.unit_tangent(t) for t in T[1:-3]],
+                                   atol=1e-9)
+        self.assertAlmostEqual(self.bpath.length(), self.path.length())
+        self.assertEqual(self.bpath.t2T(2, 0.5), self.bpath.T[2] + 0.5 * (self.bpath.T[3] - self.bpath.T[2]))
+        self.assertIsInstance(self.bpath.point(0.5), complex)
+        np.testing.assert_allclose(self.bpath.bbox(), self.path.bbox())
+        # and back
+        path = self.bpath.to_path()
+        self.assertTrue(path.isclosed())
+        self.assertAlmostEqual(path.point(0.7), self.path.point(0.7))
+
+    def test_arc_length(self):
+        # partial lengths as svgpathtools, and T at a length inverting them
+        for T0, T1 in ((0.1, 0.6), (0.3, 0.31), (0.0, 0.9)):
+            self.assertAlmostEqual(self.bpath.length(T0, T1), self.path.length(T0, T1))
+        s = np.linspace(0.0, self.bpath.length(), 33)
+        np.testing.assert_allclose(self.bpath.length_at(self.bpath.T_at_length(s)), s, atol=1e-9)
+        self.assertIsInstance(self.bpath.T_at_length(1.0), float)
+        # resampled points are evenly spaced along the path (so the chords are as long, but cut across corners)
+        pts = self.bpath.resample(200)
+        self.assertAlmostEqual(pts[0], pts[-1])
+        chords = np.abs(np.diff(pts))
+        self.assertLessEqual(chords.max(), self.bpath.length() / 199 * (1 + 1e-9))
+        self.assertAlmostEqual(np.median(chords), self.bpath.length() / 199, delta=1e-3)
+
+    def test_frames(self):
+        points, tangents, normals, curvatures = self.bpath.frames(5)
+        self.assertEqual(tangents.shape, (4, 5))
+        self.assertIs(self.bpath.frames(5)[1], tangents)          # cached
+        # the inner samples of the cubic (a T at a segment start is the end of the segment before it)
+        T = self.bpath.t2T(1, [0.25, 0.5, 0.75])
+        np.testing.assert_allclose(points[1, 1:4], self.bpath.point(T))
+        np.testing.assert_allclose(tangents[1, 1:4], self.bpath.tangent(T))
+        np.testing.assert_allclose(curvatures[1, 1:4], self.bpath.curvature(T))
+        self.assertAlmostEqual(tangents[1, 0], self.path[1].unit_tangent(0.0))
+        np.testing.assert_allclose(normals, 1j * tangents)
+
+    def test_curvature(self):
+        # a fitted circle of radius 100 turns counterclockwise at 1/100, and clockwise the other way round
+        pts = 100 * np.exp(2j * np.pi * np.arange(200) / 200)
+        circle = BezierPath.from_path(bezier_fit_closed(pts, max_error=0.01))
+        T = np.linspace(0.0, 1.0, 50)
+        np.testing.assert_allclose(circle.curvature(T), 0.01, rtol=0.02)
+        np.testing.assert_allclose(BezierPath(circle.bpoints[::-1, ::-1]).curvature(T), -0.01, rtol=0.02)
+        T, k = circle.curvature_profile(50)
+        self.assertIs(circle.curvature_profile(50)[1], k)         # cached
+        np.testing.assert_allclose(k, circle.curvature(T))
+        # a straight run has no curvature
+        self.assertEqual(self.bpath.curvature(self.bpath.t2T(0, 0.5)), 0.0)
+
+    def test_direction(self):
+        # a counterclockwise circle from (100, 0) heads along phi once, a quarter turn on from phi = pi / 2
+        pts = 100 * np.exp(2j * np.pi * np.arange(200) / 200)
+        circle = BezierPath.from_path(bezier_fit_closed(pts, max_error=0.01))
+        for phi, T in ((np.pi, 0.25), (3 * np.pi / 4, 0.125), (-np.pi / 2, 0.5), (-np.pi / 4, 0.625), (-np.pi, 0.25)):
+            hits = circle.T_at_direction(phi)
+            self.assertEqual(len(hits), 1)
+            self.assertAlmostEqual(hits[0], T, delta=1e-3)
+            self.assertAlmostEqual(np.angle(circle.tangent(hits[0]) * np.exp(-1j * phi)), 0.0)
+        self.assertEqual(len(circle.T_at_direction(np.pi, 0.3, 1.0)), 0)
+        # the straight run of the mixed path gives its middle
+        self.assertAlmostEqual(self.bpath.T_at_direction(np.angle(self.bpath.tangent(0.01)), 0.0, self.bpath.T[1])[0],
+                               self.bpath.t2T(0, 0.5))
+
+
+class TestBodyPath(unittest.TestCase):
+
+    def setUp(self):
+        self.outline = outline_load(os.path.join(DATA_DIR, 'outline.csv'))
+        self.body = Body()
+        self.body.normalize(*self.outline[:3], scale=self.outline[3])
+
+    def test_points(self):
+        # the vectorized body points are the svgpathtools points, at the ends and segment boundaries too
+        path = self.body.path
+        T = np.concatenate([[0.0, 1.0], np.linspace(0.0, 1.0, 97), [path.t2T(ix, 0.0) for ix in range(1, len(path))]])
+        np.testing.assert_allclose(self.body.points(T), [path.point(t) for t in T], atol=1e-9)
+
+    def test_rebuilt(self):
+        bezier = self.body.bezier
+        self.assertIs(self.body.bezier, bezier)                 # cached
+        # normalizing another outline (at twice the scale) replaces the path, and the BezierPath with it
+        outline = outline_load(os.path.join(DATA_DIR, 'outline.csv'))
+        self.body.normalize(*outline[:3], scale=2 * outline[3])
+        self.assertIsNot(self.body.bezier, bezier)
+        T = np.linspace(0.0, 1.0, 33)
+        np.testing.assert_allclose(self.body.points(T), [self.body.path.point(t) for t in T], atol=1e-9)
+        np.testing.assert_allclose(self.body.bezier.bbox(), 2 * np.array(bezier.bbox()), rtol=0.01, atol=0.1)
+
+    def test_compare(self):
+        # a Path and its BezierPath compare the same to a clothoid, starting from the same point
+        path = self.body.path
+        clothoid = Clothoid(100.0, 0.0, (path.point(0.1).real, path.point(0.1).imag), T0=0.0, T=1.0)
+        printed = []
+        for p in (path, self.body.bezier):
+            with redirect_stdout(io.StringIO()) as out:
+                path_compare(p, 0.1, 0.2, clothoid, clothoid.T0, clothoid.T, nodes=5)
+            printed.append(out.getvalue())
+        self.assertEqual(printed[0], printed[1])
+        self.assertTrue(printed[0].startswith(str(np.array([path.point(t) for t in np.linspace(0.1, 0.2, 5)]))))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+test_cache
+----------
+
+Tests for the viol scan result cache.
+
+:copyright: Copyright (c) 2021 Bit Harmony Ltd. All rights reserved. See AUTHORS.
+:license: PROPRIETARY, see LICENSE for details.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+from io import BytesIO
+from svgpathtools import Path, CubicBezier
+from viol.lib.cache import ScanCache
+
+
+class TestScanCache(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.cache = ScanCache(self.cache_dir)
+        self.path = Path(CubicBezier(0, 1 + 1j, 2 + 1j, 3), CubicBezier(3, 2 - 1j, 1 - 1j, 0))
+
+    def test_key(self):
+        image = BytesIO(b'image bytes')
+        key = self.cache.key(image, dpi=300, threshold=205)
+        self.assertEqual(key, self.cache.key(image, threshold=205, dpi=300))
+        self.assertNotEqual(key, self.cache.key(image, dpi=300, threshold=206))
+        self.assertNotEqual(key, self.cache.key(BytesIO(b'other bytes'), dpi=300, threshold=205))
+
+    def test_round_trip(self):
+        self.assertIsNone(self.cache.get('k'))
+        self.cache.put('k', self.path, meta={'bbox': [0, 3, -1, 1]})
+        path, meta = self.cache.get('k')
+        self.assertEqual(path, self.path)
+        self.assertTrue(path.iscontinuous())
+        self.assertEqual(meta['bbox'], [0, 3, -1, 1])
+
+    def test_corrupt(self):
+        with open(os.path.join(self.cache_dir, 'k.npz'), 'wb') as f:
+            f.write(b'not an npz')
+        self.assertIsNone(self.cache.get('k'))
+        self.assertFalse(os.listdir(self.cache_dir))
+
+    def test_evict(self):
+        self.cache.put('old', self.path)
+        size = os.path.getsize(os.path.join(self.cache_dir, 'old.npz'))
+        os.utime(os.path.join(self.cache_dir, 'old.npz'), (0, 0))
+        self.cache.max_bytes = size * 2
+        self.cache.put('new', self.path)
+        self.cache.put('newer', self.path)
+        self.assertEqual(sorted(os.listdir(self.cache_dir)), ['new.npz', 'newer.npz'])
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+test_image
+----------
+
+Tests for the viol scan image loader.
+
+:copyright: Copyright (c) 2021 Bit Harmony Ltd. All rights reserved. See AUTHORS.
+:license: PROPRIETARY, see LICENSE for details.
+"""
+
+import unittest
+from io import BytesIO
+import numpy as np
+from PIL import Image
+from viol.lib.image import image_load, bitmap_clean
+
+
+def _image(fmt, size, mode='RGB'):
+    """Return an in memory image file of a dark square on a light background."""
+    w, h = size
+    a = np.full((h, w), 230, dtype=np.uint8)
+    a[h // 4:3 * h // 4, w // 4:3 * w // 4] = 40
+    img = Image.fromarray(a).convert(mode)
+    f = BytesIO()
+    img.save(f, format=fmt)
+    f.seek(0)
+    return f
+
+
+class TestImageLoad(unittest.TestCase):
+
+    def test_scale(self):
+        # 254 dpi is exactly 0.1mm per pixel
+        gray = image_load(_image('PNG', (300, 200)), dpi=254)
+        self.assertEqual(gray.shape, (200, 300))
+        self.assertEqual(gray.dtype, np.uint8)
+
+    def test_reduce(self):
+        stats = {}
+        gray = image_load(_image('PNG', (1600, 1200)), dpi=1016, stats=stats)
+        self.assertEqual(gray.shape, (300, 400))
+        self.assertEqual(gray[150, 200], 40)
+        self.assertEqual(gray[10, 10], 230)
+        for stage in ('decode', 'reduce', 'resample'):
+            self.assertIn(stage + '_time', stats)
+            self.assertIn(stage + '_maxrss', stats)
+
+    def test_draft(self):
+        # JPEG is decoded at a reduced DCT scale, but never below the target size
+        stats = {}
+        gray = image_load(_image('JPEG', (1600, 1200)), dpi=1016, stats=stats)
+        self.assertEqual(gray.shape, (300, 400))
+        self.assertLess(stats['decode_size'][0], 1600)
+        self.assertGreaterEqual(stats['decode_size'][0], 400)
+        self.assertLess(abs(int(gray[150, 200]) - 40), 8)
+
+
+class TestBitmapClean(unittest.TestCase):
+
+    def setUp(self):
+        # a 3 pixel outline ring with a one pixel gap, a line drawn inside it, a spur, specks, and a small blob
+        y, x = np.mgrid[0:200, 0:300]
+        r = np.hypot(x - 150, y - 100)
+        self.bitmap = (r > 60) & (r < 63)
+        self.bitmap[100, 148:153] = False               # the gap
+        self.bitmap[100, 100:200] = True                # a line inside
+        self.bitmap[30:39, 150] = True                  # a spur
+        self.bitmap[10, 10] = self.bitmap[190, 290] = True
+        self.bitmap[170:190, 20:40] = True
+
+    def test_clean(self):
+        stats = {}
+        clean = bitmap_clean(self.bitmap, min_area=100, stats=stats)
+        # the ring is a solid disk, the spur and specks are gone, and the blob is kept
+        self.assertEqual(stats['clean_kept'], 2)
+        self.assertTrue(clean[100, 150])
+        self.assertTrue(clean[40, 150])
+        self.assertFalse(clean[33, 150])
+        self.assertFalse(clean[10, 10])
+        self.assertTrue(clean[180, 30])
+        self.assertAlmostEqual(np.count_nonzero(clean[:, 60:240]), np.pi * 63 ** 2, delta=0.02 * np.pi * 63 ** 2)
+
+    def test_largest(self):
+        clean = bitmap_clean(self.bitmap, largest=True)
+        self.assertTrue(clean[100, 150])
+        self.assertFalse(clean[180, 30])
+
+    def test_open_outline(self):
+        # an outline with a gap too wide to close is kept as it is, not opened away
+        self.bitmap[90:110, 35:95] = False
+        clean = bitmap_clean(self.bitmap, largest=True)
+        self.assertFalse(clean[100, 150])
+        self.assertTrue(clean[100, 211])
+
+
+if __name__ == '__main__':
+    unittest.main()
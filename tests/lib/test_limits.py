@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+test_limits
+-----------
+
+Tests for the viol scan time limits and cancellation.
+
+:copyright: Copyright (c) 2021 Bit Harmony Ltd. All rights reserved. See AUTHORS.
+:license: PROPRIETARY, see LICENSE for details.
+"""
+
+import pickle
+import time
+import unittest
+from viol.exceptions import ScanCancelled, ScanTimeout
+from viol.lib.limits import ScanLimits, checked, checkpoint, hard_timeout
+from viol.lib.timing import Timings, timed
+
+
+class TestScanLimits(unittest.TestCase):
+
+    def test_stage_timeout(self):
+        timings = Timings()
+        limits = ScanLimits(stage_timeout=0.05)
+        with limits.active():
+            with timings.timer('quick'):
+                pass
+            with self.assertRaises(ScanTimeout) as cm:
+                with timings.timer('slow'):
+                    with timed('inner'):
+                        time.sleep(0.1)
+        self.assertIn('slow stage', str(cm.exception))
+
+    def test_cancel(self):
+        limits = ScanLimits()
+        calls = []
+        with limits.active():
+            f = checked(calls.append)
+            f(1)
+            limits.cancel()
+            with self.assertRaises(ScanCancelled):
+                f(2)
+        self.assertEqual(calls, [1])
+        # outside the active limits there is nothing to check
+        checkpoint()
+        self.assertIs(checked(len), len)
+
+    def test_pickle(self):
+        # a worker process gets the time remaining, not an absolute deadline
+        limits = pickle.loads(pickle.dumps(ScanLimits(timeout=60, max_memory=1 << 30)))
+        self.assertAlmostEqual(limits.remaining(), 60, delta=1)
+        self.assertEqual(limits.max_memory, 1 << 30)
+        self.assertFalse(limits.cancelled)
+
+    def test_hard_timeout(self):
+        with self.assertRaises(ScanTimeout):
+            with hard_timeout(0.05):
+                while True:
+                    pass
+
+
+if __name__ == '__main__':
+    unittest.main()
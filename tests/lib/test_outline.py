@@ -0,0 +1,155 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+test_outline
+------------
+
+Tests for the viol vector outline ingest.
+
+:copyright: Copyright (c) 2021 Bit Harmony Ltd. All rights reserved. See AUTHORS.
+:license: PROPRIETARY, see LICENSE for details.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from viol.exceptions import ParseError
+from viol.lib.outline import svg_outline, points_outline, outline_load, POINTS_SEGMENT_LENGTH
+from viol.cmds.scan import Body, scan_job
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', '..', 'data')
+
+# a 200 x 100mm page with a frame, a small closed path, a larger clockwise (in y down) one with a hole and an
+# open one, in a group scaled by 2
+_SVG = """<?xml version="1.0"?>
+<svg xmlns="http://www.w3.org/2000/svg" width="200mm" height="100mm" viewBox="0 0 400 200">
+  <path id="frame" d="M 0 0 H 400 V 200 H 0 Z M 5 5 V 195 H 395 V 5 Z"/>
+  <g transform="translate(10, 20) scale(2)">
+    <path id="small" d="M 0 0 L 10 0 L 10 10 L 0 10 Z"/>
+    <path id="body" d="M 20 10 L 80 10 C 90 10 90 60 80 60 L 20 60 Z M 30 20 L 40 20 L 40 30 Z"/>
+    <path id="open" d="M 0 0 L 180 0 L 180 80"/>
+  </g>
+</svg>
+"""
+
+
+class TestSvgOutline(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.svg = os.path.join(self.tmp, 'outline.svg')
+        with open(self.svg, 'w') as f:
+            f.write(_SVG)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_largest(self):
+        path, attributes, svg_attributes, scale = svg_outline(self.svg)
+        self.assertEqual(attributes['id'], 'body')
+        self.assertEqual(scale, 0.5)
+        self.assertTrue(path.isclosed())
+        # transformed to user units, y flipped up, the hole left out, and counterclockwise
+        xmin, xmax, ymin, ymax = path.bbox()
+        self.assertAlmostEqual(xmin, 50)
+        self.assertAlmostEqual(ymin, -140)
+        self.assertAlmostEqual(ymax, -40)
+        self.assertGreater(path.area(), 0)
+
+    def test_element(self):
+        path, attributes, svg_attributes, scale = outline_load(self.svg, 'small')
+        self.assertEqual(attributes['id'], 'small')
+        self.assertAlmostEqual(path.area(), 400)
+        with self.assertRaises(ParseError):
+            svg_outline(self.svg, 'missing')
+        with self.assertRaises(ParseError):
+            svg_outline(self.svg, 'open')
+
+
+class TestPointsOutline(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_half(self):
+        # the right half of a 100 x 200mm ellipse, bottom to top, as a .prn profile table with old mac line ends
+        t = np.linspace(-np.pi / 2, np.pi / 2, 40)
+        rows = ['{:10.3f}{:10.3f}{:10d}'.format(50 * np.cos(a), 100 + 100 * np.sin(a), 4) for a in t]
+        prn = os.path.join(self.tmp, 'outline.prn')
+        with open(prn, 'w', newline='') as f:
+            f.write('\r'.join(['# Profile 0 (outline)'] + rows + ['# Profile 1 (other)'] + rows[:5]))
+        path, attributes, svg_attributes, scale = outline_load(prn)
+        self.assertEqual(attributes['id'], 'Profile 0 (outline)')
+        self.assertEqual(scale, 1.0)
+        self.assertTrue(path.isclosed())
+        xmin, xmax, ymin, ymax = path.bbox()
+        self.assertAlmostEqual(xmin, -50, delta=0.25)
+        self.assertAlmostEqual(xmax, 50, delta=0.25)
+        self.assertAlmostEqual(path.area(), np.pi * 50 * 100, delta=0.01 * np.pi * 50 * 100)
+        self.assertLessEqual(max(seg.length() for seg in path), POINTS_SEGMENT_LENGTH)
+
+    def test_bad(self):
+        csv = os.path.join(self.tmp, 'outline.csv')
+        with open(csv, 'w') as f:
+            f.write('0,0\n10,x\n')
+        with self.assertRaises(ParseError):
+            points_outline(csv)
+        with self.assertRaises(ParseError):
+            points_outline(csv, 'Profile 3')
+
+    def test_open(self):
+        # an arching profile, edge to edge across the centerline, doesn't close into an outline
+        x = np.linspace(-150, 150, 31)
+        prn = os.path.join(self.tmp, 'arching.prn')
+        with open(prn, 'w') as f:
+            f.write('# Profile 0 (actual lower edge)\n')
+            f.write(''.join('{:10.3f}{:10.3f}\n'.format(a, 15 * np.cos(a * np.pi / 300)) for a in x))
+        with self.assertRaisesRegex(ParseError, 'is not an outline'):
+            points_outline(prn)
+
+
+class TestBodyLoad(unittest.TestCase):
+
+    def test_svg(self):
+        # a potrace outline, end to end: its lower right corner is too rounded for the corner tolerance
+        body = Body()
+        body.load(os.path.join(DATA_DIR, 'clean2.svg'))
+        corners = body.feature_corners
+        self.assertLess(corners.upper_left.T, corners.lower_left.T)
+        self.assertLess(corners.lower_left.T, corners.lower_right.T)
+        self.assertLess(corners.lower_right.T, corners.upper_right.T)
+        self.assertGreater(corners.lower_right.x(), 0)
+        self.assertEqual(len(body.clothoids), 16)
+
+    def test_points(self):
+        # an outline table loads end to end, but the arching profiles and the spec table aren't outlines
+        body = Body()
+        body.load(os.path.join(DATA_DIR, 'outline.csv'))
+        self.assertEqual(len(body.clothoids), 16)
+        for name in ('s_f_v3.prn', 'salo_front_v3.prn', 'salo_spec.csv'):
+            with self.assertRaisesRegex(ParseError, 'is not an outline'):
+                Body().load(os.path.join(DATA_DIR, name))
+
+    def test_batch_row(self):
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp)
+        row = scan_job(os.path.join(DATA_DIR, 'outline.csv'), os.path.join(tmp, 'outline.json'), threshold='auto')
+        self.assertEqual((row['status'], row['threshold']), ('ok', ''))        # never thresholded
+        row = scan_job(os.path.join(DATA_DIR, 's_f_v3.prn'), os.path.join(tmp, 's_f_v3.json'))
+        self.assertEqual(row['status'], 'bad outline')
+        self.assertIn('is not an outline', row['error'])
+
+    def test_broken(self):
+        # drawings whose lines are broken have no outline to load
+        for name in ('student.svg', 'scan2.svg'):
+            with self.assertRaises(ParseError):
+                Body().load(os.path.join(DATA_DIR, name))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,160 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+test_scan
+---------
+
+Tests for the viol scan pipeline.
+
+:copyright: Copyright (c) 2021 Bit Harmony Ltd. All rights reserved. See AUTHORS.
+:license: PROPRIETARY, see LICENSE for details.
+"""
+
+import csv
+import math
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from click.testing import CliRunner
+from PIL import Image, ImageDraw
+from viol.errno import SUCCESS, ERROR, SCAN_BAD_IMAGE
+from viol.exceptions import SubprocessError
+from viol.lib.bezier import BezierPath
+from viol.lib.outline import outline_load
+from viol.cmds.scan import (Viola, Body, path_longest, path_symmetry_axis, path_rotated, path_restart_top, scan_inputs,
+                            scan_job, scan_batch, scan)
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', '..', 'data')
+
+
+class TestPathLongest(unittest.TestCase):
+
+    def test_empty(self):
+        with self.assertRaisesRegex(SubprocessError, 'no outline traced'):
+            path_longest([])
+
+    def test_blank_scan(self):
+        # a blank page traces to nothing, and the batch row says so
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp)
+        filename = os.path.join(tmp, 'blank.png')
+        Image.fromarray(np.full((200, 100), 255, np.uint8)).save(filename, dpi=(300, 300))
+        row = scan_job(filename, os.path.join(tmp, 'blank.json'), tracer='native')
+        self.assertEqual((row['status'], row['error']), ('trace failed', 'no outline traced'))
+
+
+class TestStraighten(unittest.TestCase):
+
+    def setUp(self):
+        # a mirrored outline table is exactly symmetric about x = 0
+        self.outline = outline_load(os.path.join(DATA_DIR, 'outline.csv'))
+        self.top = path_restart_top(self.outline[0], 0.0).point(0.0)
+
+    def test_tilt(self):
+        path = self.outline[0]
+        origin = 30 + 50j
+        for degrees in (4.0, -7.0):
+            rotation = np.exp(1j * math.radians(degrees))
+            tilted = path_rotated(path, math.radians(degrees), origin)
+            self.assertTrue(tilted.isclosed())
+            center, tilt = path_symmetry_axis(tilted)
+            self.assertAlmostEqual(math.degrees(tilt), degrees, delta=0.01)
+            # the center is on the tilted axis, and rotating back about it restarts at the top of the axis
+            self.assertAlmostEqual(((center - origin) / rotation).real, -origin.real, delta=0.05)
+            upright = path_restart_top(path_rotated(tilted, -tilt, center), center.real)
+            top = self.top + center - origin - (center - origin) / rotation
+            self.assertAlmostEqual(upright.point(0.0), top, delta=0.05)
+
+    def test_normalize(self):
+        # an outline scanned upright or tilted either way normalizes the same
+        path, attributes, svg_attributes, scale = self.outline
+        bboxes = []
+        for degrees in (0.0, 4.0, -7.0):
+            body = Body()
+            body.normalize(path_rotated(path, math.radians(degrees), 30 + 50j), attributes, svg_attributes, scale=scale)
+            self.assertAlmostEqual(body.scan_stats['tilt'], degrees, delta=0.01)
+            self.assertAlmostEqual(body.path.point(0.0), 1j * body.feature_bbox[3], delta=0.01)
+            bboxes.append(body.feature_bbox)
+        np.testing.assert_allclose(bboxes[1:], [bboxes[0]] * 2, atol=0.01)
+
+
+class TestSheetScan(unittest.TestCase):
+
+    def test_sheet(self):
+        # a sheet at 0.1mm per pixel of a 200mm and a 250mm body, a 40mm blob between them, and a 150mm oval
+        path = outline_load(os.path.join(DATA_DIR, 'outline.csv'))[0]
+        pts = BezierPath.from_path(path).point(np.linspace(0.0, 1.0, 4000, endpoint=False))
+        pts = (pts - 1j * pts.imag.min()) * 10.0 / pts.imag.max()
+        img = Image.new('L', (3600, 2800), 255)
+        draw = ImageDraw.Draw(img)
+        for x, bottom, height in ((750, 2300, 200), (2350, 2700, 250)):
+            draw.polygon([(x + p.real, bottom - p.imag) for p in height * pts], fill=0)
+        draw.ellipse((1450, 2200, 1550, 2600), fill=0)
+        draw.ellipse((3300, 1000, 3500, 2500), fill=0)
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp)
+        filename = os.path.join(tmp, 'sheet.png')
+        img.save(filename, dpi=(254, 254))
+
+        viola = Viola()
+        viola.sheet_scan(filename, dpi=254, tracer='native', jobs=1)
+        # the blob is too short to be an outline, and the oval is reported as no body
+        self.assertEqual([body.scan_stats['sheet_outline'] for body in viola.sheet], [0, 1])
+        stats = viola.sheet[0].scan_stats
+        self.assertEqual(stats['sheet_outlines'], 3)
+        self.assertEqual([ix for ix, error in stats['sheet_errors']], [2])
+        self.assertTrue(stats['sheet_errors'][0][1].startswith('ParseError: '))
+        # left to right, and the tallest is the body
+        heights = [body.feature_bbox[3] - body.feature_bbox[2] for body in viola.sheet]
+        np.testing.assert_allclose(heights, [200.0, 250.0], atol=1.0)
+        self.assertIs(viola.body, viola.sheet[1])
+
+
+class TestScanBatch(unittest.TestCase):
+
+    def setUp(self):
+        # a directory of a corrupt png, an outline table in a subdirectory, and a file that is neither
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        self.inputs = os.path.join(self.tmp, 'in')
+        os.makedirs(os.path.join(self.inputs, 'sub'))
+        self.bad = os.path.join(self.inputs, 'bad.png')
+        with open(self.bad, 'wb') as f:
+            f.write(b'\x89PNG\r\n\x1a\n' + b'not a png' * 10)
+        self.outline = os.path.join(self.inputs, 'sub', 'outline.csv')
+        shutil.copy(os.path.join(DATA_DIR, 'outline.csv'), self.outline)
+        with open(os.path.join(self.inputs, 'notes.txt'), 'w') as f:
+            f.write('not a scan\n')
+
+    def test_inputs(self):
+        # directories are walked for images (point tables only when named), globs expanded, and a file named
+        # twice is scanned once
+        self.assertEqual(scan_inputs([self.inputs]), [self.bad])
+        files = scan_inputs([self.inputs, os.path.join(self.tmp, '**', '*.csv'), self.outline])
+        self.assertEqual(files, [self.bad, self.outline])
+
+    def test_batch(self):
+        # the corrupt image fails on its own, and the outline is fit regardless
+        output = os.path.join(self.tmp, 'out')
+        rows = scan_batch([self.bad, self.outline], output, jobs=1, tracer='native')
+        exits = {row['file']: (row['status'], row['exit']) for row in rows}
+        self.assertEqual(exits, {self.bad: ('bad image', SCAN_BAD_IMAGE), self.outline: ('ok', SUCCESS)})
+        self.assertTrue(os.path.isfile(os.path.join(output, 'outline.json')))
+        self.assertFalse(os.path.exists(os.path.join(output, 'bad.json')))
+
+    def test_command(self):
+        # one failed file fails the command, and the summary has a row per file
+        output = os.path.join(self.tmp, 'out')
+        args = [self.inputs, os.path.join(self.inputs, '*', '*.csv'), '-o', output, '-j', '1', '--no-cache', '-t', 'native']
+        result = CliRunner().invoke(scan, args)
+        self.assertEqual(result.exit_code, ERROR)
+        with open(os.path.join(output, 'scan_summary.csv'), newline='') as f:
+            rows = sorted(csv.DictReader(f), key=lambda row: row['file'])
+        self.assertEqual([(row['file'], row['status'], row['exit']) for row in rows],
+                         [(self.bad, 'bad image', str(SCAN_BAD_IMAGE)), (self.outline, 'ok', str(SUCCESS))])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+test_scanner
+------------
+
+Tests for the viol scanner calibration.
+
+:copyright: Copyright (c) 2021 Bit Harmony Ltd. All rights reserved. See AUTHORS.
+:license: PROPRIETARY, see LICENSE for details.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+from io import BytesIO
+import numpy as np
+from PIL import Image
+from viol.exceptions import CalibrationError
+from viol.lib.scanner import ruler_dpi, ScannerProfiles
+
+
+def _ruler(dpi, pitch=0.5, length=2000, width=120):
+    """Return an in memory png of a horizontal ruler with dark ticks every pitch mm, scanned at dpi."""
+    x = np.arange(length)
+    phase = (x * 25.4 / (dpi * pitch)) % 1.0
+    row = np.where(phase < 0.25, 30, 220).astype(np.uint8)
+    a = np.tile(row, (width, 1))
+    a[width // 2:] = 220                                # ticks on one edge only
+    f = BytesIO()
+    Image.fromarray(a).save(f, format='PNG')
+    f.seek(0)
+    return f
+
+
+class TestRulerDpi(unittest.TestCase):
+
+    def test_x(self):
+        axis, dpi = ruler_dpi(_ruler(301.7), dpi=300)
+        self.assertEqual(axis, 'x')
+        self.assertAlmostEqual(dpi, 301.7, delta=0.05)
+
+    def test_y(self):
+        f = _ruler(298.4)
+        img = Image.open(f).transpose(Image.ROTATE_90)
+        g = BytesIO()
+        img.save(g, format='PNG')
+        g.seek(0)
+        axis, dpi = ruler_dpi(g, dpi=300)
+        self.assertEqual(axis, 'y')
+        self.assertAlmostEqual(dpi, 298.4, delta=0.05)
+
+    def test_no_ruler(self):
+        f = BytesIO()
+        Image.new('L', (600, 100), 200).save(f, format='PNG')
+        f.seek(0)
+        with self.assertRaises(CalibrationError):
+            ruler_dpi(f)
+
+
+class TestScannerProfiles(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.profiles = ScannerProfiles(os.path.join(self.dir, 'viol', 'scanners.json'))
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_profiles(self):
+        self.assertIsNone(self.profiles.get('canon'))
+        self.profiles.put('canon', 299.8, 300.4, dpi=300)
+        self.profiles.put('epson', 600.1, 599.9, dpi=600)
+        canon = self.profiles.get('canon')
+        self.assertEqual((canon['dpi_x'], canon['dpi_y'], canon['dpi']), (299.8, 300.4, 300))
+        self.assertEqual(sorted(self.profiles.load()), ['canon', 'epson'])
+        self.assertTrue(self.profiles.remove('canon'))
+        self.assertFalse(self.profiles.remove('canon'))
+        self.assertEqual(sorted(self.profiles.load()), ['epson'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+test_stitch
+-----------
+
+Tests for the viol scan stitching.
+
+:copyright: Copyright (c) 2021 Bit Harmony Ltd. All rights reserved. See AUTHORS.
+:license: PROPRIETARY, see LICENSE for details.
+"""
+
+import unittest
+import numpy as np
+from viol.exceptions import StitchError
+from viol.lib.stitch import stitch_offset, stitch_images
+
+
+class TestStitch(unittest.TestCase):
+
+    def setUp(self):
+        # a 3 pixel pencil outline (an oval with a waist) on slightly noisy paper, too tall for one scan
+        t = np.linspace(0, 2 * np.pi, 8000)
+        y = 450 + 400 * np.sin(t)
+        x = 200 + (150 - 70 * np.exp(-((y - 450) / 60) ** 2)) * np.cos(t)
+        page = np.full((900, 400), 230.0)
+        for dy in (-1, 0, 1):
+            for dx in (-1, 0, 1):
+                page[np.clip(np.rint(y).astype(int) + dy, 0, 899), np.rint(x).astype(int) + dx] = 60
+        rng = np.random.default_rng(0)
+        self.page = np.clip(page + rng.normal(0, 4, page.shape), 0, 255).astype(np.uint8)
+        # two passes, overlapping by 150 rows and shifted sideways on the scanner bed
+        self.top = self.page[:520, 10:]
+        self.bottom = self.page[370:, :380]
+
+    def test_offset(self):
+        stats = {}
+        self.assertEqual(stitch_offset(self.top, self.bottom, stats=stats), (370, -10))
+        self.assertGreater(stats['stitch_snr'], 50)
+
+    def test_stitch(self):
+        stats = {}
+        stitched = stitch_images([self.top, self.bottom], strip=100, stats=stats)
+        self.assertEqual(stats['stitch_offsets'], [(0, 10), (370, 0)])
+        self.assertEqual(stitched.shape, self.page.shape)
+        # blended to within the paper noise, and white where neither scan reaches
+        self.assertLess(np.abs(stitched[:, 10:380].astype(float) - self.page[:, 10:380]).mean(), 2.0)
+        self.assertEqual(stitched[0, 0], 255)
+
+    def test_no_overlap(self):
+        paper = np.random.default_rng(1).normal(230, 4, (400, 380)).astype(np.uint8)
+        with self.assertRaises(StitchError):
+            stitch_offset(self.top, paper)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+test_timing
+-----------
+
+Tests for the viol stage timings registry.
+
+:copyright: Copyright (c) 2021 Bit Harmony Ltd. All rights reserved. See AUTHORS.
+:license: PROPRIETARY, see LICENSE for details.
+"""
+
+import unittest
+from viol.lib.timing import Timings, timed, timed_method, add_time, add_count
+
+
+def _stage():
+    """A library function timing its own sub-stage and counting, knowing nothing of the registry."""
+    with timed('inner'):
+        add_count('items', 3)
+    add_time('measured', 0.5)
+
+
+class _Fitter(object):
+
+    def __init__(self):
+        self.timings = Timings()
+
+    @timed_method('fit')
+    def fit(self):
+        _stage()
+        return 42
+
+
+class TestTimings(unittest.TestCase):
+
+    def test_nesting(self):
+        timings = Timings()
+        with timings.timer('outer'):
+            _stage()
+            _stage()
+        self.assertEqual(list(timings.stages), ['outer', 'outer.inner', 'outer.measured'])
+        self.assertEqual(timings.stages['outer'][0], 1)
+        self.assertEqual(timings.stages['outer.inner'][0], 2)
+        self.assertEqual(timings.seconds('outer.measured'), 1.0)
+        self.assertEqual(timings.counters, {'outer.inner.items': 6})
+        self.assertIn('\n  inner ', timings.report())
+
+    def test_inactive(self):
+        # outside an active registry the library calls do nothing, and nothing leaks out of a timed stage
+        timings = Timings()
+        with timings.timer('a'):
+            pass
+        _stage()
+        self.assertEqual(list(timings.stages), ['a'])
+        self.assertEqual(timings.counters, {})
+
+    def test_method_merge(self):
+        fitter = _Fitter()
+        self.assertEqual(fitter.fit(), 42)
+        fitter.fit()
+        total = Timings().merge(fitter.timings).merge(fitter.timings)
+        self.assertEqual(total.stages['fit'][0], 4)
+        self.assertEqual(total.counters['fit.inner.items'], 12)
+        self.assertEqual(total.to_dict()['stages']['fit.measured']['seconds'], 2.0)
+
+    def test_merge_report(self):
+        # registries of a batch start their stages in different orders: the report nests each under its own
+        first = Timings()
+        first.add('scan', 1.0)
+        first.add('scan.trace', 0.5)
+        first.add('clothoids', 0.2)
+        second = Timings()
+        second.add('load', 0.1)
+        second.add('clothoids', 0.2)
+        second.add('load.svg', 0.05)
+        second.add('load.svg.parse.xml', 0.01)                  # no 'load.svg.parse' stage of its own
+        report = Timings().merge(first).merge(second).report()
+        labels = [line.rsplit(None, 2)[0] for line in report.splitlines()[1:]]
+        self.assertEqual(labels, ['scan', '  trace', 'clothoids', 'load', '  svg', '    parse.xml'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,179 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+test_trace
+----------
+
+Tests for the viol bitmap tracers.
+
+:copyright: Copyright (c) 2021 Bit Harmony Ltd. All rights reserved. See AUTHORS.
+:license: PROPRIETARY, see LICENSE for details.
+"""
+
+import asyncio
+import unittest
+import numpy as np
+from viol.lib.image import bitmap_roi
+from svgpathtools import Path
+from viol.lib.trace import (native_trace, trace_bitmap, trace_bitmap_async, svg_parse, path_parse, path_outer, threshold_auto,
+                            _sweep_init, _sweep_trace, _potrace_pack)
+from viol.lib.timing import Timings
+
+
+class TestNativeTrace(unittest.TestCase):
+
+    def setUp(self):
+        # a 40 x 30 pixel ink frame with a 20 x 10 pixel hole and a one pixel speck
+        self.bitmap = np.zeros((40, 60), dtype=bool)
+        self.bitmap[5:35, 10:50] = True
+        self.bitmap[15:25, 20:40] = False
+        self.bitmap[2, 2] = True
+
+    def test_blob(self):
+        paths, attributes, svg_attributes = native_trace(self.bitmap, despeckle=2)
+        self.assertEqual(len(paths), 1)
+        self.assertEqual(len(paths[0].subpath_starts), 2)
+        outer, hole = paths[0].continuous_subpaths()
+        self.assertTrue(outer.isclosed())
+        self.assertTrue(hole.isclosed())
+        # potrace units (1/10 pixel), y up, outer counterclockwise and hole clockwise
+        self.assertAlmostEqual(outer.area(), 40 * 30 * 100, delta=0.05 * 40 * 30 * 100)
+        self.assertAlmostEqual(hole.area(), -20 * 10 * 100, delta=0.1 * 20 * 10 * 100)
+        xmin, xmax, ymin, ymax = outer.bbox()
+        self.assertAlmostEqual(xmin, 100, delta=10)
+        self.assertAlmostEqual(xmax, 500, delta=10)
+        self.assertAlmostEqual(ymin, 50, delta=10)
+        self.assertAlmostEqual(ymax, 350, delta=10)
+        # the outer contour starts at its top most point
+        self.assertAlmostEqual(paths[0].point(0).imag, 350, delta=10)
+
+    def test_despeckle(self):
+        self.assertEqual(len(native_trace(self.bitmap, despeckle=0)[0]), 2)
+
+    def test_empty(self):
+        self.assertEqual(native_trace(np.zeros((10, 10), dtype=bool))[0], [])
+
+
+class TestPotracePack(unittest.TestCase):
+
+    def test_round_trip(self):
+        # rows of odd widths are padded out to whole bytes, ink (True) is 1
+        rng = np.random.default_rng(7)
+        for h, w in ((1, 1), (3, 7), (5, 9), (4, 13), (2, 16)):
+            bitmap = rng.random((h, w)) < 0.5
+            stats = {}
+            pbm = _potrace_pack(bitmap, stats)
+            magic, size, data = pbm.split(b'\n', 2)
+            self.assertEqual(magic, b'P4')
+            self.assertEqual(size, '{} {}'.format(w, h).encode())
+            self.assertEqual(len(data), h * ((w + 7) // 8))
+            self.assertEqual(stats['pack_bytes'], len(pbm))
+            rows = np.unpackbits(np.frombuffer(data, dtype=np.uint8).reshape(h, -1), axis=1)
+            np.testing.assert_array_equal(rows[:, :w].astype(bool), bitmap)
+            self.assertFalse(rows[:, w:].any())
+
+
+class TestTraceBitmap(unittest.TestCase):
+
+    def setUp(self):
+        # a ring of ink on a mostly blank page
+        self.bitmap = np.zeros((300, 200), dtype=bool)
+        self.bitmap[120:170, 60:130] = True
+        self.bitmap[135:150, 80:110] = False
+
+    def test_roi(self):
+        self.assertEqual(bitmap_roi(self.bitmap), (120, 170, 60, 130))
+        self.assertEqual(bitmap_roi(self.bitmap, margin=100), (20, 270, 0, 200))
+        self.assertIsNone(bitmap_roi(np.zeros((10, 10), dtype=bool)))
+
+    def test_crop(self):
+        # tracing the cropped region of interest gives exactly the geometry of a full trace
+        stats = {}
+        paths, attributes, svg_attributes = trace_bitmap(self.bitmap, despeckle=2, tracer='native', stats=stats)
+        full = native_trace(self.bitmap, despeckle=2)[0]
+        self.assertEqual(stats['roi'], (112, 178, 52, 138))
+        self.assertEqual(svg_attributes['viewBox'], '0 0 200.000000 300.000000')
+        self.assertEqual(len(paths), len(full))
+        for path, expected in zip(paths, full):
+            self.assertEqual([seg.bpoints() for seg in path], [seg.bpoints() for seg in expected])
+
+    def test_async(self):
+        # the same trace, with the timings of the tracer (run in the executor) kept in the caller's registry
+        timings = Timings()
+
+        async def trace():
+            with timings.timer('trace'):
+                return await trace_bitmap_async(self.bitmap, despeckle=2, tracer='native')
+        paths = asyncio.run(trace())[0]
+        expected = trace_bitmap(self.bitmap, despeckle=2, tracer='native')[0]
+        self.assertEqual([seg.bpoints() for seg in paths[0]], [seg.bpoints() for seg in expected[0]])
+        self.assertIn('trace.fit', timings.stages)
+        self.assertEqual(timings.counters['trace.paths'], 1)
+
+
+class TestThresholdAuto(unittest.TestCase):
+
+    def setUp(self):
+        # a dark body with a lighter rim on a light page
+        y, x = np.mgrid[0:300, 0:200]
+        r = ((x - 100) / 60.0) ** 2 + ((y - 150) / 110.0) ** 2
+        self.gray = np.where(r < 1, np.where(r < 0.8, 60, 140), 240).astype(np.uint8)
+
+    def test_sweep_trace(self):
+        # a worker returns the trace of a single body only
+        _sweep_init(self.gray)
+        threshold, traced, (bodies, length, area) = _sweep_trace(100, 2, 'native')
+        self.assertEqual(bodies, 1)
+        self.assertEqual(len(traced[0]), 1)
+        threshold, traced, (bodies, length, area) = _sweep_trace(20, 2, 'native')
+        self.assertEqual(bodies, 0)
+        self.assertIsNone(traced)
+
+    def test_threshold_auto(self):
+        # the chosen trace comes back from its worker
+        stats = {}
+        threshold, (paths, attributes, svg_attributes) = threshold_auto(self.gray, 2, 'native', thresholds=(20, 100, 200),
+                                                                        jobs=1, stats=stats)
+        self.assertEqual(stats['threshold'], threshold)
+        self.assertNotEqual(threshold, 20)                      # found no body
+        expected = trace_bitmap(self.gray < threshold, 2, 'native')[0]
+        self.assertEqual([seg.bpoints() for seg in paths[0]], [seg.bpoints() for seg in expected[0]])
+        # no body at any threshold: the best is traced again
+        threshold, (paths, attributes, svg_attributes) = threshold_auto(self.gray, 2, 'native', thresholds=(10, 20),
+                                                                        jobs=1)
+        self.assertEqual(paths, [])
+
+
+class TestSvgParse(unittest.TestCase):
+
+    def test_parse(self):
+        svg = (b'<svg xmlns="http://www.w3.org/2000/svg" width="10pt" height="10pt">'
+               b'<g><path d="M0 0 L10 0 L10 10 z" id="a"/></g></svg>')
+        paths, attributes, svg_attributes = svg_parse(svg)
+        self.assertEqual(len(paths), 1)
+        self.assertEqual(len(paths[0]), 3)
+        self.assertEqual(attributes[0]['id'], 'a')
+        self.assertEqual(svg_attributes['width'], '10pt')
+
+    def test_subpaths(self):
+        # potrace style relative moves after each close
+        path = path_parse('M0 0 l10 0 l0 10 z m2 2 l4 0 l0 4 z m10 0 l1 0 l0 1 z')
+        self.assertEqual(path.subpath_starts, (0, 3, 6))
+        self.assertEqual(path[3].start, 2 + 2j)
+        self.assertEqual(path[6].start, 12 + 2j)
+        outer = path_outer(path)
+        self.assertEqual(len(outer), 3)
+        self.assertTrue(outer.isclosed())
+
+    def test_outer_fallback(self):
+        # without recorded sub-paths the outer contour ends where the path first returns to its start
+        path = Path(*path_parse('M0 0 l10 0 l0 10 z m2 2 l4 0 l0 4 z'))
+        self.assertFalse(hasattr(path, 'subpath_starts'))
+        self.assertEqual(len(path_outer(path)), 3)
+        # or failing that, nearest to its start
+        path = Path(*path_parse('M0 0 l10 0 l0 10 l-9.5 -9.5 m2 2 l4 0 l0 4 z'))
+        self.assertEqual(len(path_outer(path)), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+    Tracer benchmark
+    ~~~~~~~~~~~~~~~~
+
+    Compare the speed and the traced body geometry of the viol bitmap tracers
+    (potrace subprocess and the built in native tracer) on a scanned image.
+
+    :copyright: Copyright (c) 2021 Bit Harmony Ltd. All rights reserved. See AUTHORS.
+    :license: PROPRIETARY, see LICENSE for details.
+"""
+
+
+import sys
+from optparse import OptionParser
+from timeit import default_timer as timer
+
+import numpy as np
+
+from viol.exceptions import SubprocessError
+from viol.lib.trace import TRACERS
+from viol.lib.image import image_load
+
+
+def load_bitmap(filename, dpi, threshold):
+    """Load, resize to 0.1mm per pixel, and threshold an image in the manner of Body.scan."""
+    return image_load(filename, dpi) < threshold
+
+
+def body_geometry(paths):
+    """Return the (segments, length, area, bbox) of the outer contour of the longest path."""
+    path = max(paths, key=lambda p: len(p))
+    outer = path.continuous_subpaths()[0]
+    return len(outer), outer.length(), abs(outer.area()), outer.bbox()
+
+
+def main(argv):
+    parser = OptionParser(usage='Usage: %prog [-n repeat] [image]')
+    parser.add_option('-n', '--repeat', dest='repeat', type='int', default=5,
+                      help='number of timed runs per tracer')
+    parser.add_option('-d', '--dpi', dest='dpi', type='int', default=300,
+                      help='scan resolution in dots per inch')
+    parser.add_option('-t', '--threshold', dest='threshold', type='int', default=205,
+                      help='threshold for ink')
+    parser.add_option('-s', '--despeckle', dest='despeckle', type='int', default=10,
+                      help='speckle size to suppress (pixels)')
+    options, args = parser.parse_args(argv[1:])
+    filename = args[0] if args else 'data/clean.png'
+
+    bitmap = load_bitmap(filename, options.dpi, options.threshold)
+    print('{}: {} x {} bitmap, {} ink pixels'.format(filename, bitmap.shape[1], bitmap.shape[0], bitmap.sum()))
+
+    results = {}
+    for name, tracer in sorted(TRACERS.items()):
+        times = []
+        try:
+            for i in range(options.repeat):
+                t = timer()
+                paths = tracer(bitmap, options.despeckle)[0]
+                times.append(timer() - t)
+        except SubprocessError as exc:
+            print('{:8s} skipped: {}'.format(name, exc))
+            continue
+        results[name] = body_geometry(paths)
+        segs, length, area, bbox = results[name]
+        print('{:8s} min {:7.3f}s  median {:7.3f}s  paths {:4d}  body segs {:5d}  length {:10.1f}  area {:14.1f}'.format(
+            name, min(times), float(np.median(times)), len(paths), segs, length, area))
+
+    if len(results) == 2:
+        (_, l0, a0, b0), (_, l1, a1, b1) = results.values()
+        print('body length delta {:.3%}, area delta {:.3%}, max bbox delta {:.1f} (1/10 pixel)'.format(
+            (l1 - l0) / l0, (a1 - a0) / a0, max(abs(np.subtract(b1, b0)))))
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
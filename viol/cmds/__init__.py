@@ -19,6 +19,7 @@ from viol.exceptions import CustomExceptionHandler, click_exception_handler
 from viol.lib.log import setup_logging, indent_log
 from viol.lib.util_str import str_instance
 from viol.cmds.scan import scan
+from viol.cmds.calibrate import calibrate
 from viol.cmds.help import help
 from viol.cmds.completion import completion
 
@@ -93,7 +94,7 @@ def viol_main(ctx, verbose, quiet, logfile, color):
     pass
 
 
-viol_cmds = [scan, completion, help]
+viol_cmds = [scan, calibrate, completion, help]
 # now we add all subcmds (and subgroups)
 for cmd in viol_cmds:
     logger.debug('Adding {}'.format(cmd))
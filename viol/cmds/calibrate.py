@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+"""
+    viol.cmds.calibrate
+    ~~~~~~~~~~~~~~~~~~~
+
+    Measure the true resolution of a scanner from ruler scans, and keep it as a named scanner profile.
+
+    :copyright: Copyright (c) 2021 Bit Harmony Ltd. All rights reserved. See AUTHORS.
+    :license: PROPRIETARY, see LICENSE for details.
+"""
+
+
+import os
+import logging
+import click
+from viol.errno import SUCCESS, ERROR, CALIBRATE_FAILED
+from viol.exceptions import CalibrationError
+from viol.lib.scanner import ruler_dpi, ScannerProfiles, RULER_PITCH
+
+logger = logging.getLogger(__name__)
+
+
+@click.command()
+@click.argument('name', required=False)
+@click.argument('rulers', nargs=-1, type=click.Path(exists=True, dir_okay=False))
+@click.option('--pitch', 'pitch', default=RULER_PITCH, type=click.FloatRange(min=0.0, min_open=True),
+              show_default=True, help='Spacing of the finest ruler ticks (mm).')
+@click.option('--dpi', 'dpi', default=300, type=click.IntRange(min=1), show_default=True,
+              help='Nominal resolution the rulers were scanned at.')
+@click.option('--remove', 'remove', is_flag=True, default=False,
+              help='Remove the NAME scanner profile.')
+@click.pass_context
+def calibrate(ctx, name, rulers, pitch, dpi, remove):
+    """Viol calibrate command.
+
+    Measure the true X and Y resolution of the NAME scanner from scans of a steel
+    rule, and save it as a scanner profile (in ~/.viol/scanners.json) for use by
+    "viol scan --scanner NAME".
+
+    Each RULERS image is a scan of a ruler lying along the long side of the image: a
+    wide image measures X, and a tall image measures Y.  If only one axis is measured
+    the scanner is taken to have square pixels.  Without RULERS, the NAME profile (or
+    with no NAME, every profile) is shown.
+    """
+    profiles = ScannerProfiles()
+
+    if name is None or (not rulers and not remove):
+        found = profiles.load()
+        if name is not None:
+            found = {name: found[name]} if name in found else {}
+        if not found:
+            logger.error('No scanner profile{} in {}.'.format(
+                ' named "{}"'.format(name) if name else 's', profiles.filename))
+            ctx.exit(ERROR)
+        for key, profile in sorted(found.items()):
+            logger.info('{}: {:.3f} x {:.3f} dpi (calibrated {})'.format(
+                key, profile['dpi_x'], profile['dpi_y'], profile['calibrated']))
+        ctx.exit(SUCCESS)
+
+    if remove:
+        if not profiles.remove(name):
+            logger.error('No scanner profile named "{}".'.format(name))
+            ctx.exit(ERROR)
+        logger.info('Removed scanner profile "{}".'.format(name))
+        ctx.exit(SUCCESS)
+
+    measured = {}
+    for ruler in rulers:
+        try:
+            axis, axis_dpi = ruler_dpi(ruler, pitch, dpi)
+        except (OSError, CalibrationError) as exc:
+            logger.error(str(exc))
+            ctx.exit(CALIBRATE_FAILED)
+        logger.info('{}: {} {:.3f} dpi'.format(ruler, axis, axis_dpi))
+        measured.setdefault(axis, []).append(axis_dpi)
+
+    measured = {axis: sum(v) / len(v) for axis, v in measured.items()}
+    if len(measured) == 1:
+        logger.warning('Only the {} axis was measured, so assuming square pixels.'.format(*measured))
+    dpi_x = measured.get('x', measured.get('y'))
+    dpi_y = measured.get('y', measured.get('x'))
+
+    profiles.put(name, dpi_x, dpi_y, dpi=dpi, pitch=pitch, rulers=[os.path.abspath(r) for r in rulers])
+    logger.info('Saved scanner profile "{}": {:.3f} x {:.3f} dpi.'.format(name, dpi_x, dpi_y))
@@ -10,8 +10,11 @@
 """
 
 
-import tempfile
 #import json
+import os
+import csv
+import glob
+import asyncio
 import jsonpickle
 import math
 import cmath
@@ -19,18 +22,33 @@ import numpy as np
 import matplotlib.pyplot as plt
 
 #from time import sleep
-#from timeit import default_timer as timer
+from timeit import default_timer as timer
+from contextlib import nullcontext
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from matplotlib.figure import SubplotParams
 from scipy.special import fresnel
-from scipy.optimize import minimize_scalar
-from io import BytesIO
-from subprocess import Popen, PIPE, STDOUT
+from scipy.optimize import minimize_scalar as _minimize_scalar
+from scipy.spatial import cKDTree
 from PIL import Image
-from svgpathtools import Path, Line, CubicBezier, svg2paths2, wsvg, disvg
+from svgpathtools import Path, Line, CubicBezier, wsvg, disvg
 from svgpathtools import bezier_point, bezier2polynomial, polynomial2bezier, bpoints2bezier, split_bezier
 from svgpathtools.polytools import polyroots01
 
+from viol.errno import (SUCCESS, ERROR, SCAN_FAILED, SCAN_BAD_IMAGE, SCAN_TRACE_FAILED, SCAN_STITCH_FAILED, SCAN_TIMEOUT,
+                        SCAN_CANCELLED, SCAN_BAD_OUTLINE)
+from viol.exceptions import ParseError, SubprocessError, StitchError, ScanCancelled, ScanTimeout
 from viol.lib.util_str import str_instance
+from viol.lib.trace import (TRACERS, threshold_auto, tracer_version, trace_bitmap, trace_bitmap_async, closed_outlines,
+                            path_outer)
+from viol.lib.cache import ScanCache, DEFAULT_CACHE_DIR
+from viol.lib.bezier import path_bpoints, bezier_eval, bezier_length_bounds, BezierPath
+from viol.lib.image import image_load, bitmap_clean
+from viol.lib.stitch import stitch_load
+from viol.lib.outline import outline_load, OUTLINE_EXTS
+from viol.lib.scanner import ScannerProfiles
+from viol.lib.timing import Timings, timed, timed_method, add_count
+from viol.lib.limits import ScanLimits, checked, hard_timeout, HARD_TIMEOUT_GRACE
+from viol.lib.aio import run_in_executor
 
 import logging
 import click
@@ -38,6 +56,21 @@ import click
 
 logger = logging.getLogger(__name__)
 
+# the shortest closed outline (mm) that a sheet scan takes for a body
+SHEET_MIN_HEIGHT = 100.0
+
+# bitmap_clean() settings of a body scan (keep just the body blob) and of a sheet scan (keep every outline blob)
+BODY_CLEAN = dict(largest=True)
+SHEET_CLEAN = dict(largest=False)
+
+
+def minimize_scalar(fun, *args, **kwargs):
+    """scipy.optimize.minimize_scalar(), counting the evaluations of fun as the 'evaluations' of the timed stage,
+    and checking the limits of the scan between evaluations."""
+    res = _minimize_scalar(checked(fun), *args, **kwargs)
+    add_count('evaluations', res.nfev)
+    return res
+
 
 class Clothoid:
     """A clothoid (Euler's Sprial, Cornu Spiral, Fresnel Integral) class.  The clothoid can be
@@ -261,23 +294,11 @@ class CL:
 
 class Bouts:
     """A set of viola body bouts."""
-    def __init__(self, path, bout_tol=0.1):
+    def __init__(self, path, bout_tol=0.1, bezier=None):
         # We sweep around all segements of the viol body and nominate all possible bout features
-        # to bouts[] based on a vertical unit tangent ie. (0, pi)
-
-        # we need a vectorized function to find the tangent of a curve XXX  Really?!
-        vec_f_tan = np.vectorize(lambda t: seg.unit_tangent(t))
-        seg = path[0]
-        seg_prev_tan = np.average(vec_f_tan(np.linspace(0.0, 1.0, 10)))
-
-        segs = []
-        for ix, seg in enumerate(path):
-            seg_tan = np.average(vec_f_tan(np.linspace(0.0, 1.0, 10)))
-            d_real = max(seg_tan.real, seg_prev_tan.real) - min(seg_tan.real, seg_prev_tan.real)
-            d_imag = max(seg_tan.imag, seg_prev_tan.imag) - min(seg_tan.imag, seg_prev_tan.imag)
-            if (abs(seg_tan.real) < bout_tol) and (abs(seg_tan.imag) > (1.0 - bout_tol)):
-                segs.append(ix)
-            seg_prev_tan = seg_tan
+        # to bouts[] based on a vertical unit tangent ie. (0, pi), averaged over each segment
+        seg_tan = path_segment_tangents(path, bezier)
+        segs = np.flatnonzero((np.abs(seg_tan.real) < bout_tol) & (np.abs(seg_tan.imag) > (1.0 - bout_tol))).tolist()
 
         top = path.point(0).imag
 
@@ -286,7 +307,8 @@ class Bouts:
         # Find the upper left and right bout points in upper third of scan
 
         start, end = path_extrema_t(path, segs, top * 2.0 / 3.0, top)
-        self.upper = Bout(POI(path, start), POI(path, end), label="Bout_U")
+        self.upper = Bout(POI(path, feature_found(start, 'upper left bout')),
+                          POI(path, feature_found(end, 'upper right bout')), label="Bout_U")
 
         #T = path_find_slope(path, 0, .18, phi=-cmath.pi/2.0)
         #seg, t = path.T2t(T)
@@ -300,11 +322,13 @@ class Bouts:
 
         # Find the lower left and right bout points
         start, end = path_extrema_t(path, segs, 0.0, top * 1.0 / 3.0)
-        self.lower = Bout(POI(path, start), POI(path, end), label="Bout_L")
+        self.lower = Bout(POI(path, feature_found(start, 'lower left bout')),
+                          POI(path, feature_found(end, 'lower right bout')), label="Bout_L")
 
         # Find the middle left and right bout points
         start, end = path_extrema_t(path, segs, top * 1.0 / 3.0, top * 2.0 / 3.0, reverse=True)
-        self.middle = Bout(POI(path, start), POI(path, end), label="Bout_M")
+        self.middle = Bout(POI(path, feature_found(start, 'middle left bout')),
+                           POI(path, feature_found(end, 'middle right bout')), label="Bout_M")
 
     def __repr__(self):
         return(str_instance(self))
@@ -327,23 +351,23 @@ class Bouts:
 
 class Corners:
     """A set of viola body corners."""
-    def __init__(self, path, bouts, corner_curve_tol=0.1):
-        # we need a vectorized function to find the tangent of a curve XXX  Really?!
-        vec_f_tan = np.vectorize(lambda t: seg.unit_tangent(t))
-
-        corners = []
-        seg = path[0]
-        seg_prev_tan = np.average(vec_f_tan(np.linspace(0.0, 1.0, 10)))
-
+    def __init__(self, path, bouts, corner_curve_tol=0.1, bezier=None):
         # We sweep around all segements of the viol body and nominate all possible corner features to corners[] based on
         # significant changes in direction. Corners have segment to segment jump of curvature > .5.
-        for ix, seg in enumerate(path):
-            seg_tan = np.average(vec_f_tan(np.linspace(0.0, 1.0, 10)))
-            d_real = max(seg_tan.real, seg_prev_tan.real) - min(seg_tan.real, seg_prev_tan.real)
-            d_imag = max(seg_tan.imag, seg_prev_tan.imag) - min(seg_tan.imag, seg_prev_tan.imag)
-            if (abs(d_real) + abs(d_imag) > corner_curve_tol):
-                corners.append(ix)
-            seg_prev_tan = seg_tan
+        seg_tan = path_segment_tangents(path, bezier)
+        seg_prev_tan = np.concatenate((seg_tan[:1], seg_tan[:-1]))
+        d = seg_tan - seg_prev_tan
+        jumps = np.abs(d.real) + np.abs(d.imag)
+        corners = np.flatnonzero(jumps > corner_curve_tol).tolist()
+        starts = bezier.bpoints[:, 0] if bezier is not None else np.array([seg.start for seg in path])
+
+        def sharpest(bot, top, left):
+            # a rounded corner may turn by less than the tolerance from segment to segment: take the sharpest
+            # turn on its side of the bracket instead
+            segs = np.flatnonzero((starts.imag > bot) & (starts.imag < top) & ((starts.real < 0) == left))
+            if not len(segs):
+                return None
+            return path_extrema_t(path, [int(segs[np.argmax(jumps[segs])])], bot, top)[0 if left else 1]
 
         # Now we bracket our search based on bout locales to determine the real corners
 
@@ -351,15 +375,19 @@ class Corners:
         bot = bouts.lower.left.y()
         top = bouts.middle.left.y()
         start, end = path_extrema_t(path, corners, bot, top)
-        self.lower_left = POI(path, start, label="Corner_LL")
-        self.lower_right = POI(path, end, label="Corner_LR")
+        self.lower_left = POI(path, feature_found(start if start is not None else sharpest(bot, top, True),
+                                                  'lower left corner'), label="Corner_LL")
+        self.lower_right = POI(path, feature_found(end if end is not None else sharpest(bot, top, False),
+                                                   'lower right corner'), label="Corner_LR")
 
         # Find the upper corners
         bot = bouts.middle.left.y()
         top = bouts.upper.left.y()
         start, end = path_extrema_t(path, corners, bot, top)
-        self.upper_left = POI(path, start, label="Corner_UL")
-        self.upper_right = POI(path, end, label="Corner_UR")
+        self.upper_left = POI(path, feature_found(start if start is not None else sharpest(bot, top, True),
+                                                  'upper left corner'), label="Corner_UL")
+        self.upper_right = POI(path, feature_found(end if end is not None else sharpest(bot, top, False),
+                                                   'upper right corner'), label="Corner_UR")
 
     def __repr__(self):
         return(str_instance(self))
@@ -441,8 +469,11 @@ class Body:
         self.inspects = []
         self.highlights = []
         self.path = None
+        self._bezier = None
         self.path_attributes = None
         self.pathsvg_attributes = None
+        self.scan_stats = {}
+        self.timings = Timings()
         self.feature_bbox = []
         self.feature_centerline = None
         self.feature_bouts = None
@@ -460,6 +491,12 @@ class Body:
     def __repr__(self):
         return(str_instance(self))
 
+    def __getstate__(self):
+        # the BezierPath of the body path is remade when it is next needed, not pickled
+        state = self.__dict__.copy()
+        state.pop('_bezier', None)
+        return state
+
     def __str__(self):
         # A terser description of only human readable features.
         # Generator to filter which properties to show.
@@ -484,61 +521,166 @@ class Body:
         result += ")>"
         return result
 
-    def scan(self, imageFile, dpi=300, threshold=205, despeckle=10):
-        img = Image.open(imageFile)
-        img = img.convert(mode="L")
+    @property
+    def bezier(self):
+        """The body path as a BezierPath (see viol.lib.bezier), for vectorized evaluation.  It is made on first
+        use and kept until the body path changes."""
+        bezier = getattr(self, '_bezier', None)
+        if bezier is None or bezier[0] is not self.path:
+            bezier = self._bezier = (self.path, BezierPath.from_path(self.path))
+        return bezier[1]
+
+    def points(self, T):
+        """Return the points of the body path at an array of path parameters T, evaluated in one pass."""
+        return self.bezier.point(T)
+
+    def scan(self, imageFile, dpi=300, threshold=205, despeckle=10, tracer='potrace', cache=None, scanner=None,
+             clean=False, limits=None):
+        """Scan an image file, trace and normalize the body path, then find the features and clothoids.
+
+        If a ScanCache is given, the normalized body path is looked up by the image content and scan
+        parameters, so a repeated scan skips straight to the feature finding.  If a scanner profile (see
+        viol calibrate) is given, its measured resolution is used in place of dpi.  A list of overlapping
+        image files (passes of an outline too big for the scanner) is stitched into one image first.  If
+        clean, the thresholded bitmap is cleaned up to the single largest filled blob before it is traced (see
+        bitmap_clean).  The seconds spent in each stage of the scan, and its counters, are kept in self.timings.
+        If ScanLimits are given, the scan stops with ScanTimeout or ScanCancelled when they run out.
+        """
+        if limits is not None:
+            with limits.active():
+                return self.scan(imageFile, dpi, threshold, despeckle, tracer, cache, scanner, clean)
+
+        self.timings = Timings()
+        dpi, scale = scan_resolution(dpi, scanner)
+        key = None
+        if cache is not None:
+            with self.timings.timer('cache'):
+                key = cache.key(imageFile, dpi=dpi, scale=scale, threshold=threshold, despeckle=despeckle,
+                                tracer=tracer_version(tracer), clean=clean)
+                hit = cache.get(key)
+            if hit is not None:
+                return self._restore(hit)
+
+        with self.timings.active():
+            traced = scan_trace(imageFile, dpi, threshold, despeckle, tracer, stats=self.scan_stats,
+                                clean=BODY_CLEAN if clean else None)
+        self._fit(traced, scale, cache, key)
+
+    async def scan_async(self, imageFile, dpi=300, threshold=205, despeckle=10, tracer='potrace', cache=None,
+                         scanner=None, clean=False, limits=None, executor=None):
+        """The asyncio version of scan().  The image decode, the bitmap preparation, and the fit run in the
+        (thread pool) executor, default that of the event loop, and potrace runs as an asyncio subprocess, so
+        the stages of concurrent scans overlap (see scan_pipeline).
+        """
+        if limits is not None:
+            with limits.active():
+                return await self.scan_async(imageFile, dpi, threshold, despeckle, tracer, cache, scanner, clean,
+                                             executor=executor)
+
+        self.timings = Timings()
+        dpi, scale = scan_resolution(dpi, scanner)
+        key = None
+        if cache is not None:
+            with self.timings.timer('cache'):
+                key = await run_in_executor(executor, cache.key, imageFile, dpi=dpi, scale=scale, threshold=threshold,
+                                            despeckle=despeckle, tracer=tracer_version(tracer), clean=clean)
+                hit = await run_in_executor(executor, cache.get, key)
+            if hit is not None:
+                return await run_in_executor(executor, self._restore, hit)
+
+        with self.timings.active():
+            traced = await scan_trace_async(imageFile, dpi, threshold, despeckle, tracer, stats=self.scan_stats,
+                                            clean=BODY_CLEAN if clean else None, executor=executor)
+        await run_in_executor(executor, self._fit, traced, scale, cache, key)
+
+    def load(self, outlineFile, element_id=None, scale=None, limits=None):
+        """Load the body outline from a vector file (see OUTLINE_EXTS), such as an svg drawing or a table of
+        outline points, skipping the scan and trace, then normalize it and find the features and clothoids as
+        scan() does.
+
+        The outline is the path with the id element_id, or else the largest closed one (see svg_outline), or
+        the profile of a point table (see points_outline).  Its scale to mm is taken from the units of the file,
+        if they are physical, unless it is given.  Raises ParseError if there is no such outline, or it lacks a
+        feature of a body (such as a corner).
+        """
+        if limits is not None:
+            with limits.active():
+                return self.load(outlineFile, element_id, scale)
+
+        self.timings = Timings()
+        with self.timings.timer('load'):
+            path, attributes, svg_attributes, units = outline_load(outlineFile, element_id, stats=self.scan_stats)
+        self.normalize(path, attributes, svg_attributes, scale=scale if scale is not None else units)
+        try:
+            self.features_find()                                # extract the path features
+        except ParseError as exc:
+            raise ParseError('{}: {}'.format(outlineFile, exc))
+        self.clothoids_find()                                   # build a clothoid model of the body
 
-        # convert from input dots per inch to 100 dots per cm (.1mm resolution)
-        resize = 2540.0 / (10.0 * dpi)
-        w, h = img.size
-        img = img.resize((int(w * resize), int(h * resize)), Image.LANCZOS)
-        img = img.point(lambda x: 0 if x < threshold else 255, '1')
+    def _restore(self, hit):
+        """Take the normalized body path of a scan cache hit, then find the features and clothoids."""
+        self.timings.count('cache.hits')
+        self.path, meta = hit
+        self.path_attributes = []
+        self.pathsvg_attributes = meta['svg_attributes']
+        self.feature_bbox = tuple(meta['bbox'])
+        self.scan_stats = meta['stats']
+        self.scan_stats['cached'] = True
+        self.features_find()                                    # extract the path features
+        self.clothoids_find()                                   # build a clothoid model of the body
 
-        # XXX one could preview the threshold result with img.show()
+    def _fit(self, traced, scale=None, cache=None, key=None):
+        """Take the body outline of the traced (paths, attributes, svg_attributes) and normalize it (caching the
+        result under key), then find the features and clothoids."""
+        paths, attributes, svg_attributes = traced
 
-        # convert the image to a bitmap memory file for input to potrace
-        bmp = BytesIO()
-        img.save(bmp, format='BMP')
-        bmp.seek(0)
+        # XXX assume here that the longest path is the body we want, and rest is clutter
+        # we could also detect split long paths and join them together (see sheet_scan for several bodies)
+        with self.timings.timer('select'):
+            path = path_longest(paths, stats=self.scan_stats)
 
-        # execute potrace as a subprocess filter stdin to stdout
-        p = Popen(['potrace', '-s', '-t', str(despeckle)], stdout=PIPE, stdin=PIPE, stderr=STDOUT)
-        svg_tmp = tempfile.NamedTemporaryFile(mode='w')
-        svg_tmp.write(p.communicate(input=bmp.read())[0].decode())
-        svg_tmp.flush()
+        self.normalize(path, attributes, svg_attributes, scale=scale)
 
-        # parse the svg file to extract the cubic bezier curve paths
-        paths, attributes, svg_attributes = svg2paths2(svg_tmp.name)
-        svg_tmp.close()
+        if cache is not None:
+            stats = {k: v for k, v in self.scan_stats.items() if k in ('threshold', 'threshold_scores')}
+            cache.put(key, self.path, meta=dict(svg_attributes=svg_attributes, bbox=self.feature_bbox, stats=stats))
 
-        # XXX assume here that the longest path is the body we want, and rest is clutter
-        # we could try different threshold values until a reasonble path count is found.
-        # we could also detect split long paths and join them together
-        path = paths[0]
-        for p in paths:
-            if p.length() > path.length():
-                path = p
-
-        # body path traces both outside and inside the trace... we only want inside trace
-        # XXX we assume here that potrace closes the outside curve before starting the
-        # inside curve.  It is probably more defensive to chose the first segment endpoint (after t > 0.1)
-        # that has the closest Euclidean distance to the starting point.
+        self.features_find()                                    # extract the path features
+        self.clothoids_find()                                   # build a clothoid model of the body
+
+    @timed_method('normalize')
+    def normalize(self, path, attributes=None, svg_attributes=None, straighten=True, scale=None):
+        """Take a traced body outline path (potrace units) as the body path, normalized to mm with (0, 0) at
+        the centerline of the bottom of the instrument, then smoothed, compressed, and flattened top and bottom.
+        If straighten, a tilted outline is first rotated upright about its symmetry axis.  The scale from
+        path units to mm is guessed from the size of the outline, unless it is known.
+        """
+        # body path traces both outside and inside the trace... we only want the first (outer) sub-path,
+        # as recorded by the tracer, or else up to the segment endpoint closest to the starting point.
         # an assumption that potrace starts the path at top most part of viola has probably
         # snuck into the code somewhere, so it would be good check and correct those conditions.
 
-        endpoints = [ix for ix, seg in enumerate(path) if seg.point(1) == path.point(0)]
-        del(path[endpoints[0] + 1:])
+        with timed('outer'):
+            path = path_outer(path)
 
         # check that the viola body path is closed
         assert(path.iscontinuous())
 
+        # a scan may be tilted, so find the centerline as the symmetry axis of the outline, rotate it to
+        # vertical, and start the path at the top of the centerline
+        if straighten:
+            with timed('straighten'):
+                center, tilt = path_symmetry_axis(path)
+                self.scan_stats['tilt'] = math.degrees(tilt)
+                path = path_rotated(path, -tilt, center)
+                path = path_restart_top(path, center.real)
+
         # normalize the path for (0, 0) at the centerline of the bottom of the instrument
-        # XXX A proper centerline would be to consider vertical extremi, or average(x) for all x,
-        # or svgpathtools.path.point(0.5). It also may be tilted, so a rotation is required.
 
         xmin, xmax, ymin, ymax = path.bbox()                         # use a bounding box to determine x, y extremi
-        xshift = path.point(0.0).real                                # T=0 appears to find top most point
-        scale = 1000.0 / 10.0 ** (math.ceil(np.log10(ymax - ymin)))  # calculate scaling factor for pixel == 0.1mm
+        xshift = path.point(0.0).real                                # T=0 is the top of the centerline
+        if scale is None:
+            scale = 1000.0 / 10.0 ** (math.ceil(np.log10(ymax - ymin)))  # guess scaling factor for pixel == 0.1mm
         path = path.translated(complex(-xshift, -ymin))              # complex translation vector
         path = path.scaled(scale)                                    # scale path to 10 pixels/mm (curves get detached)
         for ix, seg in enumerate(path[:-1]):
@@ -549,21 +691,52 @@ class Body:
         self.path_attributes = attributes
         self.pathsvg_attributes = svg_attributes                # XXX Seems not to like svg version of 1.0
         self.feature_bbox = path.bbox()                         # establish a bounding box around whole body
-        self.path = path_smooth(self.path)                      # smooth the path
-        self.path = path_compress(self.path)                    # compress the path
-        self.path = path_flatten_top(self.path)                 # make tangent horizotal at top
-        self.path = path_flatten_bottom(self.path)              # make tangent horizotal at bottom
-        self.features_find()                                    # extract the path features
-        self.clothoids_find()                                   # build a clothoid model of the body
-
+        with timed('smooth'):
+            self.path = path_smooth(self.path)                  # smooth the path
+        with timed('compress'):
+            add_count('segments_in', len(self.path))
+            self.path = path_compress(self.path)                # compress the path
+            add_count('segments_out', len(self.path))
+        with timed('flatten_top'):
+            self.path = path_flatten_top(self.path)             # make tangent horizotal at top
+        with timed('flatten_bottom'):
+            self.path = path_flatten_bottom(self.path)          # make tangent horizotal at bottom
+        self._bezier = None                                     # the path was changed in place
+
+    @timed_method('features')
     def features_find(self, bout_tol=0.1, corner_curve_tol=1.0):
         """Use properties of a Viola to establish bout locations and widths, corner locations, etc."""
         # establish the viol centerline
-        self.feature_centerline = CL(self.path, label="CL_")
-        self.feature_bouts = Bouts(self.path, bout_tol)                                  # find the bouts
-        self.feature_corners = Corners(self.path, self.feature_bouts, corner_curve_tol)  # find the corners
-        self.feature_turns = Turns(self.path, self.feature_bouts, self.feature_corners)  # find the turns
-
+        with timed('centerline'):
+            self.feature_centerline = CL(self.path, label="CL_")
+        with timed('bouts'):
+            self.feature_bouts = Bouts(self.path, bout_tol, self.bezier)                     # find the bouts
+        with timed('corners'):
+            self.feature_corners = Corners(self.path, self.feature_bouts, corner_curve_tol,  # find the corners
+                                           self.bezier)
+        with timed('turns'):
+            self.feature_turns = Turns(self.path, self.feature_bouts, self.feature_corners)  # find the turns
+
+    def slope_find(self, T0, T1, phi, samples=200):
+        """Return the T between T0 and T1 where the outline heads along phi.
+
+        A traced outline wavers, so it may cross phi a few times in close succession.  Successive crossings turn
+        through phi in opposite senses, so each waver adds a close pair that cancels out: the closest pair is
+        dropped until one crossing (or for an even number, the first of the last two) is left.  If the outline
+        never quite reaches phi, the nearest direction of `samples` points across [T0, T1] is taken.
+        """
+        hits = list(path_find_slope(self.bezier, T0, T1, phi))
+        while len(hits) > 2:
+            ix = int(np.argmin(np.diff(hits)))
+            del hits[ix:ix + 2]
+        if hits:
+            return float(hits[0])
+        T = np.linspace(T0, T1, samples)
+        logger.debug('body: no slope {:.1f} degrees in T [{:.4f}, {:.4f}], taking the nearest'.format(
+            math.degrees(phi), T0, T1))
+        return float(T[np.argmin(np.abs(np.angle(self.bezier.tangent(T) * cmath.exp(-1j * phi))))])
+
+    @timed_method('clothoids')
     def clothoids_find(self):
         """Define a set of clothoids based on path features."""
         # Now we search for four clothoid joins to yield best curve fit
@@ -571,22 +744,22 @@ class Body:
 
         T0 = 0.015
         T1 = self.feature_bouts.upper.left.T - 0.015
-        T = path_find_slope(self.path, T0, T1, phi=-3.0 * cmath.pi / 4.0)
+        T = self.slope_find(T0, T1, phi=-3.0 * cmath.pi / 4.0)
         self.feature_45_upper_left = POI(self.path, T, label="45_UL")
 
         T0 = self.feature_bouts.lower.left.T + 0.015
         T1 = self.feature_centerline.bot.T - 0.015
-        T = path_find_slope(self.path, T0, T1, phi=-cmath.pi / 4.0)
+        T = self.slope_find(T0, T1, phi=-cmath.pi / 4.0)
         self.feature_45_lower_left = POI(self.path, T, label="45_LL")
 
         T0 = self.feature_centerline.bot.T + 0.015
         T1 = self.feature_bouts.lower.right.T - 0.015
-        T = path_find_slope(self.path, T0, T1, phi=cmath.pi / 4.0)
+        T = self.slope_find(T0, T1, phi=cmath.pi / 4.0)
         self.feature_45_lower_right = POI(self.path, T, label="45_LR")
 
         T0 = self.feature_bouts.upper.right.T + 0.015
         T1 = self.feature_centerline.top_right.T - 0.015
-        T = path_find_slope(self.path, T0, T1, phi=3 * cmath.pi / 4.0)
+        T = self.slope_find(T0, T1, phi=3 * cmath.pi / 4.0)
         self.feature_45_upper_right = POI(self.path, T, label="45_UR")
 
         # XXX I can't think of an obvious way to make this less ugly! A global dictionary?!
@@ -630,10 +803,10 @@ class Body:
             rotation, clockwise  = phase_delta(p0, p1)
             # estimate the scale based on arclength of bezier path
             if p1.T > p0.T:
-                arclen = self.path.length(p0.T, p1.T)
+                arclen = self.bezier.length(p0.T, p1.T)
                 tan = (cmath.phase(p1.path.unit_tangent(p1.T - adj)) + (2 * cmath.pi)) % (2 * cmath.pi)
             else:
-                arclen = self.path.length(p1.T, p0.T)
+                arclen = self.bezier.length(p1.T, p0.T)
                 tan = (cmath.phase(-p1.path.unit_tangent(p1.T + adj)) + (2 * cmath.pi)) % (2 * cmath.pi)
 
             # how much additional twist after initial rotation required?
@@ -668,7 +841,7 @@ class Body:
                 rotation = rotation + (ph1 - ph2)
 
             # evaluate clothoid results
-            path_compare(self.path, p0.T, p1.T, cl, cl.T0, cl.T, nodes=10)
+            path_compare(self.bezier, p0.T, p1.T, cl, cl.T0, cl.T, nodes=10)
 
             self.clothoids.append(cl)
 
@@ -711,15 +884,13 @@ class Body:
             inspect.plot(plot)
 
         # Plot body path by digitizing the bezier curve(s) with 5000 points
-        x, y = list(zip(*[(self.path.point(T).real, self.path.point(T).imag) for T in np.linspace(0.0, 1.0, 5000)]))
-        plot.plot(x, y, 'b-')
+        p = self.points(np.linspace(0.0, 1.0, 5000))
+        plot.plot(p.real, p.imag, 'b-')
 
         # Highlight segments in highlights list
         for seg in self.highlights:
-            T0 = self.path.t2T(seg, 0)
-            T1 = self.path.t2T(seg, 1)
-            x, y = list(zip(*[(self.path.point(T).real, self.path.point(T).imag) for T in np.linspace(T0, T1, 100)]))
-            plot.plot(x, y, 'g-')
+            p = self.points(np.linspace(self.bezier.T[seg], self.bezier.T[seg + 1], 100))
+            plot.plot(p.real, p.imag, 'g-')
 
         return plot
 
@@ -732,25 +903,14 @@ class Body:
             plot2.axis([0, 1, 0, 250])
             plot2.tick_params(axis='x', which='both', bottom=False, top=False, labelbottom=False)
 
-        x = []
-        y = []
-        #sweep T in [0, T+.02, T+.04]
-        delta = 0.02
-        for t0 in np.linspace(0.0, 1.0 - (2 * delta), 500):
-            x.append(t0 + delta)
-            y.append(path_curvature(t0, self.path))
-        plot.plot(x, y, 'r-')
-
-        x = []
-        y = []
+        # the curvature profile, sweeping T in [0, 1]
+        T, k = self.bezier.curvature_profile(500)
+        plot.plot(T, np.abs(k), 'r-')
+
         #sweep T in [0, 1]
-        for t in np.linspace(0.0, .5, 250):
-            x.append((.5 - abs(self.path.point(t).imag) / (2 * 388)))
-            y.append(abs(self.path.point(t).real))
-        for t in np.linspace(0.5, 1, 250):
-            x.append((.5 + abs(self.path.point(t).imag) / (2 * 388)))
-            y.append(abs(self.path.point(t).real))
-        plot2.plot(x, y, 'b-')
+        p = self.points(np.linspace(0.0, 1.0, 500))
+        side = np.where(np.arange(500) < 250, -1.0, 1.0)
+        plot2.plot(.5 + side * np.abs(p.imag) / (2 * 388), np.abs(p.real), 'b-')
 
         # Use a self referential string search to establish plottable features.
         features = [(key) for key, value in self.__dict__.items() if key.startswith("feature")]
@@ -767,6 +927,8 @@ class Viola:
     """An instrument class of the components of an instrument in the viol family."""
     def __init__(self):
         self.body = Body()
+        self.sheet = []
+        self.timings = Timings()
 
     def __repr__(self):
         return(str_instance(self))
@@ -795,8 +957,38 @@ class Viola:
         result += ")>"
         return result
 
-    def body_scan(self, imageFile, dpi=300, threshold=205, despeckle=10):
-        self.body.scan(imageFile, dpi, threshold, despeckle)
+    def body_scan(self, imageFile, dpi=300, threshold=205, despeckle=10, tracer='potrace', cache=None, scanner=None,
+                  clean=False, limits=None):
+        """Scan a single outline into self.body (see Body.scan).  Its stage timings are added to self.timings."""
+        try:
+            self.body.scan(imageFile, dpi, threshold, despeckle, tracer, cache, scanner, clean, limits)
+        finally:
+            self.timings.merge(self.body.timings)
+
+    async def body_scan_async(self, imageFile, dpi=300, threshold=205, despeckle=10, tracer='potrace', cache=None,
+                              scanner=None, clean=False, limits=None, executor=None):
+        """The asyncio version of body_scan() (see Body.scan_async)."""
+        try:
+            await self.body.scan_async(imageFile, dpi, threshold, despeckle, tracer, cache, scanner, clean, limits,
+                                       executor)
+        finally:
+            self.timings.merge(self.body.timings)
+
+    def body_load(self, outlineFile, element_id=None, scale=None, limits=None):
+        """Load a vector outline into self.body (see Body.load).  Its stage timings are added to self.timings."""
+        try:
+            self.body.load(outlineFile, element_id, scale, limits)
+        finally:
+            self.timings.merge(self.body.timings)
+
+    def sheet_scan(self, imageFile, dpi=300, threshold=205, despeckle=10, tracer='potrace',
+                   min_height=SHEET_MIN_HEIGHT, jobs=None, scanner=None, clean=False, limits=None):
+        """Scan a sheet of several outlines into self.sheet, one Body each (see sheet_scan).  The tallest
+        outline is also taken as self.body.  The stage timings of the sheet are added to self.timings."""
+        self.sheet = sheet_scan(imageFile, dpi, threshold, despeckle, tracer, min_height, jobs, scanner=scanner,
+                                clean=clean, timings=self.timings, limits=limits)
+        if self.sheet:
+            self.body = max(self.sheet, key=lambda body: body.feature_bbox[3] - body.feature_bbox[2])
 
     def plot(self, plot=None, plot_tangents=False):
         self.body.plot(plot, plot_tangents)
@@ -824,6 +1016,123 @@ def path_slice(path, T0=0.0, T1=1.0):
     return path_slice
 
 
+def path_longest(paths, stats=None):
+    """Return the longest of a list of paths (the first of equals), or raise SubprocessError if the list is empty
+    (the trace found no outline at all).
+
+    The candidates are ranked by cheap bounds on their length from the control points (chords below, control
+    polygon above), and the arc length quadrature (see BezierPath) is only done for the short list of candidates
+    whose upper bound could beat the best lower bound, in order, until no candidate left could beat the best.
+    """
+    if stats is None:
+        stats = {}
+    if not paths:
+        raise SubprocessError('no outline traced')
+    t = timer()
+    bpoints = [path_bpoints(p) for p in paths]
+    bounds = np.array([bezier_length_bounds(bp) for bp in bpoints])
+    shortlist = np.flatnonzero(bounds[:, 1] >= bounds[:, 0].max())
+    shortlist = shortlist[np.argsort(-bounds[shortlist, 1], kind='stable')]
+
+    best, best_length, measured = None, -1.0, 0
+    for ix in shortlist:
+        if bounds[ix, 1] < best_length:
+            break
+        length = BezierPath(bpoints[ix]).length()
+        measured += 1
+        if length > best_length or (length == best_length and ix < best):
+            best, best_length = ix, length
+    stats['select_time'] = timer() - t
+    stats['select_candidates'] = len(paths)
+    stats['select_measured'] = measured
+    return paths[best]
+
+
+def path_symmetry_axis(path, samples=1000, max_tilt=math.radians(10.0)):
+    """Find the mirror symmetry axis of a closed outline path.
+
+    The outline is sampled uniformly by arc length, and the principal axis of the samples is refined to the
+    axis through their centroid that best maps the outline onto its own reflection (the smallest mean nearest
+    neighbour distance), within max_tilt radians of the principal axis.  Returns (center, tilt), a point on
+    the axis and the angle of the axis from vertical (radians, counterclockwise).
+    """
+    # dense samples on the curve, resampled to uniform spacing along the outline
+    pts = bezier_eval(path_bpoints(path), np.linspace(0.0, 1.0, 16, endpoint=False)).ravel()
+    pts = np.append(pts, pts[0])
+    d = np.concatenate(([0.0], np.cumsum(np.abs(np.diff(pts)))))
+    s = np.linspace(0.0, d[-1], samples, endpoint=False)
+    pts = np.interp(s, d, pts.real) + 1j * np.interp(s, d, pts.imag)
+
+    center = pts.mean()
+    q = pts - center
+
+    # principal (long) axis, as an angle from vertical in (-pi/2, pi/2]
+    evals, evecs = np.linalg.eigh(np.cov(q.real, q.imag))
+    x, y = evecs[:, np.argmax(evals)]
+    tilt = math.atan2(-x, y)
+    if tilt > math.pi / 2.0:
+        tilt -= math.pi
+    elif tilt <= -math.pi / 2.0:
+        tilt += math.pi
+
+    # reflect the outline about the axis at each trial tilt and measure how well it lands on itself
+    tree = cKDTree(np.column_stack((q.real, q.imag)))
+
+    def asymmetry(phi):
+        r = cmath.exp(2j * (math.pi / 2.0 + phi)) * np.conj(q)
+        return np.mean(tree.query(np.column_stack((r.real, r.imag)))[0])
+
+    tilt = minimize_scalar(asymmetry, bounds=(tilt - max_tilt, tilt + max_tilt), method='bounded',
+                           options={'xatol': 1e-6, 'disp': 0}).x
+    return center, tilt
+
+
+def path_rotated(path, angle, origin=0j):
+    """Rotate a path of line and bezier segments by angle radians (counterclockwise) about origin, segment by
+    segment, rotating the control points of each.  Segments keep their type (a line stays a line for
+    path_compress), stay joined exactly, and a closed path stays closed."""
+    rotation = cmath.exp(1j * angle)
+    closed = path.isclosed()
+    path = Path(*[seg.__class__(*[(p - origin) * rotation + origin for p in seg.bpoints()]) for seg in path])
+    for ix, seg in enumerate(path[:-1]):
+        seg.end = path[ix + 1].start
+    if closed:
+        path[-1].end = path[0].start
+    return path
+
+
+def path_restart_top(path, x):
+    """Restart a closed path at its top most crossing of the vertical line at x, splitting the crossing
+    segment there."""
+    bpoints = path_bpoints(path)
+    # only segments whose control points straddle x can cross it (convex hull property)
+    candidates = np.flatnonzero((bpoints.real.min(axis=1) <= x) & (bpoints.real.max(axis=1) >= x))
+    best = None
+    for ix in candidates:
+        p0, c1, c2, p1 = bpoints[ix].real
+        for t in np.roots([-p0 + 3 * c1 - 3 * c2 + p1, 3 * p0 - 6 * c1 + 3 * c2, -3 * p0 + 3 * c1, p0 - x]):
+            if abs(t.imag) < 1e-9 and -1e-9 <= t.real <= 1 + 1e-9:
+                t = min(max(t.real, 0.0), 1.0)
+                y = path[ix].point(t).imag
+                if best is None or y > best[0]:
+                    best = (y, ix, t)
+    if best is None:
+        return path
+
+    y, ix, t = best
+    segs = list(path)
+    if t <= 1e-9:
+        segs = segs[ix:] + segs[:ix]
+    elif t >= 1 - 1e-9:
+        segs = segs[ix + 1:] + segs[:ix + 1]
+    else:
+        seg0, seg1 = segs[ix].split(t)
+        segs = [seg1] + segs[ix + 1:] + segs[:ix] + [seg0]
+    path = Path(*segs)
+    path[-1].end = path[0].start
+    return path
+
+
 def path_smooth(path):
     """Every adjoining segment starting handle and the previous segment ending handle is set to
     the average of the two handles."""
@@ -847,6 +1156,7 @@ def path_smooth(path):
 def path_compress(path, arc_thresh=5.0, turn_thresh=30):
     """Combine adjacent bezier curves if the curvature is low.  Don't combine more than arc_thresh arc length."""
     cpath = Path()
+    lengths = BezierPath.from_path(path).lengths
     ix = 0
     p0 = c1 = c2 = p1 = None
     arclen = 0.0
@@ -861,7 +1171,7 @@ def path_compress(path, arc_thresh=5.0, turn_thresh=30):
             # XXX Should we increase magnitude of p0->c1? for each additional segment?
 
             # add on the segments arc length
-            arclen += path[ix].length()
+            arclen += lengths[ix]
 
             # XXX Check here if the next segment is big turn, in which case terminate
             # calculate curvature relative to previous segment based on endpoint
@@ -943,54 +1253,70 @@ def path_flatten_bottom(path):
     return path
 
 
-def path_curvature(t1, path):
-    delta = 0.02
-    t0 = t1 - delta
-    t2 = t1 + delta
-    p0 = path.point(t0)
-    p1 = path.point(t1)
-    p2 = path.point(t2)
-    pm = p0 + ((p2 - p0) / 2)
-    w = np.linalg.norm(p2 - p0)
-    h = np.linalg.norm(p1 - pm)
-    r = (h / 2) + (w ** 2 / (8 * h))
-    k = 1 / r
-
-    return k
+def path_curvature(T, path):
+    """Return the curvature (unsigned, 1 / radius) of a path (a Path or BezierPath) at path parameters T, exactly
+    from the first and second derivatives of its segments (0 on a straight run)."""
+    if not isinstance(path, BezierPath):
+        path = BezierPath.from_path(path)
+    return abs(path.curvature(T))
 
 
 def path_find_slope(path, T0=0.0, T1=1.0, phi=None):
-    """Find the point on a path between T0 and T1 where the slope matches phi."""
+    """Find every point on a path (a Path or BezierPath) between T0 and T1 where the slope matches phi (by default
+    45 degrees), solved exactly segment by segment (see BezierPath.T_at_direction).  Returns an ascending array of
+    T, empty if the path never heads along phi there."""
     if phi is None:
         phi = cmath.pi / 4.0
+    if not isinstance(path, BezierPath):
+        path = BezierPath.from_path(path)
+    return path.T_at_direction(phi, T0, T1)
 
-    # search the path for the precise point where slope is phi
-    # XXX f = lambda t, slope:cmath.phase(path.unit_tangent(t))-slope
-    # XXX return brentq(f, T0, T1, args=(phi))
-    f = lambda t, slope: abs(cmath.phase(path.unit_tangent(t)) - slope)
-    return minimize_scalar(f, bounds=(T0, T1), method='bounded', args=(phi), options={'xatol': 1e-5, 'disp': 0}).x
 
+def path_find_curvature_min(path, T0=0.0, T1=1.0, samples=500):
+    """Find the point on a path (a Path or BezierPath) between T0 and T1 where the curvature is smallest.
 
-def path_find_curvature_min(path, T0=0.0, T1=1.0):
-    """Find the point on a path between T0 and T1 where the curvature is smallest."""
-    # search the path for smallest curvature
-    return minimize_scalar(path_curvature, bounds=(T0, T1), args=(path), method='bounded', options={'xatol': 1e-5, 'disp': 0}).x
+    The smallest curvature of the cached curvature profile of the path (see BezierPath.curvature_profile) within
+    [T0, T1] brackets the search, which is then refined between the profile samples either side of it.
+    """
+    if not isinstance(path, BezierPath):
+        path = BezierPath.from_path(path)
+    T, k = path.curvature_profile(samples)
+    inside = np.flatnonzero((T >= T0) & (T <= T1))
+    if not len(inside):
+        return minimize_scalar(path_curvature, bounds=(T0, T1), args=(path,), method='bounded',
+                               options={'xatol': 1e-5, 'disp': 0}).x
+    ix = inside[np.argmin(np.abs(k[inside]))]
+    lo, hi = max(T[max(ix - 1, 0)], T0), min(T[min(ix + 1, samples - 1)], T1)
+    return minimize_scalar(path_curvature, bounds=(lo, hi), args=(path,), method='bounded',
+                           options={'xatol': 1e-5, 'disp': 0}).x
 
 
 def path_compare(path, path_t0, path_t1, clothoid, clothoid_t0, clothoid_t1, nodes=100):
+    """Print the points of a path (a Path or BezierPath) and a clothoid over their T ranges, and the differences."""
     tvec_path = np.linspace(path_t0, path_t1, nodes)
     tvec_clothoid = np.linspace(clothoid_t0, clothoid_t1, nodes)
-    bez = np.array([path.point(t) for t in tvec_path])
-    clo = np.array([clothoid.p(t) for t in tvec_clothoid])
+    if not isinstance(path, BezierPath):
+        path = BezierPath.from_path(path)
+    bez = path.point(tvec_path)
+    clo = clothoid.x(tvec_clothoid) + 1j * clothoid.y(tvec_clothoid)
     print(bez)
     print(clo)
     print(bez - clo)
 
 
+def path_segment_tangents(path, bezier=None, samples=10):
+    """Return the average unit tangent of each segment of a path, over `samples` points along it, from the shared
+    frames table of its BezierPath (made from the path unless given)."""
+    if bezier is None:
+        bezier = BezierPath.from_path(path)
+    return bezier.frames(samples)[1].mean(axis=1)
+
+
 def path_extrema_t(path, seg_list, ymin=0.0, ymax=1.0, reverse=False):
-    """Based on svgpathtools function, but with bracketted search."""
-    min_point = complex(0, 0)
-    max_point = complex(0, 0)
+    """Based on svgpathtools function, but with bracketted search.  Returns the (min, max) T, each None if no
+    segment of seg_list qualifies."""
+    min_point = None
+    max_point = None
     if not reverse:
         min_extreme = 0.0
         max_extreme = 0.0
@@ -1026,6 +1352,13 @@ def path_extrema_t(path, seg_list, ymin=0.0, ymax=1.0, reverse=False):
     return min_point, max_point
 
 
+def feature_found(T, feature):
+    """Return the T of a feature of the outline, or raise ParseError if it wasn't found (T is None)."""
+    if T is None:
+        raise ParseError('no {} found on the outline'.format(feature))
+    return T
+
+
 def path_closest_t(path, p):
     """Find the T of the point on the path closest to p."""
     f = lambda t: np.linalg.norm(path.point(t) - p)
@@ -1105,18 +1438,433 @@ def phase_delta_min(p1, p2):
     return math.atan2(math.sin(p1 - p2), math.cos(p1 - p2))
 
 
+# image file types picked up when a directory is given to a batch scan
+SCAN_IMAGE_EXTS = ('.png', '.jpg', '.jpeg', '.tif', '.tiff', '.bmp', '.gif', '.pbm', '.pgm')
+
+# outline file types picked up from a directory too (point tables only when named, as a directory of scans may hold
+# summary csvs)
+SCAN_OUTLINE_EXTS = ('.svg',)
+
+# columns of the batch scan summary csv
+SCAN_SUMMARY_FIELDS = ['file', 'status', 'exit', 'seconds', 'threshold', 'bodies', 'segments', 'output', 'error']
+
+
+def scan_trace(imageFile, dpi=300, threshold=205, despeckle=10, tracer='potrace', stats=None, clean=None):
+    """Load, binarize, and trace a scanned image (or a list of overlapping scans, stitched into one image).
+    If `clean` is a dict, the bitmap is cleaned up by bitmap_clean(**clean) before it is traced.  Returns the
+    tuple (paths, attributes, svg_attributes) of the traced paths in potrace units (1/10 pixel, y up)."""
+    if stats is None:
+        stats = {}
+
+    # decode to greyscale at 100 dots per cm (.1mm resolution), via the decoder draft and reduce paths
+    with timed('load'):
+        if isinstance(imageFile, (list, tuple)):
+            gray = stitch_load(imageFile, dpi, stats=stats)
+        else:
+            gray = image_load(imageFile, dpi, stats=stats)
+
+    if threshold == 'auto':
+        # sweep candidate thresholds in parallel and keep the one that traces a single, stable body outline
+        with timed('threshold'):
+            threshold, traced = threshold_auto(gray, despeckle, tracer, stats=stats, clean=clean)
+        return traced
+
+    with timed('threshold'):
+        bitmap = gray < threshold                               # threshold to a bilevel array, True for ink
+
+    # fill the outlines and drop the specks and clutter, rather than leave it all to the tracer to trace
+    if clean is not None:
+        with timed('clean'):
+            bitmap = bitmap_clean(bitmap, stats=stats, **clean)
+
+    # XXX one could preview the threshold result with Image.fromarray(~bitmap).show()
+
+    # trace the inked region of the bitmap to bezier paths (potrace subprocess, or the built in native tracer)
+    with timed('trace'):
+        return trace_bitmap(bitmap, despeckle, tracer, stats=stats)
+
+
+async def scan_trace_async(imageFile, dpi=300, threshold=205, despeckle=10, tracer='potrace', stats=None, clean=None,
+                           executor=None):
+    """The asyncio version of scan_trace(): the decode and bitmap preparation run in the (thread pool)
+    executor, and the trace as trace_bitmap_async()."""
+    if stats is None:
+        stats = {}
+
+    with timed('load'):
+        if isinstance(imageFile, (list, tuple)):
+            gray = await run_in_executor(executor, stitch_load, imageFile, dpi, stats=stats)
+        else:
+            gray = await run_in_executor(executor, image_load, imageFile, dpi, stats=stats)
+
+    if threshold == 'auto':
+        with timed('threshold'):
+            threshold, traced = await run_in_executor(executor, threshold_auto, gray, despeckle, tracer, stats=stats,
+                                                      clean=clean)
+        return traced
+
+    with timed('threshold'):
+        bitmap = gray < threshold
+
+    if clean is not None:
+        with timed('clean'):
+            bitmap = await run_in_executor(executor, bitmap_clean, bitmap, stats=stats, **clean)
+
+    with timed('trace'):
+        return await trace_bitmap_async(bitmap, despeckle, tracer, stats=stats, executor=executor)
+
+
+def scan_resolution(dpi=300, scanner=None):
+    """Return the (dpi, scale) of a scan: the resolution to load the image at, and the scale from traced path
+    units to mm.  With a calibrated scanner profile the resolution is its measured (x, y) pair and the scale
+    is exact, otherwise the scale is left to be guessed (None)."""
+    if scanner is None:
+        return dpi, None
+    # the image is resampled to exactly 0.1mm per pixel, and potrace units are 1/10 pixel
+    return (scanner['dpi_x'], scanner['dpi_y']), 0.01
+
+
+def sheet_fit(path, attributes=None, svg_attributes=None, scale=None, limits=None):
+    """Normalize one traced outline as a Body and find its features and clothoids (a sheet_scan worker task)."""
+    body = Body()
+    with limits.active() if limits is not None else nullcontext():
+        body.normalize(path, attributes, svg_attributes, scale=scale)
+        body.features_find()
+        body.clothoids_find()
+    return body
+
+
+def sheet_scan(imageFile, dpi=300, threshold=205, despeckle=10, tracer='potrace', min_height=SHEET_MIN_HEIGHT,
+               jobs=None, stats=None, scanner=None, clean=False, timings=None, limits=None):
+    """Trace a sheet holding several outlines (e.g. top plate, back plate, and rib template) once, and fit
+    every closed outline at least min_height mm tall as its own Body.
+
+    The outlines are fit concurrently in a pool of `jobs` worker processes (default one per cpu).  An outline
+    that can't be fit is logged and left out.  Returns the list of Body, from left to right on the sheet.  If a
+    Timings registry is given, the trace stages, the wall time of the fit, and the stages of every fitted
+    Body (summed over the workers) are added to it.  If ScanLimits are given, the trace and each fit stop with
+    ScanTimeout or ScanCancelled when they run out (a fit that times out stops the whole sheet).
+    """
+    if stats is None:
+        stats = {}
+    if timings is None:
+        timings = Timings()
+    dpi, scale = scan_resolution(dpi, scanner)
+    with timings.active(), limits.active() if limits is not None else nullcontext():
+        paths, attributes, svg_attributes = scan_trace(imageFile, dpi, threshold, despeckle, tracer, stats=stats,
+                                                       clean=SHEET_CLEAN if clean else None)
+
+    # potrace units are 1/100 mm at the scan resolution of 0.1mm per pixel
+    outlines = closed_outlines(paths, min_height=100.0 * min_height)
+    outlines.sort(key=lambda path: path.bbox()[0])
+    stats['sheet_outlines'] = len(outlines)
+    stats['sheet_errors'] = []
+    logger.debug('sheet: {} of {} traced paths are outlines'.format(len(outlines), len(paths)))
+
+    t = timer()
+    bodies = []
+    with ProcessPoolExecutor(max_workers=max(min(jobs or os.cpu_count() or 1, len(outlines)), 1)) as pool:
+        futures = [pool.submit(sheet_fit, path, attributes, svg_attributes, scale, limits) for path in outlines]
+        for ix, future in enumerate(futures):
+            try:
+                body = future.result()
+            except ScanCancelled:
+                for future in futures:
+                    future.cancel()
+                raise
+            except Exception as exc:
+                logger.warning('sheet: outline {} could not be fit: {}: {}'.format(ix, exc.__class__.__name__, exc))
+                stats['sheet_errors'].append((ix, '{}: {}'.format(exc.__class__.__name__, exc)))
+                continue
+            body.scan_stats = dict(stats, sheet_outline=ix)
+            bodies.append(body)
+    stats['sheet_fit_time'] = timer() - t
+    timings.add('fit', stats['sheet_fit_time'])
+    for body in bodies:
+        timings.merge(body.timings)
+    return bodies
+
+
+def scan_inputs(inputs):
+    """Expand a list of image (or vector outline) files, directories, and glob patterns into a sorted list of
+    files."""
+    files = set()
+    for item in inputs:
+        if os.path.isdir(item):
+            for root, dirs, names in os.walk(item):
+                files.update(os.path.join(root, n) for n in names if n.lower().endswith(SCAN_IMAGE_EXTS + SCAN_OUTLINE_EXTS))
+        elif glob.has_magic(item):
+            files.update(f for f in glob.glob(item, recursive=True) if os.path.isfile(f))
+        else:
+            files.add(item)
+    return sorted(files)
+
+
+def is_outline(filename):
+    """Return whether a scan input is a vector outline file (see OUTLINE_EXTS) rather than an image."""
+    return isinstance(filename, str) and filename.lower().endswith(OUTLINE_EXTS)
+
+
+def scan_job(filename, output, dpi=300, threshold=205, despeckle=10, tracer='potrace', cache=None, sheet=False,
+             scanner=None, clean=False, timeout=None, stage_timeout=None, max_memory=None, element_id=None):
+    """Scan and fit one image (or a sheet of outlines), writing the Viola json to `output`.  Returns a summary
+    row dict.  A vector outline file (see OUTLINE_EXTS) is loaded rather than scanned (see Body.load), with the
+    path of id (or profile) `element_id` as the outline.
+
+    Every failure is caught and reported in the row (with its own exit status) so that one bad image can't
+    take down a batch.  This is the unit of work handed to the batch process pool.  The row also holds the
+    Timings of the scan, as far as it got (not written to the summary csv).
+
+    The scan is limited to `timeout` seconds, each stage of it to `stage_timeout` seconds, and the trace
+    subprocess to `max_memory` bytes (see ScanLimits).  Should the scan miss the cooperative checks, it is
+    interrupted HARD_TIMEOUT_GRACE seconds past the timeout, so a stuck scan can't wedge a batch worker.
+    """
+    row = dict.fromkeys(SCAN_SUMMARY_FIELDS, '')
+    row.update(file=filename, status='ok', exit=SUCCESS)
+    t = timer()
+    viola = Viola()
+    limits = None
+    if (timeout, stage_timeout, max_memory) != (None, None, None):
+        limits = ScanLimits(timeout, stage_timeout, max_memory)
+    try:
+        with hard_timeout(None if timeout is None else timeout + HARD_TIMEOUT_GRACE):
+            if is_outline(filename):
+                viola.body_load(filename, element_id, limits=limits)
+            elif sheet:
+                viola.sheet_scan(filename, dpi, threshold, despeckle, tracer, jobs=1, scanner=scanner, clean=clean,
+                                 limits=limits)
+                if not viola.sheet:
+                    raise ValueError('no outlines found on the sheet')
+            else:
+                viola.body_scan(filename, dpi, threshold, despeckle, tracer, cache, scanner, clean, limits)
+        with open(output, 'w') as f:
+            f.write(viola.to_json())
+        # a loaded outline was never thresholded
+        row.update(threshold='' if is_outline(filename) else viola.body.scan_stats.get('threshold', threshold),
+                   bodies=len(viola.sheet) or 1, segments=len(viola.body.path), output=output)
+    except (OSError, Image.DecompressionBombError) as exc:
+        row.update(status='bad image', exit=SCAN_BAD_IMAGE, error=str(exc))
+    except ParseError as exc:
+        row.update(status='bad outline', exit=SCAN_BAD_OUTLINE, error=str(exc))
+    except SubprocessError as exc:
+        row.update(status='trace failed', exit=SCAN_TRACE_FAILED, error=str(exc))
+    except ScanTimeout as exc:
+        row.update(status='timed out', exit=SCAN_TIMEOUT, error=str(exc))
+    except ScanCancelled as exc:
+        row.update(status='cancelled', exit=SCAN_CANCELLED, error=str(exc))
+    except Exception as exc:
+        row.update(status='failed', exit=SCAN_FAILED, error='{}: {}'.format(exc.__class__.__name__, exc))
+    row['seconds'] = round(timer() - t, 3)
+    row['timings'] = viola.timings
+    return row
+
+
+def scan_batch(files, output_dir='.', summary=None, jobs=None, **kw):
+    """Scan a list of image files in a pool of `jobs` worker processes (default one per cpu).
+
+    Each fitted Viola is written to `output_dir` as <image name>.json and a summary row per file is appended to
+    the `summary` csv (default <output_dir>/scan_summary.csv) as soon as the file completes.  Keyword arguments
+    are passed on to Viola.body_scan().  Returns the list of summary rows.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    if summary is None:
+        summary = os.path.join(output_dir, 'scan_summary.csv')
+
+    # name each output after its image, disambiguating images of the same name from different directories
+    outputs = {}
+    for filename in files:
+        stem = os.path.splitext(os.path.basename(filename))[0]
+        name, n = stem, 1
+        while name in outputs.values():
+            n += 1
+            name = '{}_{}'.format(stem, n)
+        outputs[filename] = name
+    outputs = {f: os.path.join(output_dir, name + '.json') for f, name in outputs.items()}
+
+    rows = []
+    with open(summary, 'w', newline='') as f, ProcessPoolExecutor(max_workers=jobs) as pool:
+        writer = csv.DictWriter(f, fieldnames=SCAN_SUMMARY_FIELDS, extrasaction='ignore')
+        writer.writeheader()
+        futures = {pool.submit(scan_job, filename, outputs[filename], **kw): filename for filename in files}
+        for future in as_completed(futures):
+            try:
+                row = future.result()
+            except Exception as exc:
+                # the worker itself died (e.g. killed or out of memory)
+                row = dict.fromkeys(SCAN_SUMMARY_FIELDS, '')
+                row.update(file=futures[future], status='worker died', exit=SCAN_FAILED,
+                           error='{}: {}'.format(exc.__class__.__name__, exc))
+            logger.info('{}: {} ({}s) {}'.format(row['file'], row['status'], row['seconds'], row['error']).rstrip())
+            writer.writerow(row)
+            f.flush()
+            rows.append(row)
+    return rows
+
+
+async def scan_pipeline(files, concurrency=4, executor=None, timings=None, **kw):
+    """Scan a list of image files with Viola.body_scan_async(), at most `concurrency` at a time, so the decode,
+    trace, and fit of different images overlap.  Keyword arguments are passed on to body_scan_async().
+
+    Returns the list of results in the order of files, each a Viola or the exception its scan raised.  If a
+    Timings registry is given, the stage timings of every scan are added to it, and the elapsed time of the
+    whole pipeline as the 'pipeline' stage: stage totals well over it are stages that overlapped.
+    """
+    if timings is None:
+        timings = Timings()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(filename):
+        async with semaphore:
+            viola = Viola()
+            try:
+                await viola.body_scan_async(filename, executor=executor, **kw)
+            finally:
+                timings.merge(viola.timings)
+            return viola
+
+    with timings.timer('pipeline'):
+        return await asyncio.gather(*[one(filename) for filename in files], return_exceptions=True)
+
+
+def threshold_option(ctx, param, value):
+    """Click callback to accept a threshold of 0 to 255, or 'auto'."""
+    if value == 'auto':
+        return value
+    try:
+        value = int(value)
+    except ValueError:
+        value = -1
+    if not 0 <= value <= 255:
+        raise click.BadParameter('expected an integer from 0 to 255, or "auto"')
+    return value
+
+
 @click.command()
+@click.argument('inputs', nargs=-1, type=click.Path())
 @click.option('--filename', '-f', 'filename', default='clean.png', type=click.Path(),
-              help='Path to a scanned viol image.')
-def scan(filename):
+              help='Path to a scanned viol image, or a vector outline ({}).'.format(', '.join(OUTLINE_EXTS)))
+@click.option('--tracer', '-t', 'tracer', default='potrace', type=click.Choice(sorted(TRACERS)), show_default=True,
+              help='Bitmap tracing engine (potrace subprocess or built in native tracer).')
+@click.option('--threshold', 'threshold', default='205', callback=threshold_option, show_default=True,
+              help='Grey level (0-255) below which a pixel is ink, or "auto" to sweep thresholds in parallel.')
+@click.option('--cache/--no-cache', 'cache', default=True, show_default=True,
+              help='Reuse traced body paths of previously scanned images (cached in {}).'.format(DEFAULT_CACHE_DIR))
+@click.option('--jobs', '-j', 'jobs', default=None, type=click.IntRange(min=1),
+              help='Number of batch worker processes.  [default: one per cpu]')
+@click.option('--output', '-o', 'output', default='.', type=click.Path(file_okay=False), show_default=True,
+              help='Batch output directory for the fitted viol json files and the scan summary.')
+@click.option('--summary', 'summary', default=None, type=click.Path(dir_okay=False),
+              help='Batch summary csv file.  [default: OUTPUT/scan_summary.csv]')
+@click.option('--sheet', 'sheet', is_flag=True, default=False,
+              help='Fit every outline at least {:g}mm tall on the image (e.g. plates and templates on one '
+                   'sheet), not just the longest.'.format(SHEET_MIN_HEIGHT))
+@click.option('--scanner', 'scanner', default=None,
+              help='Name of the calibrated scanner profile (see viol calibrate) of the images.  [default: 300 dpi]')
+@click.option('--stitch', 'stitch', is_flag=True, default=False,
+              help='Stitch the INPUTS, overlapping scans of one outline in order, into one image and scan that.')
+@click.option('--clean/--no-clean', 'clean', default=False, show_default=True,
+              help='Fill the outlines and remove specks and clutter from the thresholded image before tracing.')
+@click.option('--timings', 'timings', is_flag=True, default=False,
+              help='Report the seconds spent in each stage of the scan, and the pipeline counters.')
+@click.option('--timeout', 'timeout', default=None, type=click.FloatRange(min=0, min_open=True),
+              help='Give up on an image that takes longer than this many seconds to scan.  [default: no limit]')
+@click.option('--stage-timeout', 'stage_timeout', default=None, type=click.FloatRange(min=0, min_open=True),
+              help='Give up on an image when one stage of its scan takes longer than this many seconds.')
+@click.option('--max-memory', 'max_memory', default=None, type=click.IntRange(min=1),
+              help='Cap the memory of the potrace subprocess at this many MB.  [default: no limit]')
+@click.option('--element', 'element_id', default=None,
+              help='Id of the outline path in a vector file, or heading of the profile in a point table.  '
+                   '[default: the largest closed path, or the first profile]')
+@click.pass_context
+def scan(ctx, inputs, filename, tracer, threshold, cache, jobs, output, summary, sheet, scanner, stitch, clean,
+         timings, timeout, stage_timeout, max_memory, element_id):
     """Viol scan command.
 
     Scan a viola image, deduce the geometry, and curve fit the instrument with a
     combination of Bezier curves and Clothoids.
+
+    If INPUTS (image files, directories, or glob patterns) are given, the images are
+    scanned unattended in a pool of worker processes.  Each fitted viol is saved as json
+    in the output directory with a summary row per image.  The command exits with an
+    error status if any image failed.
+
+    With --sheet the image is traced once and each outline on it is fit as its own
+    body, in parallel.
+
+    With --stitch the INPUTS are the passes of an outline too big for the scanner bed,
+    each overlapping the one before it by 20mm or so.  They are registered and blended
+    into one image, which is scanned as if it were --filename.
+
+    With --timings the stage times and counters of the scan are printed (summed over
+    the images of a batch).
+
+    With --timeout or --stage-timeout a scan that runs too long is stopped (and reported
+    as timed out in a batch), rather than left to hang.
+
+    A vector outline (e.g. an svg drawing) skips the scan and trace: its path, by --element
+    id or else the largest closed one, goes straight to the fit.  So does a table of (x, y)
+    mm outline points (.csv or .prn, e.g. from a digitized drawing), fit with beziers.
     """
+    cache = ScanCache() if cache else None
+    if scanner is not None:
+        name, scanner = scanner, ScannerProfiles().get(scanner)
+        if scanner is None:
+            raise click.BadParameter('no scanner profile named "{}", see viol calibrate'.format(name),
+                                     param_hint='--scanner')
+
+    if max_memory is not None:
+        max_memory *= 1024 * 1024
+
+    if stitch:
+        if len(inputs) < 2:
+            raise click.BadParameter('expected two or more overlapping scans to stitch', param_hint='INPUTS')
+        filename, inputs = list(inputs), None
+
+    if inputs:
+        files = scan_inputs(inputs)
+        if not files:
+            raise click.BadParameter('no image files found', param_hint='INPUTS')
+        rows = scan_batch(files, output, summary, jobs, threshold=threshold, tracer=tracer, cache=cache,
+                          sheet=sheet, scanner=scanner, clean=clean, timeout=timeout, stage_timeout=stage_timeout,
+                          max_memory=max_memory, element_id=element_id)
+        failed = [row for row in rows if row['exit'] != SUCCESS]
+        logger.info('Scanned {} images, {} failed.'.format(len(rows), len(failed)))
+        if timings:
+            total = Timings()
+            for row in rows:
+                if row.get('timings'):
+                    total.merge(row['timings'])
+            click.echo(total.report())
+        ctx.exit(ERROR if failed else SUCCESS)
+
     viola = Viola()
-    viola.body_scan(filename)
-    viola.plot()
+    limits = ScanLimits(timeout, stage_timeout, max_memory)
+    try:
+        if is_outline(filename):
+            viola.body_load(filename, element_id, limits=limits)
+        elif sheet:
+            viola.sheet_scan(filename, threshold=threshold, tracer=tracer, jobs=jobs, scanner=scanner, clean=clean,
+                             limits=limits)
+        else:
+            viola.body_scan(filename, threshold=threshold, tracer=tracer, cache=cache, scanner=scanner, clean=clean,
+                            limits=limits)
+    except StitchError as exc:
+        logger.error('Stitching {} failed: {}'.format(', '.join(filename), exc))
+        ctx.exit(SCAN_STITCH_FAILED)
+    except ParseError as exc:
+        logger.error('Loading {} failed: {}'.format(filename, exc))
+        ctx.exit(SCAN_BAD_OUTLINE)
+    except ScanCancelled as exc:
+        logger.error('Scanning {} stopped: {}'.format(filename, exc))
+        ctx.exit(SCAN_TIMEOUT if isinstance(exc, ScanTimeout) else SCAN_CANCELLED)
+    if timings:
+        click.echo(viola.timings.report())
+    if sheet:
+        for body in viola.sheet:
+            body.plot()
+            body.plot_curvature()
+    else:
+        viola.plot()
     plt.show(block=False)
     input('<cr> to close program ->')
     plt.close()
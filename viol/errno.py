@@ -12,3 +12,11 @@ SUCCESS                  = 0
 ERROR                    = 1
 UNKNOWN_ERROR            = 2
 NO_MATCHES_FOUND         = 10
+SCAN_FAILED              = 20
+SCAN_BAD_IMAGE           = 21
+SCAN_TRACE_FAILED        = 22
+SCAN_STITCH_FAILED       = 23
+SCAN_TIMEOUT             = 24
+SCAN_CANCELLED           = 25
+SCAN_BAD_OUTLINE         = 26
+CALIBRATE_FAILED         = 30
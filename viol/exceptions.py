@@ -36,6 +36,22 @@ class SubprocessError(ViolError):
     """Raised when there is an exit error from a subprocess (shell) command."""
 
 
+class CalibrationError(ViolError):
+    """Raised when a calibration target can't be measured."""
+
+
+class StitchError(ViolError):
+    """Raised when overlapping scans can't be registered."""
+
+
+class ScanCancelled(ViolError):
+    """Raised when a scan is stopped before it completes."""
+
+
+class ScanTimeout(ScanCancelled):
+    """Raised when a scan, or a stage of it, runs past its time limit."""
+
+
 def CustomExceptionHandler(cls, handler, ignore_args=None):
     """A super class to allow viol to customize exception handling of underlying class."""
 
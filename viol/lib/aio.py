@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+"""
+    viol.lib.aio
+    ~~~~~~~~~~~~
+
+    asyncio helpers for the scan pipeline.
+
+    :copyright: Copyright (c) 2021 Bit Harmony Ltd. All rights reserved. See AUTHORS.
+    :license: PROPRIETARY, see LICENSE for details.
+"""
+import asyncio
+import contextvars
+import functools
+import logging
+
+__all__ = ['run_in_executor']
+
+logger = logging.getLogger(__name__)
+
+
+def run_in_executor(executor, fn, *args, **kwargs):
+    """Return an awaitable of fn(*args, **kwargs) run in a thread pool executor (None for the default executor
+    of the running loop).
+
+    The call runs in a copy of the current context, so the active timings and limits of the scan (see
+    viol.lib.timing and viol.lib.limits) carry over to the worker thread, as they would to a plain call.
+    """
+    loop = asyncio.get_running_loop()
+    return loop.run_in_executor(executor, functools.partial(contextvars.copy_context().run, fn, *args, **kwargs))
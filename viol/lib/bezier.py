@@ -0,0 +1,538 @@
+# -*- coding: utf-8 -*-
+"""
+    viol.lib.bezier
+    ~~~~~~~~~~~~~~~
+
+    Cubic bezier curve fitting of sampled outlines, and array backed bezier paths.
+
+    Points are carried as complex numbers (x + yj) in the same manner as svgpathtools.
+
+    :copyright: Copyright (c) 2021 Bit Harmony Ltd. All rights reserved. See AUTHORS.
+    :license: PROPRIETARY, see LICENSE for details.
+"""
+import numpy as np
+from svgpathtools import Path, CubicBezier
+
+__all__ = ['bezier_fit', 'bezier_fit_closed', 'polyline_corners', 'path_bpoints', 'bezier_path', 'bezier_eval',
+           'bezier_split', 'bezier_area', 'bezier_length_bounds', 'BezierPath']
+
+# the nodes (on [0, 1]) and weights of the segment arc length quadrature: 16 point gauss-legendre on each of 4
+# panels, which holds the length of a traced segment to ~1e-10 (relative) of that of svgpathtools
+_GL_PANELS = 4
+_GL_NODES, _GL_WEIGHTS = np.polynomial.legendre.leggauss(16)
+_GL_NODES = (((_GL_NODES + 1.0) / 2.0)[np.newaxis, :] + np.arange(_GL_PANELS)[:, np.newaxis]).ravel() / _GL_PANELS
+_GL_WEIGHTS = np.tile(_GL_WEIGHTS / (2.0 * _GL_PANELS), _GL_PANELS)
+
+
+def _unit(v):
+    """Return v scaled to a unit vector (or 0 if v has no length)."""
+    mag = abs(v)
+    return v / mag if mag > 0 else 0j
+
+
+def _bernstein(u):
+    """Return the four cubic bernstein basis vectors evaluated at the parameter vector u."""
+    mu = 1.0 - u
+    return mu ** 3, 3 * u * mu ** 2, 3 * u ** 2 * mu, u ** 3
+
+
+def _bez(bpoints, u):
+    """Evaluate a cubic bezier (and its first and second derivatives) at the parameter vector u."""
+    p0, c1, c2, p1 = bpoints
+    b0, b1, b2, b3 = _bernstein(u)
+    mu = 1.0 - u
+    q = b0 * p0 + b1 * c1 + b2 * c2 + b3 * p1
+    dq = 3 * (mu ** 2 * (c1 - p0) + 2 * u * mu * (c2 - c1) + u ** 2 * (p1 - c2))
+    ddq = 6 * (mu * (c2 - 2 * c1 + p0) + u * (p1 - 2 * c2 + c1))
+    return q, dq, ddq
+
+
+def _dbez(bpoints, u):
+    """Evaluate the first derivative of a cubic bezier at the parameter vector u."""
+    p0, c1, c2, p1 = bpoints
+    mu = 1.0 - u
+    return 3 * (mu * mu * (c1 - p0) + 2 * u * mu * (c2 - c1) + u * u * (p1 - c2))
+
+
+def _chord_param(pts):
+    """Chord length parameterization of the points to [0, 1]."""
+    d = np.concatenate(([0.0], np.cumsum(np.abs(np.diff(pts)))))
+    return d / d[-1] if d[-1] > 0 else np.linspace(0.0, 1.0, len(pts))
+
+
+def _generate(pts, u, tan1, tan2):
+    """Least squares solve for the control handle lengths of a cubic through the end points of pts with the
+    end tangents tan1 (pointing into the curve at the start) and tan2 (pointing into the curve at the end)."""
+    p0, p1 = pts[0], pts[-1]
+    b0, b1, b2, b3 = _bernstein(u)
+    a1 = tan1 * b1
+    a2 = tan2 * b2
+    tmp = pts - (p0 * (b0 + b1) + p1 * (b2 + b3))
+    c00 = np.sum(np.abs(a1) ** 2)
+    c01 = np.sum((a1 * np.conj(a2)).real)
+    c11 = np.sum(np.abs(a2) ** 2)
+    x0 = np.sum((a1 * np.conj(tmp)).real)
+    x1 = np.sum((a2 * np.conj(tmp)).real)
+    det = c00 * c11 - c01 * c01
+    seg_len = abs(p1 - p0)
+    eps = 1.0e-6 * seg_len
+    if abs(det) > 1.0e-12:
+        alpha1 = (x0 * c11 - x1 * c01) / det
+        alpha2 = (c00 * x1 - c01 * x0) / det
+    else:
+        alpha1 = alpha2 = 0.0
+    # a degenerate (or backwards) handle falls back to the classic one third chord heuristic
+    if alpha1 < eps or alpha2 < eps:
+        alpha1 = alpha2 = seg_len / 3.0
+    return (p0, p0 + alpha1 * tan1, p1 + alpha2 * tan2, p1)
+
+
+def _reparameterize(pts, u, bpoints):
+    """One Newton-Raphson step to move each u to the parameter of the closest point on the curve."""
+    q, dq, ddq = _bez(bpoints, u)
+    d = q - pts
+    num = (d * np.conj(dq)).real
+    den = np.abs(dq) ** 2 + (d * np.conj(ddq)).real
+    step = np.divide(num, den, out=np.zeros_like(num), where=den != 0)
+    return np.clip(u - step, 0.0, 1.0)
+
+
+def _max_error(pts, u, bpoints):
+    """Return the largest squared distance between the points and the curve, and the index where it occurs."""
+    q = _bez(bpoints, u)[0]
+    dist = np.abs(q - pts) ** 2
+    ix = int(np.argmax(dist[1:-1])) + 1 if len(pts) > 2 else 0
+    return dist[ix], ix
+
+
+def _fit(pts, tan1, tan2, max_error, segs, max_iterations=4):
+    """Recursively fit the points with cubic beziers (Schneider, Graphics Gems 1990)."""
+    if len(pts) == 2:
+        dist = abs(pts[1] - pts[0]) / 3.0
+        segs.append((pts[0], pts[0] + dist * tan1, pts[1] + dist * tan2, pts[1]))
+        return
+
+    err_sq = max_error ** 2
+    u = _chord_param(pts)
+    bpoints = _generate(pts, u, tan1, tan2)
+    error, split = _max_error(pts, u, bpoints)
+    if error < err_sq:
+        segs.append(bpoints)
+        return
+
+    # if the error is not too large, try some reparameterization and iteration
+    if error < 4 * err_sq:
+        for i in range(max_iterations):
+            u = _reparameterize(pts, u, bpoints)
+            bpoints = _generate(pts, u, tan1, tan2)
+            error, split = _max_error(pts, u, bpoints)
+            if error < err_sq:
+                segs.append(bpoints)
+                return
+
+    # fitting failed, so split at the point of max error and fit each half recursively
+    center = _unit(pts[split - 1] - pts[split + 1])
+    if center == 0:
+        center = _unit(-1j * (pts[split] - pts[split - 1]))
+    _fit(pts[:split + 1], tan1, center, max_error, segs, max_iterations)
+    _fit(pts[split:], -center, tan2, max_error, segs, max_iterations)
+
+
+def _end_tangent(pts, reach=3):
+    """Estimate the unit tangent pointing into the curve from the first point of pts."""
+    reach = min(reach, len(pts) - 1)
+    return _unit(np.sum(pts[1:reach + 1] - pts[0]))
+
+
+def bezier_fit(pts, max_error=1.0, tan1=None, tan2=None):
+    """Fit an open polyline of complex points with a minimal list of cubic bezier segments.
+
+    Every point is within max_error of the fitted curve.  The end tangents are estimated from the points
+    unless tan1 (leaving the first point) or tan2 (entering the last point) unit vectors are given.
+    Returns an svgpathtools Path of CubicBezier segments.
+    """
+    pts = np.asarray(pts, dtype=complex)
+    if tan1 is None:
+        tan1 = _end_tangent(pts)
+    if tan2 is None:
+        tan2 = -_end_tangent(pts[::-1])
+    segs = []
+    _fit(pts, tan1, -tan2, max_error, segs)
+    return _to_path(segs)
+
+
+def bezier_fit_closed(pts, max_error=1.0, corners=None):
+    """Fit a closed polyline of complex points (first point not repeated) with cubic bezier segments.
+
+    The curve starts and ends at pts[0] and is split into runs at the `corners` indices, where the tangent is
+    allowed to be discontinuous.  Every other join, including pts[0] if it is not a corner, is smooth.
+    Returns a closed svgpathtools Path of CubicBezier segments.
+    """
+    pts = np.asarray(pts, dtype=complex)
+    n = len(pts)
+    if corners is None:
+        corners = []
+    corners = set(int(c) % n for c in corners)
+    breaks = sorted(corners | {0})
+
+    def tangent_at(ix):
+        # central difference tangent for smooth breaks
+        return _unit(pts[(ix + 1) % n] - pts[ix - 1])
+
+    segs = []
+    for k, b0 in enumerate(breaks):
+        b1 = breaks[(k + 1) % len(breaks)]
+        # unroll the run across the wrap at pts[0]
+        ix = np.arange(b0, b1 + n + 1 if b1 <= b0 else b1 + 1) % n
+        run = pts[ix]
+        if len(run) < 2:
+            continue
+        tan1 = _end_tangent(run) if b0 in corners else tangent_at(b0)
+        tan2 = _end_tangent(run[::-1]) if b1 in corners else -tangent_at(b1)
+        _fit(run, tan1, tan2, max_error, segs)
+
+    path = _to_path(segs)
+    if len(path):
+        path[-1].end = path[0].start
+    return path
+
+
+def _to_path(segs):
+    """Build a continuous svgpathtools Path from a list of cubic bezier point tuples."""
+    path = Path(*[CubicBezier(*[complex(p) for p in bpoints]) for bpoints in segs])
+    for ix, seg in enumerate(path[:-1]):
+        seg.end = path[ix + 1].start
+    return path
+
+
+def polyline_corners(pts, reach=4, angle=np.radians(70)):
+    """Return the indices of a closed polyline of complex points where the direction turns by more than
+    `angle` radians over `reach` points either side.  Only the sharpest point of each turn is returned."""
+    pts = np.asarray(pts, dtype=complex)
+    n = len(pts)
+    if n < 2 * reach + 1:
+        return np.array([], dtype=int)
+    v_in = pts - np.roll(pts, reach)
+    v_out = np.roll(pts, -reach) - pts
+    with np.errstate(invalid='ignore', divide='ignore'):
+        turn = np.abs(np.angle(v_out / v_in))
+    turn = np.nan_to_num(turn)
+    # non-maximum suppression over the reach window
+    peak = np.ones(n, dtype=bool)
+    for k in range(1, reach + 1):
+        peak &= (turn >= np.roll(turn, k)) & (turn > np.roll(turn, -k))
+    return np.flatnonzero(peak & (turn > angle))
+
+
+def path_bpoints(path):
+    """Return the control points of the segments of an svgpathtools Path as an (N, 4) complex array.
+
+    Lines and quadratic beziers are raised to (exactly equivalent) cubics.
+    """
+    bpoints = np.empty((len(path), 4), dtype=complex)
+    for ix, seg in enumerate(path):
+        bp = seg.bpoints()
+        if len(bp) == 4:
+            bpoints[ix] = bp
+        elif len(bp) == 2:
+            p0, p1 = bp
+            bpoints[ix] = (p0, p0 + (p1 - p0) / 3.0, p1 + (p0 - p1) / 3.0, p1)
+        elif len(bp) == 3:
+            p0, c, p1 = bp
+            bpoints[ix] = (p0, p0 + 2.0 * (c - p0) / 3.0, p1 + 2.0 * (c - p1) / 3.0, p1)
+        else:
+            raise ValueError('unsupported path segment {!r}'.format(seg))
+    return bpoints
+
+
+def bezier_path(bpoints, closed=False):
+    """Build a continuous svgpathtools Path of CubicBezier segments from an (N, 4) complex array of control
+    points, joining each segment end exactly to the next start (and the last to the first if closed)."""
+    path = _to_path(np.asarray(bpoints, dtype=complex).tolist())
+    if closed and len(path):
+        path[-1].end = path[0].start
+    return path
+
+
+def bezier_eval(bpoints, t):
+    """Evaluate cubic bezier segments, given as an (N, 4) complex array of control points, at the parameter
+    vector t.  Returns an (N, len(t)) complex array of points."""
+    bpoints = np.asarray(bpoints, dtype=complex)
+    b0, b1, b2, b3 = _bernstein(np.asarray(t, dtype=float)[np.newaxis, :])
+    return b0 * bpoints[:, 0:1] + b1 * bpoints[:, 1:2] + b2 * bpoints[:, 2:3] + b3 * bpoints[:, 3:4]
+
+
+def bezier_split(bpoints, n):
+    """Split cubic bezier segments, given as an (N, 4) complex array of control points, each into n (a count per
+    segment, or one for all) pieces of equal parameter range.  The pieces trace the segments exactly.  Returns
+    the (sum(n), 4) complex array of control points of the pieces, in order."""
+    bpoints = np.asarray(bpoints, dtype=complex)
+    n = np.broadcast_to(np.asarray(n, dtype=int), len(bpoints))
+    seg = np.repeat(np.arange(len(bpoints)), n)
+    k = np.arange(len(seg)) - np.repeat(np.cumsum(n) - n, n)
+    du = 1.0 / n[seg]
+    u0 = k * du
+    p = bpoints[seg].T
+    q0, dq0, _ = _bez(p, u0)
+    q1, dq1, _ = _bez(p, u0 + du)
+    return np.stack([q0, q0 + du / 3.0 * dq0, q1 - du / 3.0 * dq1, q1], axis=1)
+
+
+def _cross(a, b):
+    return (np.conj(a) * b).imag
+
+
+def bezier_area(bpoints):
+    """Return the signed area (positive counterclockwise) enclosed by closed cubic bezier segments, given as an
+    (N, 4) complex array of control points.  The area is exact, from Green's theorem on the bernstein basis."""
+    p0, c1, c2, p1 = np.asarray(bpoints, dtype=complex).T
+    return float(np.sum(6 * _cross(p0, c1) + 3 * _cross(p0, c2) + _cross(p0, p1) +
+                        3 * _cross(c1, c2) + 3 * _cross(c1, p1) + 6 * _cross(c2, p1)) / 20.0)
+
+
+def bezier_length_bounds(bpoints):
+    """Return (lower, upper) bounds on the total arc length of cubic bezier segments given as an (N, 4)
+    complex array of control points: the sum of the chords and the length of the control polygons."""
+    bpoints = np.asarray(bpoints, dtype=complex)
+    chord = np.sum(np.abs(bpoints[:, 3] - bpoints[:, 0]))
+    polygon = np.sum(np.abs(np.diff(bpoints, axis=1)))
+    return float(chord), float(polygon)
+
+
+def _quadratic_roots01(a, b, c):
+    """Return the real roots in [0, 1] of the quadratics a t^2 + b t + c (arrays of coefficients) as an
+    (..., 2) array, NaN where there is no such root.  A vanishing a falls back to the linear root."""
+    a, b, c = np.broadcast_arrays(*[np.asarray(v, dtype=float) for v in (a, b, c)])
+    roots = np.full(a.shape + (2,), np.nan)
+    scale = np.maximum(np.maximum(np.abs(a), np.abs(b)), np.abs(c))
+    linear = np.abs(a) <= 1e-12 * scale
+    with np.errstate(divide='ignore', invalid='ignore'):
+        disc = b * b - 4 * a * c
+        sq = np.sqrt(np.where(disc >= 0, disc, np.nan))
+        # the numerically stable pair of roots
+        q = -0.5 * (b + np.copysign(sq, b))
+        roots[..., 0] = np.where(linear, -c / b, q / a)
+        roots[..., 1] = np.where(linear, np.nan, c / q)
+    roots[~((roots >= 0) & (roots <= 1))] = np.nan
+    return roots
+
+
+def _scalar(value):
+    """Return a 0-d array (or numpy scalar) as a plain python number, and any other array as is."""
+    return np.asarray(value).item() if np.ndim(value) == 0 else value
+
+
+class BezierPath(object):
+    """A path of cubic bezier segments held as one contiguous (N, 4) complex array of control points.
+
+    The path parameter T runs from 0 to 1 over the segments in proportion to their arc lengths, and the segment
+    parameter t linearly within each segment, exactly as for an svgpathtools Path, so a T is interchangeable
+    between the two.  The segment arc lengths are computed once, by composite gauss-legendre quadrature, and cached
+    with their running total, so the arc length between any two T, and the T at any arc length, take a binary
+    search and one quadrature (or a few Newton steps) within a segment.  point(), tangent(), curvature() and the
+    arc length methods evaluate a whole array at once, and return a scalar for a scalar argument.
+    The control points are read only: a changed path is a new BezierPath.
+    """
+
+    def __init__(self, bpoints):
+        self.bpoints = np.array(bpoints, dtype=complex).reshape(-1, 4)
+        self.bpoints.flags.writeable = False
+        self._lengths = None
+        self._S = None
+        self._T = None
+        self._frames = {}
+        self._profiles = {}
+
+    @classmethod
+    def from_path(cls, path):
+        """Make a BezierPath of an svgpathtools Path (lines and quadratics are raised to cubics)."""
+        return cls(path_bpoints(path))
+
+    def to_path(self):
+        """Return the path as an svgpathtools Path of CubicBezier segments (closed if it ends where it starts)."""
+        return bezier_path(self.bpoints, closed=self.isclosed())
+
+    def __len__(self):
+        return len(self.bpoints)
+
+    def __repr__(self):
+        return '<{}({} segments)>'.format(self.__class__.__name__, len(self))
+
+    def isclosed(self):
+        return len(self) > 0 and self.bpoints[-1, 3] == self.bpoints[0, 0]
+
+    @property
+    def lengths(self):
+        """The arc length of each segment."""
+        if self._lengths is None:
+            dq = _dbez(self.bpoints.T[:, :, np.newaxis], _GL_NODES)
+            self._lengths = np.abs(dq).dot(_GL_WEIGHTS)
+        return self._lengths
+
+    @property
+    def S(self):
+        """The arc length from the start of the path to the start of each segment, and to the end of the path
+        (N + 1 values)."""
+        if self._S is None:
+            self._S = np.concatenate(([0.0], np.cumsum(self.lengths)))
+        return self._S
+
+    @property
+    def T(self):
+        """The path parameter T at the start of each segment, and 1.0 at the end of the path (N + 1 values)."""
+        if self._T is None:
+            S = self.S
+            self._T = S / S[-1] if S[-1] > 0 else np.linspace(0.0, 1.0, len(self) + 1)
+        return self._T
+
+    def _partial(self, ix, t):
+        """Return the arc lengths from the start of segments ix to their segment parameters t."""
+        p = np.moveaxis(self.bpoints[ix], -1, 0)[..., np.newaxis]
+        dq = _dbez(p, t[..., np.newaxis] * _GL_NODES)
+        return t * np.abs(dq).dot(_GL_WEIGHTS)
+
+    def length(self, T0=0.0, T1=1.0):
+        """Return the arc length of the path from T0 to T1 (as svgpathtools length), by default all of it."""
+        if np.ndim(T0) == 0 and np.ndim(T1) == 0 and T0 == 0.0 and T1 == 1.0:
+            return float(self.S[-1])
+        s0, s1 = self.length_at(np.stack(np.broadcast_arrays(T0, T1)))
+        return _scalar(s1 - s0)
+
+    def length_at(self, T):
+        """Return the arc lengths from the start of the path to path parameters T."""
+        ix, t = self.T2t(T)
+        return _scalar(self.S[ix] + self._partial(ix, t))
+
+    def T_at_length(self, s, steps=6):
+        """Return the path parameters T at arc lengths s from the start of the path (clipped to the path), by
+        Newton steps on the arc length within each segment from a linear first guess."""
+        s = np.clip(np.asarray(s, dtype=float), 0.0, self.S[-1])
+        ix = np.clip(np.searchsorted(self.S[1:], s, side='left'), 0, len(self) - 1)
+        target = s - self.S[ix]
+        lengths = self.lengths[ix]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            t = np.where(lengths > 0, target / lengths, 0.0)
+            for i in range(steps):
+                speed = np.abs(_dbez(np.moveaxis(self.bpoints[ix], -1, 0), t))
+                error = self._partial(ix, t) - target
+                t = np.clip(t - np.where(speed > 0, error / speed, 0.0), 0.0, 1.0)
+        return _scalar(self.t2T(ix, t))
+
+    def T_at_direction(self, phi, T0=0.0, T1=1.0):
+        """Return every path parameter T from T0 to T1 (ascending) where the tangent points in the direction phi
+        (radians counterclockwise from the x axis).
+
+        The derivative of a cubic is parallel to the direction e^(i phi) where its cross product with it, a
+        quadratic in t, vanishes, so the crossings of all the segments spanning [T0, T1] are solved at once and
+        exactly, keeping those heading along phi rather than against it.  A straight run along phi gives its
+        middle.
+        """
+        e = np.exp(1j * phi)
+        (ix0, ix1), _ = self.T2t([T0, T1])
+        ix = np.arange(ix0, ix1 + 1)
+        p0, c1, c2, p1 = self.bpoints[ix].T
+        A, B, C = c1 - p0, c2 - c1, p1 - c2
+        a, b, c = _cross(A - 2 * B + C, e), 2 * _cross(B - A, e), _cross(A, e)
+        t = _quadratic_roots01(a, b, c)
+        size = np.maximum(np.maximum(np.abs(A), np.abs(B)), np.abs(C))
+        straight = np.maximum(np.maximum(np.abs(a), np.abs(b)), np.abs(c)) <= 1e-12 * size
+        t[straight, 0] = 0.5
+        found = ~np.isnan(t)
+        row = np.nonzero(found)[0]
+        t = t[found]
+        # the direction of the derivative (dq / 3), or of the second derivative where it vanishes
+        d = A[row] + 2 * t * (B - A)[row] + t * t * (A - 2 * B + C)[row]
+        d = np.where(np.abs(d) > 0, d, (B - A)[row] + t * (A - 2 * B + C)[row])
+        T = self.T[ix[row]] + t * (self.T[ix[row] + 1] - self.T[ix[row]])
+        T = np.sort(T[((np.conj(d) * e).real > 0) & (T >= T0) & (T <= T1)])
+        # the end of one segment is the start of the next
+        return T[np.diff(T, prepend=-np.inf) > 1e-12]
+
+    def resample(self, n):
+        """Return n points evenly spaced by arc length along the path, from its start to its end."""
+        return self.point(self.T_at_length(np.linspace(0.0, self.S[-1], n)))
+
+    def T2t(self, T):
+        """Return the segment indices and segment parameters t of path parameters T (as svgpathtools T2t)."""
+        T = np.asarray(T, dtype=float)
+        bounds = self.T
+        ix = np.clip(np.searchsorted(bounds[1:], T, side='left'), 0, len(self) - 1)
+        T0 = bounds[ix]
+        span = bounds[ix + 1] - T0
+        t = (T - T0) / np.where(span > 0, span, 1.0)
+        return ix, np.clip(t, 0.0, 1.0)
+
+    def t2T(self, ix, t):
+        """Return the path parameters T of segment indices and segment parameters t (as svgpathtools t2T)."""
+        ix = np.asarray(ix)
+        return _scalar(self.T[ix] + np.asarray(t, dtype=float) * (self.T[ix + 1] - self.T[ix]))
+
+    def _bez(self, T):
+        """Evaluate the points, and the first and second derivatives by t, at path parameters T."""
+        ix, t = self.T2t(T)
+        return _bez(np.moveaxis(self.bpoints[ix], -1, 0), t)
+
+    def point(self, T):
+        """Return the points at path parameters T."""
+        return _scalar(self._bez(T)[0])
+
+    def tangent(self, T):
+        """Return the unit tangents at path parameters T.  Where a segment has a zero derivative (at a
+        degenerate end handle), the tangent is the limiting direction of the second derivative."""
+        q, dq, ddq = self._bez(T)
+        d = np.where(np.abs(dq) > 0, dq, ddq)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return _scalar(np.where(np.abs(d) > 0, d / np.abs(d), 0j))
+
+    def curvature(self, T):
+        """Return the signed curvature (positive turning counterclockwise) at path parameters T, 0 where the
+        derivative vanishes."""
+        q, dq, ddq = self._bez(T)
+        speed = np.abs(dq)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return _scalar(np.where(speed > 0, _cross(dq, ddq) / speed ** 3, 0.0))
+
+    def frames(self, k=10):
+        """Return the (points, tangents, normals, curvatures) of every segment at k evenly spaced segment
+        parameters t from 0 to 1, each an (N, k) array, computed in one pass over the control points and cached.
+
+        The tangents are unit vectors (as tangent()), the normals are the tangents turned a quarter counterclockwise
+        (so inwards on a counterclockwise outline), and the curvatures are signed (as curvature()).
+        """
+        if k not in self._frames:
+            p = self.bpoints.T[:, :, np.newaxis]
+            q, dq, ddq = _bez(p, np.linspace(0.0, 1.0, k))
+            speed = np.abs(dq)
+            d = np.where(speed > 0, dq, ddq)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                tangents = np.where(np.abs(d) > 0, d / np.abs(d), 0j)
+                curvatures = np.where(speed > 0, _cross(dq, ddq) / speed ** 3, 0.0)
+            for a in (q, tangents, curvatures):
+                a.flags.writeable = False
+            self._frames[k] = (q, tangents, 1j * tangents, curvatures)
+        return self._frames[k]
+
+    def curvature_profile(self, n=500):
+        """Return the (T, curvatures) of the path at n evenly spaced path parameters T from 0 to 1, each an (n,)
+        array, computed once and cached (for plots, and to bracket searches along the curvature)."""
+        if n not in self._profiles:
+            T = np.linspace(0.0, 1.0, n)
+            curvatures = np.asarray(self.curvature(T))
+            for a in (T, curvatures):
+                a.flags.writeable = False
+            self._profiles[n] = (T, curvatures)
+        return self._profiles[n]
+
+    def bbox(self):
+        """Return the exact bounding box (xmin, xmax, ymin, ymax) of the path, from the end points and the roots
+        of the derivative of every segment."""
+        p0, c1, c2, p1 = self.bpoints.T
+        extrema = []
+        for part in (np.real, np.imag):
+            a0, a1, a2, a3 = part(p0), part(c1), part(c2), part(p1)
+            t = _quadratic_roots01(3 * (-a0 + 3 * a1 - 3 * a2 + a3), 6 * (a0 - 2 * a1 + a2), 3 * (a1 - a0))
+            b0, b1, b2, b3 = _bernstein(np.nan_to_num(t))
+            values = b0 * a0[:, np.newaxis] + b1 * a1[:, np.newaxis] + b2 * a2[:, np.newaxis] + b3 * a3[:, np.newaxis]
+            values = np.concatenate([a0, a3, values[~np.isnan(t)]])
+            extrema += [float(values.min()), float(values.max())]
+        return tuple(extrema)
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""
+    viol.lib.cache
+    ~~~~~~~~~~~~~~
+
+    Content addressed on-disk cache of traced and normalized scan paths.
+
+    :copyright: Copyright (c) 2021 Bit Harmony Ltd. All rights reserved. See AUTHORS.
+    :license: PROPRIETARY, see LICENSE for details.
+"""
+import os
+import json
+import hashlib
+import logging
+import tempfile
+import zipfile
+import numpy as np
+from svgpathtools import Path, CubicBezier
+
+__all__ = ['ScanCache', 'DEFAULT_CACHE_DIR', 'DEFAULT_CACHE_BYTES']
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = os.path.join('~', '.viol', 'cache')
+DEFAULT_CACHE_BYTES = 256 * 1000 * 1000
+
+# bump when the cached entry format, or the pipeline that produces the cached path, changes
+CACHE_VERSION = 2
+
+
+class ScanCache(object):
+    """A size bounded, least recently used, cache of scan results keyed by image content and scan parameters.
+
+    Each entry is a .npz file holding the (N, 4) complex array of bezier points of a path plus a small json
+    metadata dict.  Entries are written atomically, so the cache may be shared by concurrent batch workers.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_CACHE_BYTES):
+        self.cache_dir = os.path.expanduser(cache_dir)
+        self.max_bytes = max_bytes
+
+    def __repr__(self):
+        return '<{}(cache_dir={!r}, max_bytes={})>'.format(self.__class__.__name__, self.cache_dir, self.max_bytes)
+
+    def key(self, imageFile, **params):
+        """Return the cache key of an image file (path or file object), or of the list of overlapping image files
+        of a stitched scan, scanned with the given parameters."""
+        h = hashlib.sha256()
+        for image in imageFile if isinstance(imageFile, (list, tuple)) else [imageFile]:
+            if hasattr(image, 'read'):
+                pos = image.tell()
+                for chunk in iter(lambda: image.read(1 << 20), b''):
+                    h.update(chunk)
+                image.seek(pos)
+            else:
+                with open(image, 'rb') as f:
+                    for chunk in iter(lambda: f.read(1 << 20), b''):
+                        h.update(chunk)
+        h.update(json.dumps(dict(params, cache_version=CACHE_VERSION), sort_keys=True).encode())
+        return h.hexdigest()
+
+    def _file(self, key):
+        return os.path.join(self.cache_dir, key + '.npz')
+
+    def get(self, key):
+        """Return the (path, meta) of a cached entry, or None on a miss.  A hit marks the entry recently used."""
+        filename = self._file(key)
+        try:
+            with np.load(filename) as entry:
+                bpoints = entry['bpoints']
+                meta = json.loads(str(entry['meta']))
+            os.utime(filename)
+        except (OSError, KeyError, ValueError, zipfile.BadZipFile) as exc:
+            if not isinstance(exc, FileNotFoundError):
+                logger.debug('scan cache: dropping unreadable entry {} ({})'.format(filename, exc))
+                self._remove(filename)
+            return None
+
+        path = Path(*[CubicBezier(*bp) for bp in bpoints.tolist()])
+        for ix, seg in enumerate(path[:-1]):
+            seg.end = path[ix + 1].start
+        logger.debug('scan cache: hit {}'.format(key))
+        return path, meta
+
+    def put(self, key, path, meta=None):
+        """Store a path of cubic bezier segments (and a json serializable metadata dict) under key."""
+        bpoints = np.array([seg.bpoints() for seg in path], dtype=complex)
+        os.makedirs(self.cache_dir, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.savez(f, bpoints=bpoints, meta=json.dumps(meta or {}))
+            os.replace(tmp, self._file(key))
+        except BaseException:
+            self._remove(tmp)
+            raise
+        logger.debug('scan cache: stored {}'.format(key))
+        self.evict()
+
+    def evict(self):
+        """Remove the least recently used entries until the cache is within max_bytes."""
+        try:
+            entries = [e for e in os.scandir(self.cache_dir) if e.name.endswith('.npz')]
+        except FileNotFoundError:
+            return
+        stats = []
+        for e in entries:
+            try:
+                st = e.stat()
+            except FileNotFoundError:
+                continue
+            stats.append((st.st_mtime, st.st_size, e.path))
+        total = sum(size for mtime, size, path in stats)
+        for mtime, size, path in sorted(stats):
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            total -= size
+            logger.debug('scan cache: evicted {}'.format(path))
+
+    def clear(self):
+        """Remove every cache entry."""
+        max_bytes, self.max_bytes = self.max_bytes, -1
+        self.evict()
+        self.max_bytes = max_bytes
+
+    @staticmethod
+    def _remove(filename):
+        try:
+            os.remove(filename)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+"""
+    viol.lib.image
+    ~~~~~~~~~~~~~~
+
+    Scan image loading and bitmap preparation stages for the scan pipeline.
+
+    :copyright: Copyright (c) 2021 Bit Harmony Ltd. All rights reserved. See AUTHORS.
+    :license: PROPRIETARY, see LICENSE for details.
+"""
+import sys
+import logging
+from timeit import default_timer as timer
+import numpy as np
+from PIL import Image
+from scipy import ndimage
+from viol.lib.timing import add_time
+
+try:
+    import resource
+except ImportError:     # not available on Windows
+    resource = None
+
+__all__ = ['image_load', 'bitmap_roi', 'bitmap_clean', 'maxrss', 'CLEAN_RADIUS', 'CLEAN_MIN_AREA']
+
+logger = logging.getLogger(__name__)
+
+# the scan pipeline works at 100 pixels per cm (0.1mm resolution)
+PIXELS_PER_INCH = 254.0
+
+# the radius (pixels) of the disk that bitmap_clean() closes pencil line gaps and opens away specks and spurs with
+CLEAN_RADIUS = 2
+
+# the smallest ink blob (pixels, 4mm^2 at 0.1mm per pixel) that bitmap_clean() keeps
+CLEAN_MIN_AREA = 400
+
+# modes that Image.reduce() can work on directly, anything else is converted to greyscale first
+_REDUCE_MODES = ('L', 'LA', 'RGB', 'RGBA', 'RGBX', 'CMYK', 'I', 'F')
+
+
+def maxrss():
+    """Return the peak resident set size of this process in bytes (or None if unknown)."""
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+
+def image_load(imageFile, dpi=300, stats=None):
+    """Load a scanned image as a greyscale NumPy array resampled to 0.1mm per pixel.
+
+    The scan resolution `dpi` is either a number, or the (x, y) pair of a calibrated scanner.
+
+    The full resolution image is never converted or resampled as a whole.  JPEG images are decoded straight to
+    greyscale at a reduced DCT scale near the target (Image.draft), other formats are box reduced by a whole
+    factor before the greyscale conversion, and a final LANCZOS resample over the exact source box lands on the
+    target scale.  If a `stats` dict is given it is filled in with the seconds and the peak resident memory
+    (bytes) after each stage.
+    """
+    if stats is None:
+        stats = {}
+
+    t = timer()
+    img = Image.open(imageFile)
+    w, h = img.size
+    dpi_x, dpi_y = dpi if isinstance(dpi, (tuple, list)) else (dpi, dpi)
+    size = (int(w * PIXELS_PER_INCH / dpi_x), int(h * PIXELS_PER_INCH / dpi_y))
+
+    # let the decoder land near (but not below) the target size; a no-op for most formats
+    img.draft('L', size)
+    img.load()
+    stats['decode_time'] = timer() - t
+    add_time('decode', stats['decode_time'])
+    stats['decode_maxrss'] = maxrss()
+    stats['decode_size'] = img.size
+
+    # box reduce by a whole factor, leaving at least 2x for the final LANCZOS resample
+    t = timer()
+    box = (0, 0) + img.size
+    if img.mode not in _REDUCE_MODES:
+        img = img.convert(mode='L')
+    factor = int(min(img.size[0] / size[0], img.size[1] / size[1]) / 2.0)
+    if factor > 1:
+        img = img.reduce(factor)
+        box = tuple(b / factor for b in box)
+    img = img.convert(mode='L')
+    stats['reduce_time'] = timer() - t
+    add_time('reduce', stats['reduce_time'])
+    stats['reduce_maxrss'] = maxrss()
+
+    # precise resample of the exact source box to 0.1mm per pixel
+    t = timer()
+    img = img.resize(size, Image.LANCZOS, box=box)
+    gray = np.asarray(img)
+    stats['resample_time'] = timer() - t
+    add_time('resample', stats['resample_time'])
+    stats['resample_maxrss'] = maxrss()
+
+    logger.debug('image: {} {}x{} -> {}x{} (decode {:.3f}s, reduce {:.3f}s x{}, resample {:.3f}s, maxrss {})'.format(
+        imageFile, w, h, size[0], size[1], stats['decode_time'], stats['reduce_time'], max(factor, 1),
+        stats['resample_time'], stats['resample_maxrss']))
+
+    return gray
+
+
+def bitmap_roi(bitmap, margin=0):
+    """Return the (top, bottom, left, right) slice bounds of the ink in a bilevel bitmap, grown by margin pixels.
+
+    The box is found from the row and column projections of the bitmap and is clipped to the bitmap.
+    Returns None if there is no ink.
+    """
+    rows = np.flatnonzero(bitmap.any(axis=1))
+    if not len(rows):
+        return None
+    cols = np.flatnonzero(bitmap[rows[0]:rows[-1] + 1].any(axis=0))
+    h, w = bitmap.shape
+    return (int(max(rows[0] - margin, 0)), int(min(rows[-1] + 1 + margin, h)),
+            int(max(cols[0] - margin, 0)), int(min(cols[-1] + 1 + margin, w)))
+
+
+def _dilate(bitmap, radius):
+    """Return a bilevel bitmap dilated by a disk of radius pixels, as the union of its shifted slices."""
+    h, w = bitmap.shape
+    result = bitmap.copy()
+    for dy in range(-radius, radius + 1):
+        for dx in range(-radius, radius + 1):
+            if (dy or dx) and dy * dy + dx * dx <= radius * radius:
+                result[max(dy, 0):h + min(dy, 0), max(dx, 0):w + min(dx, 0)] |= \
+                    bitmap[max(-dy, 0):h + min(-dy, 0), max(-dx, 0):w + min(-dx, 0)]
+    return result
+
+
+def _erode(bitmap, radius):
+    """Return a bilevel bitmap eroded by a disk of radius pixels (the edge of the bitmap doesn't erode)."""
+    return ~_dilate(~bitmap, radius)
+
+
+def bitmap_clean(bitmap, radius=CLEAN_RADIUS, min_area=CLEAN_MIN_AREA, fill_holes=True, largest=False, stats=None):
+    """Clean up a bilevel bitmap (True for ink) so the tracer gets solid outline blobs and nothing else.
+
+    The ink is closed by a disk of `radius` pixels to bridge gaps in the pencil line, the paper enclosed by
+    each outline is filled (so the outline, and whatever is drawn inside it, becomes one blob with a single
+    contour), and the filled blobs are then opened by the same disk to strip thin spurs.  Finally connected
+    blobs smaller than min_area pixels (specks) are dropped, or if `largest` everything but the largest blob.  If a `stats`
+    dict is given it is filled in with the blobs found and kept and the seconds spent.
+    """
+    if stats is None:
+        stats = {}
+    t = timer()
+    if radius > 0:
+        bitmap = _erode(_dilate(bitmap, radius), radius)
+    labels = None
+    if fill_holes:
+        # paper not connected to the edge of the bitmap is enclosed by ink
+        paper, count = ndimage.label(~bitmap)
+        enclosed = np.ones(count + 1, dtype=bool)
+        enclosed[[0]] = False
+        enclosed[np.concatenate((paper[0], paper[-1], paper[:, 0], paper[:, -1]))] = False
+        holes = enclosed[paper]
+        bitmap = bitmap | holes
+        labels, count = ndimage.label(bitmap)
+    if radius > 0:
+        opened = _dilate(_erode(bitmap, radius), radius)
+        if labels is None:
+            bitmap = opened
+        else:
+            # only open the filled blobs, an outline left open by a wide gap is no thicker than a pencil line
+            solid = np.zeros(count + 1, dtype=bool)
+            solid[labels[holes]] = True
+            bitmap = np.where(solid[labels], opened, bitmap)
+
+    labels, count = ndimage.label(bitmap)
+    areas = np.bincount(labels.ravel(), minlength=count + 1)
+    areas[0] = 0                                                # the paper
+    keep = areas >= min_area
+    if largest and count:
+        keep = np.zeros_like(keep)
+        keep[np.argmax(areas)] = True
+    bitmap = keep[labels]
+
+    stats['clean_blobs'] = count
+    stats['clean_kept'] = int(np.count_nonzero(keep))
+    stats['clean_time'] = timer() - t
+    logger.debug('clean: kept {} of {} ink blobs ({:.3f}s)'.format(stats['clean_kept'], count, stats['clean_time']))
+    return bitmap
@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+"""
+    viol.lib.limits
+    ~~~~~~~~~~~~~~~
+
+    Deadlines, cooperative cancellation, and memory caps of a scan.
+
+    :copyright: Copyright (c) 2021 Bit Harmony Ltd. All rights reserved. See AUTHORS.
+    :license: PROPRIETARY, see LICENSE for details.
+"""
+import logging
+import signal
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import monotonic
+from viol.exceptions import ScanCancelled, ScanTimeout
+
+try:
+    import resource
+except ImportError:     # not available on Windows
+    resource = None
+
+__all__ = ['ScanLimits', 'active_limits', 'checkpoint', 'checked', 'stage_limit', 'subprocess_limits', 'hard_timeout',
+           'HARD_TIMEOUT_GRACE']
+
+logger = logging.getLogger(__name__)
+
+# seconds past the deadline of a job that hard_timeout() allows the cooperative checks before interrupting it
+HARD_TIMEOUT_GRACE = 10.0
+
+# the limits being checked, the time (monotonic) they expire, and what expires then (per thread and async task)
+_active = ContextVar('viol_limits', default=(None, None, None))
+
+
+class ScanLimits(object):
+    """The time limits and memory cap of a scan, and a flag to cancel it.
+
+    The scan as a whole must finish within `timeout` seconds (from when the limits are made), and each stage of
+    it (see viol.lib.timing) within `stage_timeout` seconds.  The trace subprocess may map at most `max_memory`
+    bytes.  None is no limit.  The limits are checked cooperatively, at the start and end of every stage and
+    between the evaluations of an optimizer (see checked()), so a scan stops at the next check after it runs
+    out of time or is cancelled, with ScanTimeout or ScanCancelled.
+
+    Limits pickled to a worker process carry the time remaining, not the cancel flag.
+    """
+
+    def __init__(self, timeout=None, stage_timeout=None, max_memory=None):
+        self.timeout = timeout
+        self.stage_timeout = stage_timeout
+        self.max_memory = max_memory
+        self.expires = None if timeout is None else monotonic() + timeout
+        self._cancel = threading.Event()
+
+    def __repr__(self):
+        return '<{}(timeout={!r}, stage_timeout={!r}, max_memory={!r})>'.format(
+            self.__class__.__name__, self.timeout, self.stage_timeout, self.max_memory)
+
+    def __getstate__(self):
+        state = dict(self.__dict__, expires=self.remaining())
+        del state['_cancel']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if self.expires is not None:
+            self.expires += monotonic()
+        self._cancel = threading.Event()
+
+    def cancel(self):
+        """Ask the scan to stop at its next check (safe to call from any thread)."""
+        self._cancel.set()
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def remaining(self):
+        """Return the seconds left to the deadline of the scan (None if there is none)."""
+        return None if self.expires is None else self.expires - monotonic()
+
+    @contextmanager
+    def active(self):
+        """Make these the limits checked by the stages run within."""
+        token = _active.set((self, self.expires, 'scan'))
+        try:
+            checkpoint()
+            yield self
+        finally:
+            _active.reset(token)
+
+
+def active_limits():
+    """Return the active ScanLimits (or None)."""
+    return _active.get()[0]
+
+
+def checkpoint():
+    """Raise ScanCancelled if the active scan has been cancelled, or ScanTimeout if it has run past the
+    deadline of the scan or of the stage it is in.  Does nothing outside any active limits."""
+    limits, expires, what = _active.get()
+    if limits is None:
+        return
+    if limits.cancelled:
+        raise ScanCancelled('scan cancelled')
+    if expires is not None and monotonic() > expires:
+        if what == 'scan':
+            raise ScanTimeout('scan ran past its {:g}s time limit'.format(limits.timeout))
+        raise ScanTimeout('{} stage ran past its {:g}s time limit'.format(what, limits.stage_timeout))
+
+
+def checked(fun):
+    """Return fun wrapped to checkpoint() before each call, if there are active limits (else fun itself)."""
+    if _active.get()[0] is None:
+        return fun
+
+    def wrapper(*args, **kwargs):
+        checkpoint()
+        return fun(*args, **kwargs)
+    return wrapper
+
+
+@contextmanager
+def stage_limit(name):
+    """Check the active limits at the start and the (successful) end of a stage, and give the stage its own
+    deadline of stage_timeout seconds (no later than that of the stage or scan it runs within)."""
+    limits, expires, what = _active.get()
+    if limits is None:
+        yield
+        return
+    checkpoint()
+    if limits.stage_timeout is not None:
+        stage_expires = monotonic() + limits.stage_timeout
+        if expires is None or stage_expires < expires:
+            expires, what = stage_expires, name
+    token = _active.set((limits, expires, what))
+    try:
+        yield
+        checkpoint()
+    finally:
+        _active.reset(token)
+
+
+def _memory_cap(nbytes):
+    """Return a Popen preexec_fn capping the address space of the child process at nbytes."""
+    def preexec():
+        resource.setrlimit(resource.RLIMIT_AS, (nbytes, nbytes))
+    return preexec
+
+
+def subprocess_limits():
+    """Return the (timeout, preexec_fn) to run a subprocess under the active limits: the seconds left to the
+    deadline, and a memory cap (None if there is no such limit)."""
+    limits, expires, what = _active.get()
+    if limits is None:
+        return None, None
+    checkpoint()
+    timeout = None if expires is None else max(expires - monotonic(), 0.0)
+    preexec = None
+    if limits.max_memory is not None:
+        if resource is None:
+            logger.debug('limits: no memory cap on this platform')
+        else:
+            preexec = _memory_cap(int(limits.max_memory))
+    return timeout, preexec
+
+
+@contextmanager
+def hard_timeout(seconds):
+    """Interrupt the code run within with ScanTimeout after `seconds`, if it hasn't returned by then.
+
+    This is the backstop for code that misses the cooperative checks.  It uses SIGALRM, so it only works in the
+    main thread of a process on a posix platform, and it does nothing elsewhere (or if seconds is None).
+    """
+    if seconds is None or not hasattr(signal, 'setitimer') or threading.current_thread() is not threading.main_thread():
+        yield
+        return
+
+    def alarm(signum, frame):
+        raise ScanTimeout('scan still running {:g}s after it started, interrupted'.format(seconds))
+
+    previous = signal.signal(signal.SIGALRM, alarm)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
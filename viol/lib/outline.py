@@ -0,0 +1,290 @@
+# -*- coding: utf-8 -*-
+"""
+    viol.lib.outline
+    ~~~~~~~~~~~~~~~~
+
+    Body outline ingest from vector drawings and point tables, skipping the raster scan and trace.
+
+    :copyright: Copyright (c) 2021 Bit Harmony Ltd. All rights reserved. See AUTHORS.
+    :license: PROPRIETARY, see LICENSE for details.
+"""
+import os
+import re
+import logging
+import xml.etree.ElementTree as ET
+from timeit import default_timer as timer
+import numpy as np
+from svgpathtools.parser import parse_transform
+from viol.exceptions import ParseError
+from viol.lib.bezier import path_bpoints, bezier_path, bezier_area, bezier_split, bezier_fit_closed, polyline_corners
+from viol.lib.trace import path_parse
+from viol.lib.timing import add_time
+
+__all__ = ['svg_outline', 'points_outline', 'outline_load', 'OUTLINE_EXTS', 'SVG_UNITS', 'POINTS_MAX_ERROR',
+           'POINTS_SEGMENT_LENGTH']
+
+logger = logging.getLogger(__name__)
+
+# mm per svg length unit (a bare number is in px, at the css 96 per inch)
+SVG_UNITS = {'mm': 1.0, 'cm': 10.0, 'in': 25.4, 'pt': 25.4 / 72.0, 'pc': 25.4 / 6.0, 'px': 25.4 / 96.0, '': 25.4 / 96.0}
+
+_SVG_NS = '{http://www.w3.org/2000/svg}'
+_SVG_MOVE = re.compile(r'[Mm]')
+_SVG_LENGTH = re.compile(r'^\s*([-+]?[0-9.]+(?:[eE][-+]?[0-9]+)?)\s*([a-z]*)\s*$')
+
+# mm the bezier fit of a point table may stray from any of its points
+POINTS_MAX_ERROR = 0.25
+
+# the longest (mm) segment of a fit point table: the segment by segment feature finding (see Bouts and Corners)
+# needs about the density of a traced outline
+POINTS_SEGMENT_LENGTH = 2.0
+
+# a point table this close (relative to its width) to one side of the centerline is a half outline
+_HALF_MARGIN = 0.01
+
+# a point table (once mirrored) whose ends are further apart than this fraction of its size is an open profile
+# (such as an arching cross section), not an outline
+_CLOSE_MARGIN = 0.1
+
+# an outline spanning all but this fraction of the width and height of the drawing is taken for a page frame
+_FRAME_MARGIN = 0.01
+
+# the largest outline spanning less than this fraction of the width or height of all the closed paths of the
+# drawing is only a detail, as when the lines of a drawing are broken (and so the body isn't a closed path)
+_MIN_SPAN = 0.6
+
+
+def _svg_length(value):
+    """Return the (number, unit) of an svg length attribute, or None if it isn't one (e.g. a percentage)."""
+    m = _SVG_LENGTH.match(value or '')
+    if m is None or m.group(2) not in SVG_UNITS:
+        return None
+    return float(m.group(1)), m.group(2)
+
+
+def _svg_scale(root):
+    """Return the mm per user unit of an svg document, or None if its units aren't physical.
+
+    potrace writes the pixels of the bitmap as pt, so the size of a potrace svg says nothing about the size of
+    the outline: it is left to be guessed, as for a scan.
+    """
+    metadata = root.find(_SVG_NS + 'metadata')
+    if metadata is not None and 'potrace' in ''.join(metadata.itertext()):
+        return None
+    width = _svg_length(root.get('width'))
+    viewbox = root.get('viewBox')
+    if viewbox is None:
+        return SVG_UNITS['px']
+    vb_width = float(re.split(r'[\s,]+', viewbox.strip())[2])
+    if width is None or vb_width <= 0:
+        return SVG_UNITS['px']
+    return width[0] * SVG_UNITS[width[1]] / vb_width
+
+
+def _svg_elements(elem, tf=np.identity(3)):
+    """Yield the (element, transform) of every <path> under elem, with the transform (a 3 x 3 affine matrix) to
+    user units accumulated from the transform attributes of the element and its ancestors."""
+    if 'transform' in elem.attrib:
+        tf = tf.dot(parse_transform(elem.get('transform')))
+    if elem.tag == _SVG_NS + 'path':
+        yield elem, tf
+    for child in elem:
+        yield from _svg_elements(child, tf)
+
+
+def _outer_d(d):
+    """Return the path data of the first sub-path (the outer contour) of svg path data, so that the holes of a
+    traced outline are not parsed only to be thrown away."""
+    d = d.strip()
+    m = _SVG_MOVE.search(d, 1)
+    return d if m is None else d[:m.start()]
+
+
+def _transformed(bpoints, tf):
+    """Apply a 3 x 3 affine matrix to an (N, 4) complex array of control points, and flip to y up."""
+    x, y = bpoints.real, bpoints.imag
+    return (tf[0, 0] * x + tf[0, 1] * y + tf[0, 2]) - 1j * (tf[1, 0] * x + tf[1, 1] * y + tf[1, 2])
+
+
+def svg_outline(svgFile, element_id=None, stats=None):
+    """Load a body outline from an svg file.
+
+    The outline is the outer contour (first sub-path) of the <path> element with the id `element_id`, or else of
+    the path enclosing the largest area of those that are closed, leaving out a page frame around the drawing.  A
+    largest path spanning less than _MIN_SPAN of the drawing is only a detail, not an outline.  Transforms are
+    applied, y is flipped up, and the outline runs counterclockwise from its first point, as traced outlines do.
+    Returns the tuple (path, attributes, svg_attributes, scale), where scale is the mm per unit of the path, or
+    None if the svg units aren't physical (see _svg_scale).  Raises ParseError if there is no such outline.
+    """
+    if stats is None:
+        stats = {}
+    t = timer()
+    try:
+        root = ET.parse(svgFile).getroot()
+    except ET.ParseError as exc:
+        raise ParseError('{}: not an svg file: {}'.format(svgFile, exc))
+    elements = list(_svg_elements(root))
+    if element_id is not None:
+        elements = [(elem, tf) for elem, tf in elements if elem.get('id') == element_id]
+        if not elements:
+            raise ParseError('{}: no <path> with id "{}"'.format(svgFile, element_id))
+
+    frame = None
+    viewbox = root.get('viewBox')
+    if viewbox is not None and element_id is None:
+        w, h = (float(v) for v in re.split(r'[\s,]+', viewbox.strip())[2:])
+        frame = ((1 - _FRAME_MARGIN) * w, (1 - _FRAME_MARGIN) * h)
+
+    best, best_area = None, 0.0
+    extent = []
+    for elem, tf in elements:
+        outer = path_parse(_outer_d(elem.get('d', '')))
+        if not len(outer) or not outer.isclosed():
+            continue
+        bpoints = _transformed(path_bpoints(outer), tf)
+        if frame is not None and np.ptp(bpoints.real) > frame[0] and np.ptp(bpoints.imag) > frame[1]:
+            continue
+        extent += [complex(bpoints.real.min(), bpoints.imag.min()), complex(bpoints.real.max(), bpoints.imag.max())]
+        area = bezier_area(bpoints)
+        if best is None or abs(area) > abs(best_area):
+            best, best_area, attributes = bpoints, area, dict(elem.attrib)
+    if best is None:
+        raise ParseError('{}: no closed outline found'.format(svgFile))
+    if element_id is None:
+        extent = np.array(extent)
+        span = (np.ptp(best.real) / np.ptp(extent.real), np.ptp(best.imag) / np.ptp(extent.imag))
+        if min(span) < _MIN_SPAN:
+            raise ParseError('{}: the largest closed path ({}) spans only {:.0%} x {:.0%} of the drawing, not a whole '
+                             'outline (are its lines broken?)'.format(svgFile, attributes.get('id', 'no id'), *span))
+
+    if best_area < 0:
+        best = best[::-1, ::-1]                                 # run counterclockwise
+    path = bezier_path(best, closed=True)
+    path.subpath_starts = (0,)
+    scale = _svg_scale(root)
+
+    stats['svg_elements'] = len(elements)
+    stats['svg_time'] = timer() - t
+    add_time('svg', stats['svg_time'])
+    logger.debug('svg: {} outline of {} segments from {} paths ({:.3f}s)'.format(
+        svgFile, len(path), len(elements), stats['svg_time']))
+    return path, attributes, dict(root.attrib), scale
+
+
+def _points_profiles(lines):
+    """Split the lines of a point table into its profiles, each a (title, rows) of the # comment line heading it
+    (or '') and its data lines."""
+    profiles = []
+    title, rows = '', []
+    for line in lines:
+        line = line.strip()
+        if line.startswith('#'):
+            if rows:
+                profiles.append((title, rows))
+            title, rows = line.lstrip('#').strip(), []
+        elif line:
+            rows.append(line)
+    if rows:
+        profiles.append((title, rows))
+    return profiles
+
+
+def _points_parse(rows):
+    """Parse the data lines of a point table (whitespace or comma separated columns) into complex (x, y) points,
+    converting all the numbers at once."""
+    ncols = len(rows[0].replace(',', ' ').split())
+    values = np.array(' '.join(rows).replace(',', ' ').split(), dtype=float)
+    if ncols < 2 or len(values) % ncols:
+        raise ValueError('expected rows of {} columns'.format(ncols))
+    values = values.reshape(-1, ncols)
+    return values[:, 0] + 1j * values[:, 1]
+
+
+def _points_mirror(pts):
+    """Return a half outline (all points on one side of the centerline x = 0) mirrored across the centerline
+    into the whole outline, or pts itself if it isn't a half outline."""
+    xmin, xmax = pts.real.min(), pts.real.max()
+    margin = _HALF_MARGIN * (xmax - xmin)
+    if xmin < -margin and xmax > margin:
+        return pts
+    other = -pts[::-1].conjugate()
+    # don't repeat the points on the centerline where the halves meet
+    if abs(other[0] - pts[-1]) <= margin:
+        other = other[1:]
+    if len(other) and abs(other[-1] - pts[0]) <= margin:
+        other = other[:-1]
+    return np.concatenate([pts, other])
+
+
+def points_outline(pointsFile, element_id=None, stats=None, max_error=POINTS_MAX_ERROR):
+    """Load a body outline from a table of (x, y) mm points, such as a digitized drawing, in a csv or .prn file.
+
+    A table of several profiles, each headed by a # comment line, gives the first profile, or the one with
+    `element_id` in its heading.  Further columns are ignored, and a half outline (all to one side of the
+    centerline, x = 0) is mirrored into the whole.  A table that doesn't then close on itself (such as an
+    arching profile) is not an outline.  The points are fit with a minimal closed cubic bezier path
+    that strays at most max_error mm from any of them, keeping the corners sharp, and running counterclockwise
+    with y up.  Its segments are then split (exactly) to at most POINTS_SEGMENT_LENGTH mm each.  Returns the
+    tuple (path, attributes, svg_attributes, scale) as svg_outline(), with a scale of 1.0 (mm).  Raises
+    ParseError if there is no such outline.
+    """
+    if stats is None:
+        stats = {}
+    t = timer()
+    with open(pointsFile, newline='') as f:
+        profiles = _points_profiles(f.read().splitlines())
+    if element_id is not None:
+        profiles = [(title, rows) for title, rows in profiles if element_id in title]
+    if not profiles:
+        raise ParseError('{}: no {}points found'.format(
+            pointsFile, '' if element_id is None else 'profile "{}" '.format(element_id)))
+    title, rows = profiles[0]
+    try:
+        pts = _points_parse(rows)
+    except ValueError as exc:
+        raise ParseError('{}: bad point table: {}'.format(pointsFile, exc))
+
+    whole = _points_mirror(pts)
+    if abs(whole[-1] - whole[0]) > _CLOSE_MARGIN * max(np.ptp(whole.real), np.ptp(whole.imag)):
+        raise ParseError('{}: {} is not an outline: its {} points run from ({:g}, {:g}) to ({:g}, {:g}) without '
+                         'closing (a half outline must start and end on the centerline x = 0)'.format(
+                             pointsFile, '"{}"'.format(title) if title else 'the table', len(pts),
+                             pts[0].real, pts[0].imag, pts[-1].real, pts[-1].imag))
+    pts = whole
+    keep = np.abs(np.diff(pts, append=pts[:1])) > 1e-9         # drop repeated points, and the closing point
+    pts = pts[keep]
+    if len(pts) < 3:
+        raise ParseError('{}: too few points for an outline'.format(pointsFile))
+    if bezier_area(np.stack([pts, pts, np.roll(pts, -1), np.roll(pts, -1)], axis=1)) < 0:
+        pts = pts[::-1]                                         # run counterclockwise
+    bpoints = path_bpoints(bezier_fit_closed(pts, max_error, corners=polyline_corners(pts, reach=1)))
+    stats['points_segments'] = len(bpoints)
+    polygon = np.sum(np.abs(np.diff(bpoints, axis=1)), axis=1)
+    bpoints = bezier_split(bpoints, np.maximum(np.ceil(polygon / POINTS_SEGMENT_LENGTH), 1))
+    path = bezier_path(bpoints, closed=True)
+    path.subpath_starts = (0,)
+
+    stats['points'] = len(pts)
+    stats['points_time'] = timer() - t
+    add_time('points', stats['points_time'])
+    logger.debug('points: {} outline of {} segments from {} points ({:.3f}s)'.format(
+        pointsFile, stats['points_segments'], len(pts), stats['points_time']))
+    return path, {'id': title}, {}, 1.0
+
+
+# outline loaders by file extension
+_LOADERS = {
+    '.svg': svg_outline,
+    '.csv': points_outline,
+    '.prn': points_outline,
+}
+OUTLINE_EXTS = tuple(_LOADERS)
+
+
+def outline_load(filename, element_id=None, stats=None):
+    """Load a body outline from a vector drawing or point table, by its extension (see OUTLINE_EXTS).  Returns
+    the tuple (path, attributes, svg_attributes, scale) as svg_outline()."""
+    ext = os.path.splitext(filename)[1].lower()
+    if ext not in _LOADERS:
+        raise ParseError('{}: not an outline file ({})'.format(filename, ', '.join(OUTLINE_EXTS)))
+    return _LOADERS[ext](filename, element_id, stats=stats)
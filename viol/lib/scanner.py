@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+"""
+    viol.lib.scanner
+    ~~~~~~~~~~~~~~~~
+
+    Scanner resolution calibration from ruler scans, and named scanner profiles.
+
+    :copyright: Copyright (c) 2021 Bit Harmony Ltd. All rights reserved. See AUTHORS.
+    :license: PROPRIETARY, see LICENSE for details.
+"""
+import os
+import json
+import logging
+import tempfile
+from datetime import datetime
+import numpy as np
+from PIL import Image
+from viol.exceptions import CalibrationError
+
+__all__ = ['ruler_dpi', 'ScannerProfiles', 'RULER_PITCH', 'DEFAULT_PROFILES_FILE']
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PROFILES_FILE = os.path.join('~', '.viol', 'scanners.json')
+
+# the finest tick spacing (mm) of a steel rule
+RULER_PITCH = 0.5
+
+# the tick pitch is searched for within this fraction of the pitch expected at the nominal resolution
+_PITCH_SEARCH = 0.15
+
+# a tick frequency peak must stand this far above the median of the search window to be believed
+_PEAK_RATIO = 10.0
+
+
+def ruler_dpi(imageFile, pitch=RULER_PITCH, dpi=300, axis=None, stats=None):
+    """Measure the true resolution of a scanner from a scan of a ruler.
+
+    The ruler ticks, `pitch` mm apart, run along the `axis` ('x' or 'y', default the long side of the image).
+    The tick frequency is the peak of the power spectrum of the image lines along the axis (summed, so the
+    ruler need not be perfectly square to the scan), searched for near the frequency expected at the nominal
+    `dpi`, and refined between frequency bins by a parabola through the log power.  Returns (axis, dpi).
+    """
+    if stats is None:
+        stats = {}
+    gray = np.asarray(Image.open(imageFile).convert(mode='L'), dtype=float)
+    if axis is None:
+        axis = 'x' if gray.shape[1] >= gray.shape[0] else 'y'
+    if axis == 'y':
+        gray = gray.T
+
+    # windowed, zero padded (8x) spectrum of each line, summed
+    lines = gray - gray.mean(axis=1, keepdims=True)
+    n = lines.shape[1]
+    nfft = 8 * n
+    power = np.sum(np.abs(np.fft.rfft(lines * np.hanning(n), nfft, axis=1)) ** 2, axis=0)
+    freq = np.fft.rfftfreq(nfft)
+
+    expected = 25.4 / (pitch * dpi)                             # ticks per pixel
+    window = np.flatnonzero((freq > expected * (1.0 - _PITCH_SEARCH)) & (freq < expected * (1.0 + _PITCH_SEARCH)))
+    if len(window) < 3:
+        raise CalibrationError('{}: too short to measure a {}mm pitch along {}'.format(imageFile, pitch, axis))
+    ix = window[np.argmax(power[window])]
+    median = np.median(power[window])
+    stats['peak_ratio'] = power[ix] / median if median > 0 else (np.inf if power[ix] > 0 else 0.0)
+    if stats['peak_ratio'] < _PEAK_RATIO or ix in (window[0], window[-1]):
+        raise CalibrationError('{}: no {}mm ruler ticks found along {} near {} dpi'.format(imageFile, pitch, axis, dpi))
+
+    y0, y1, y2 = np.log(power[ix - 1:ix + 2])
+    ticks = (ix + 0.5 * (y0 - y2) / (y0 - 2.0 * y1 + y2)) / nfft
+    measured = 25.4 / (pitch * ticks)
+    stats['pitch_pixels'] = 1.0 / ticks
+    logger.debug('{}: {} axis {:.4f} pixels per {}mm tick, {:.3f} dpi (peak ratio {:.0f})'.format(
+        imageFile, axis, stats['pitch_pixels'], pitch, measured, stats['peak_ratio']))
+    return axis, measured
+
+
+class ScannerProfiles(object):
+    """Named scanner profiles (the calibrated X and Y resolution of each scanner), kept in a json file."""
+
+    def __init__(self, filename=DEFAULT_PROFILES_FILE):
+        self.filename = os.path.expanduser(filename)
+
+    def __repr__(self):
+        return '<{}(filename={!r})>'.format(self.__class__.__name__, self.filename)
+
+    def load(self):
+        """Return the dict of all profiles by name."""
+        try:
+            with open(self.filename) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def get(self, name):
+        """Return the profile dict of a named scanner, or None."""
+        return self.load().get(name)
+
+    def put(self, name, dpi_x, dpi_y, **meta):
+        """Store (or replace) the profile of a named scanner.  Returns the profile dict."""
+        profile = dict(meta, dpi_x=dpi_x, dpi_y=dpi_y, calibrated=datetime.now().isoformat(timespec='seconds'))
+        profiles = self.load()
+        profiles[name] = profile
+        self._save(profiles)
+        return profile
+
+    def remove(self, name):
+        """Remove the profile of a named scanner.  Returns False if there was none."""
+        profiles = self.load()
+        if profiles.pop(name, None) is None:
+            return False
+        self._save(profiles)
+        return True
+
+    def _save(self, profiles):
+        directory = os.path.dirname(self.filename)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(profiles, f, indent=2, sort_keys=True)
+            os.replace(tmp, self.filename)
+        except BaseException:
+            os.remove(tmp)
+            raise
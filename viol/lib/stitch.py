@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+"""
+    viol.lib.stitch
+    ~~~~~~~~~~~~~~~
+
+    Register and blend overlapping scans of an outline too big for the scanner bed into one image.
+
+    :copyright: Copyright (c) 2021 Bit Harmony Ltd. All rights reserved. See AUTHORS.
+    :license: PROPRIETARY, see LICENSE for details.
+"""
+import logging
+from timeit import default_timer as timer
+import numpy as np
+from viol.exceptions import StitchError
+from viol.lib.image import image_load
+from viol.lib.timing import add_time
+
+__all__ = ['phase_correlate', 'normalized_correlate', 'stitch_offset', 'stitch_images', 'stitch_load',
+           'STITCH_FACTOR', 'STITCH_STRIP', 'STITCH_MIN_OVERLAP']
+
+logger = logging.getLogger(__name__)
+
+# the coarse registration works on copies block reduced by this factor
+STITCH_FACTOR = 8
+
+# rows of the stitched image composited at a time
+STITCH_STRIP = 256
+
+# the least overlap (pixels at 0.1mm) searched for, in both directions
+STITCH_MIN_OVERLAP = 40
+
+# the full resolution phase correlation peak must stand this far above the rms of the surface to be believed
+_PEAK_SNR = 50.0
+
+# the number of coarse candidate offsets checked at full resolution
+_CANDIDATES = 8
+
+
+def _reduce(image, factor):
+    """Return the block mean of an image over factor x factor pixels (the ragged edge is dropped)."""
+    h, w = image.shape[0] // factor, image.shape[1] // factor
+    return image[:h * factor, :w * factor].reshape(h, factor, w, factor).mean(axis=(1, 3), dtype=np.float32)
+
+
+def _ink(image):
+    """Return an image as float ink density over the paper (the median grey), ready to correlate.
+
+    Paper is near 0, like the zero padding of the correlation, so the edges of the scans don't correlate.
+    """
+    image = np.asarray(image, dtype=np.float64)
+    return np.maximum(np.median(image) - image, 0.0)
+
+
+def _shifts(n, na):
+    """Return the shift of each index of an (unwrapped) correlation axis of length n, for an image of length na."""
+    i = np.arange(n)
+    return np.where(i > na - 1, i - n, i)
+
+
+def _local_peaks(surface, count):
+    """Return the flat indices of the `count` highest local maxima (over the wrapped 3 x 3 neighbourhood)."""
+    local = np.ones(surface.shape, dtype=bool)
+    for sy in (-1, 0, 1):
+        for sx in (-1, 0, 1):
+            if sy or sx:
+                local &= surface >= np.roll(surface, (sy, sx), axis=(0, 1))
+    found = np.flatnonzero(local)
+    return found[np.argsort(surface.ravel()[found])[::-1][:count]]
+
+
+def phase_correlate(a, b):
+    """Return the (dy, dx, snr) shift that best registers image b onto image a, of the same shape, so that
+    a[y, x] ~ b[y - dy, x - dx].
+
+    The normalized cross power spectrum of the two images is transformed back to a correlation surface whose
+    peak is the shift, wrapped to within half the shape.  The snr is the height of the peak over the rms of
+    the surface.
+    """
+    cross = np.fft.rfft2(a) * np.conj(np.fft.rfft2(b))
+    cross /= np.maximum(np.abs(cross), 1e-9)
+    surface = np.fft.irfft2(cross, a.shape)
+    iy, ix = np.unravel_index(np.argmax(surface), surface.shape)
+    rms = np.sqrt(np.mean(surface ** 2))
+    dy = iy - a.shape[0] if iy > a.shape[0] // 2 else iy
+    dx = ix - a.shape[1] if ix > a.shape[1] // 2 else ix
+    return int(dy), int(dx), float(surface[iy, ix] / rms) if rms > 0 else 0.0
+
+
+def normalized_correlate(a, b, min_overlap=1, peaks=1):
+    """Return the list of the `peaks` best (dy, dx, ncc) shifts of image b over image a, so a[y, x] ~ b[y - dy,
+    x - dx], by the normalized cross correlation of the two images over their overlap.
+
+    Every shift overlapping by at least min_overlap rows and columns is scored at once: the sums over the
+    overlap of each image, its square, and their product are all correlations with the other image or its
+    footprint, found by FFT (zero padded to the sum of the shapes, so without wrap around).
+    """
+    shape = (a.shape[0] + b.shape[0], a.shape[1] + b.shape[1])
+    fa, fb = np.fft.rfft2(a, shape), np.conj(np.fft.rfft2(b, shape))
+    ma, mb = np.fft.rfft2(np.ones(a.shape), shape), np.conj(np.fft.rfft2(np.ones(b.shape), shape))
+    fa2, fb2 = np.fft.rfft2(a * a, shape), np.conj(np.fft.rfft2(b * b, shape))
+    n = np.maximum(np.rint(np.fft.irfft2(ma * mb, shape)), 1.0)
+    sa, sb = np.fft.irfft2(fa * mb, shape), np.fft.irfft2(ma * fb, shape)
+    sab = np.fft.irfft2(fa * fb, shape)
+    var = np.maximum(np.fft.irfft2(fa2 * mb, shape) - sa * sa / n, 0.0) * \
+        np.maximum(np.fft.irfft2(ma * fb2, shape) - sb * sb / n, 0.0)
+
+    dy, dx = _shifts(shape[0], a.shape[0]), _shifts(shape[1], a.shape[1])
+    rows = np.minimum(a.shape[0], dy + b.shape[0]) - np.maximum(dy, 0)
+    cols = np.minimum(a.shape[1], dx + b.shape[1]) - np.maximum(dx, 0)
+    valid = np.outer(rows >= min_overlap, cols >= min_overlap) & (var > 1e-12 * var.max())
+    ncc = np.full(shape, -1.0)
+    ncc[valid] = (sab[valid] - sa[valid] * sb[valid] / n[valid]) / np.sqrt(var[valid])
+
+    return [(int(dy[iy]), int(dx[ix]), float(ncc[iy, ix]))
+            for iy, ix in zip(*np.unravel_index(_local_peaks(ncc, peaks), shape)) if ncc[iy, ix] > 0]
+
+
+def stitch_offset(a, b, factor=STITCH_FACTOR, min_overlap=STITCH_MIN_OVERLAP, stats=None):
+    """Return the (row, column) position of greyscale image b on greyscale image a, where the two overlap.
+
+    Candidate offsets are the best few of the normalized cross correlation of copies of both images block
+    reduced by `factor` (see normalized_correlate).  Each is refined by phase correlation of the overlapping
+    regions at full resolution, and the candidate with the clearest full resolution peak is the offset.  Raises
+    StitchError if no candidate refines to a clear peak.
+    """
+    if stats is None:
+        stats = {}
+    (ha, wa), (hb, wb) = a.shape, b.shape
+
+    # coarse: every shift of the reduced b over the reduced a
+    candidates = normalized_correlate(_ink(_reduce(a, factor)), _ink(_reduce(b, factor)),
+                                      max(min_overlap // factor, 2), peaks=_CANDIDATES)
+
+    # fine: the overlapping regions at full resolution, within a reduced pixel or so of each candidate
+    best = None
+    for dy, dx, ncc in candidates:
+        dy, dx = dy * factor, dx * factor
+        top, bottom = max(dy, 0), min(ha, dy + hb)
+        left, right = max(dx, 0), min(wa, dx + wb)
+        fy, fx, snr = phase_correlate(_ink(a[top:bottom, left:right]),
+                                      _ink(b[top - dy:bottom - dy, left - dx:right - dx]))
+        if abs(fy) > 2 * factor or abs(fx) > 2 * factor:
+            continue
+        if best is None or snr > best[2]:
+            best = (dy + fy, dx + fx, snr, ncc)
+
+    if best is None or best[2] < _PEAK_SNR:
+        raise StitchError('no overlap found between the scans{}'.format(
+            ' (best peak snr {:.1f})'.format(best[2]) if best else ''))
+    stats['stitch_snr'], stats['stitch_ncc'] = best[2:]
+    return best[:2]
+
+
+def _feather(n):
+    """Return the blend weights across n pixels of an image, rising linearly from each edge."""
+    ramp = np.arange(1, n + 1, dtype=np.float32)
+    return np.minimum(ramp, ramp[::-1])
+
+
+def stitch_images(images, factor=STITCH_FACTOR, strip=STITCH_STRIP, stats=None):
+    """Stitch a list of overlapping greyscale scans (uint8 arrays at the same resolution) into one image.
+
+    Each image is registered against the one before it (see stitch_offset), so the scans must be given in
+    an order where each overlaps the last.  The images are then feather blended, each pixel weighted by its
+    distance from the edge of its own scan so the seams fade out, and composited `strip` rows at a time so
+    only the output image and one strip of accumulators are held in memory.  Paper not covered by any scan is
+    white.  Returns the stitched uint8 image.
+    """
+    if stats is None:
+        stats = {}
+    if not images:
+        raise StitchError('no scans to stitch')
+
+    t = timer()
+    offsets = [(0, 0)]
+    for prev, image in zip(images, images[1:]):
+        dy, dx = stitch_offset(prev, image, factor, stats=stats)
+        offsets.append((offsets[-1][0] + dy, offsets[-1][1] + dx))
+    top = min(y for y, x in offsets)
+    left = min(x for y, x in offsets)
+    offsets = [(y - top, x - left) for y, x in offsets]
+    height = max(y + image.shape[0] for (y, x), image in zip(offsets, images))
+    width = max(x + image.shape[1] for (y, x), image in zip(offsets, images))
+    stats['stitch_offsets'] = offsets
+    stats['stitch_register_time'] = timer() - t
+    add_time('register', stats['stitch_register_time'])
+
+    t = timer()
+    feathers = [(_feather(image.shape[0]), _feather(image.shape[1])) for image in images]
+    stitched = np.empty((height, width), dtype=np.uint8)
+    for y0 in range(0, height, strip):
+        y1 = min(y0 + strip, height)
+        total = np.zeros((y1 - y0, width), dtype=np.float32)
+        weight = np.zeros((y1 - y0, width), dtype=np.float32)
+        for (y, x), image, (wy, wx) in zip(offsets, images, feathers):
+            a, b = max(y0, y), min(y1, y + image.shape[0])
+            if a >= b:
+                continue
+            w = np.minimum.outer(wy[a - y:b - y], wx)
+            total[a - y0:b - y0, x:x + image.shape[1]] += w * image[a - y:b - y]
+            weight[a - y0:b - y0, x:x + image.shape[1]] += w
+        covered = weight > 0
+        total[covered] /= weight[covered]
+        total[~covered] = 255.0
+        stitched[y0:y1] = np.rint(total)
+    stats['stitch_blend_time'] = timer() - t
+    add_time('blend', stats['stitch_blend_time'])
+
+    logger.debug('stitch: {} scans at {} -> {}x{} (register {:.3f}s, blend {:.3f}s)'.format(
+        len(images), offsets, width, height, stats['stitch_register_time'], stats['stitch_blend_time']))
+    return stitched
+
+
+def stitch_load(imageFiles, dpi=300, stats=None):
+    """Load a list of overlapping scans (see image_load) and stitch them into one greyscale image at 0.1mm per
+    pixel (see stitch_images)."""
+    if stats is None:
+        stats = {}
+    images = [image_load(imageFile, dpi, stats=stats) for imageFile in imageFiles]
+    return stitch_images(images, stats=stats)
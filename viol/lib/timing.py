@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+"""
+    viol.lib.timing
+    ~~~~~~~~~~~~~~~
+
+    A registry of stage timers and counters, to see where the time of a scan goes.
+
+    :copyright: Copyright (c) 2021 Bit Harmony Ltd. All rights reserved. See AUTHORS.
+    :license: PROPRIETARY, see LICENSE for details.
+"""
+import logging
+import functools
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from timeit import default_timer as timer
+from viol.lib.limits import stage_limit
+
+__all__ = ['Timings', 'timed', 'timed_method', 'add_time', 'add_count']
+
+logger = logging.getLogger(__name__)
+
+# the registry being timed into, and the name prefix of the stage being timed (per thread and async task)
+_active = ContextVar('viol_timings', default=(None, ''))
+
+
+@contextmanager
+def _stage(timings, name):
+    """Time a stage of the registry, and make it the active stage while it runs.  The stage boundaries are
+    also where the active limits of a scan are checked (see viol.lib.limits)."""
+    entry = timings.stages.setdefault(name, [0, 0.0])          # listed in the order the stages start
+    token = _active.set((timings, name + '.'))
+    t = timer()
+    try:
+        with stage_limit(name):
+            yield timings
+    finally:
+        entry[0] += 1
+        entry[1] += timer() - t
+        _active.reset(token)
+
+
+def _stage_tree(names):
+    """Return the (name, depth, label) of dotted stage names in tree order: each stage right under its parent
+    (the nearest of its prefixes that is a stage itself), and the stages under one parent in the order given.
+    The label is the name relative to the parent."""
+    names = list(names)
+    known = set(names)
+    children = {}
+    for name in names:
+        parent = name
+        while '.' in parent:
+            parent = parent.rsplit('.', 1)[0]
+            if parent in known:
+                break
+        else:
+            parent = ''
+        children.setdefault(parent, []).append(name)
+
+    tree = []
+
+    def walk(parent, depth):
+        for name in children.get(parent, []):
+            tree.append((name, depth, name[len(parent) + 1:] if parent else name))
+            walk(name, depth + 1)
+    walk('', 0)
+    return tree
+
+
+class Timings(object):
+    """Named stage timers (calls and seconds) and counters of a scan.
+
+    A stage is timed by the timer() context manager, which also makes the registry active, so that the
+    library functions the stage calls can time their own sub-stages with timed(), add_time(), and add_count()
+    without the registry being passed down to them.  A sub-stage is named after the stage it runs in, e.g.
+    'trace.potrace', and so is a counter, e.g. 'trace.potrace.bytes_in'.  Outside any active registry those
+    functions do nothing.
+    """
+
+    def __init__(self):
+        self.stages = {}
+        self.counters = {}
+
+    def __repr__(self):
+        return '<{}(stages={}, counters={})>'.format(self.__class__.__name__, len(self.stages), len(self.counters))
+
+    def timer(self, name):
+        """Return a context manager timing the named stage (within the active stage, if this registry is the
+        active one)."""
+        timings, prefix = _active.get()
+        return _stage(self, (prefix if timings is self else '') + name)
+
+    @contextmanager
+    def active(self):
+        """Make this registry the active one, at the top level, without timing a stage."""
+        token = _active.set((self, ''))
+        try:
+            yield self
+        finally:
+            _active.reset(token)
+
+    def add(self, name, seconds, calls=1):
+        """Add a time measured elsewhere to a stage."""
+        entry = self.stages.setdefault(name, [0, 0.0])
+        entry[0] += calls
+        entry[1] += seconds
+
+    def count(self, name, n=1):
+        """Add n to a counter."""
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def merge(self, other):
+        """Add the stage times and counters of another registry (e.g. of a worker process) to this one."""
+        for name, (calls, seconds) in other.stages.items():
+            self.add(name, seconds, calls)
+        for name, n in other.counters.items():
+            self.count(name, n)
+        return self
+
+    def seconds(self, name):
+        """Return the total seconds of a stage (0.0 if it never ran)."""
+        return self.stages.get(name, (0, 0.0))[1]
+
+    def to_dict(self):
+        """Return the stages as {name: {'calls', 'seconds'}} and the counters as {name: n}."""
+        return dict(stages={name: dict(calls=calls, seconds=seconds) for name, (calls, seconds) in self.stages.items()},
+                    counters=dict(self.counters))
+
+    def report(self):
+        """Return a printable table of the stages, each indented under the stage it ran in (whatever order the
+        stages were added in, e.g. by merge()), and the counters."""
+        width = max([len(name) for name in self.counters] + [30])
+        lines = ['{:<{w}} {:>8} {:>10}'.format('stage', 'calls', 'seconds', w=width)]
+        for name, depth, label in _stage_tree(self.stages):
+            calls, seconds = self.stages[name]
+            lines.append('{:<{w}} {:>8} {:>10.3f}'.format('  ' * depth + label, calls, seconds, w=width))
+        if self.counters:
+            lines.append('')
+            lines.append('{:<{w}} {:>19}'.format('counter', 'count', w=width))
+            for name, n in self.counters.items():
+                lines.append('{:<{w}} {:>19}'.format(name, n, w=width))
+        return '\n'.join(lines)
+
+
+def timed(name):
+    """Return a context manager timing the named sub-stage of the active stage (or nothing, if none)."""
+    timings, prefix = _active.get()
+    if timings is None:
+        return nullcontext()
+    return _stage(timings, prefix + name)
+
+
+def add_time(name, seconds):
+    """Add a time measured elsewhere to the named sub-stage of the active stage (if any)."""
+    timings, prefix = _active.get()
+    if timings is not None:
+        timings.add(prefix + name, seconds)
+
+
+def add_count(name, n=1):
+    """Add n to the named counter of the active stage (if any)."""
+    timings, prefix = _active.get()
+    if timings is not None:
+        timings.count(prefix + name, n)
+
+
+def timed_method(name):
+    """Decorate a method to time each call as the named stage of the object's `timings` registry (one is made
+    for an object without, e.g. one restored from an older json file)."""
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            timings = getattr(self, 'timings', None)
+            if timings is None:
+                timings = self.timings = Timings()
+            with timings.timer(name):
+                return method(self, *args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,598 @@
+# -*- coding: utf-8 -*-
+"""
+    viol.lib.trace
+    ~~~~~~~~~~~~~~
+
+    Bitmap to bezier path tracing stages for the scan pipeline.
+
+    :copyright: Copyright (c) 2021 Bit Harmony Ltd. All rights reserved. See AUTHORS.
+    :license: PROPRIETARY, see LICENSE for details.
+"""
+import os
+import re
+import signal
+import asyncio
+import logging
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from itertools import repeat
+from contextlib import nullcontext
+from subprocess import Popen, PIPE, TimeoutExpired
+from timeit import default_timer as timer
+import numpy as np
+from svgpathtools import Path, CubicBezier, parse_path
+from viol.exceptions import SubprocessError, ScanTimeout
+from viol.lib.bezier import bezier_fit_closed, polyline_corners, path_bpoints, bezier_area
+from viol.lib.image import bitmap_roi, bitmap_clean
+from viol.lib.timing import add_time, add_count
+from viol.lib.limits import active_limits, subprocess_limits
+from viol.lib.aio import run_in_executor
+
+__all__ = ['TRACERS', 'THRESHOLDS', 'ROI_MARGIN', 'tracer_version', 'trace_bitmap', 'trace_bitmap_async', 'potrace_trace',
+           'potrace_trace_async', 'native_trace', 'svg_parse', 'path_parse', 'path_outer', 'closed_outlines',
+           'threshold_auto']
+
+logger = logging.getLogger(__name__)
+
+_SVG_PATH_TAG = '{http://www.w3.org/2000/svg}path'
+_SVG_MOVE = re.compile(r'(?=[Mm])')
+
+# bump when a change to the native tracer alters its output
+NATIVE_VERSION = '1.1'
+
+
+def potrace_trace(bitmap, despeckle=10, stats=None):
+    """Trace a bilevel bitmap with potrace and return the svg paths.
+
+    The bitmap is a 2D boolean NumPy array that is True for ink.  It is piped to potrace as a packed (1 bit per
+    pixel) PBM and the svg that comes back is parsed straight from the stdout buffer, so nothing touches the
+    disk.  Returns the tuple (paths, attributes, svg_attributes) in the manner of svgpathtools.svg2paths2().
+    If a `stats` dict is given it is filled in with the bytes moved and the seconds spent in each step.
+
+    Under active scan limits (see viol.lib.limits) potrace is killed with ScanTimeout at the deadline, and its
+    address space is capped at the memory limit (it then fails with a SubprocessError).
+    """
+    if stats is None:
+        stats = {}
+    pbm = _potrace_pack(bitmap, stats)
+
+    # execute potrace as a subprocess filter stdin to stdout
+    t = timer()
+    cmd = _potrace_cmd(despeckle)
+    timeout, preexec = subprocess_limits()
+    try:
+        p = Popen(cmd, stdin=PIPE, stdout=PIPE, stderr=PIPE, preexec_fn=preexec)
+    except OSError as exc:
+        raise SubprocessError('Command "{}" could not be run: {}'.format(' '.join(cmd), exc))
+    with p:
+        try:
+            svg, err = p.communicate(input=pbm, timeout=timeout)
+        except TimeoutExpired:
+            p.kill()
+            raise ScanTimeout('Command "{}" killed after {:.1f}s, at the scan time limit'.format(' '.join(cmd), timeout))
+    _potrace_check(cmd, p.returncode, svg, err, t, stats)
+    return _potrace_parse(svg, stats)
+
+
+async def potrace_trace_async(bitmap, despeckle=10, stats=None, executor=None):
+    """The asyncio version of potrace_trace(): potrace runs as an asyncio subprocess, so the event loop is free
+    while it traces, and the svg is parsed in the (thread pool) executor."""
+    if stats is None:
+        stats = {}
+    pbm = _potrace_pack(bitmap, stats)
+
+    t = timer()
+    cmd = _potrace_cmd(despeckle)
+    timeout, preexec = subprocess_limits()
+    try:
+        # in a session of its own, so it can be killed along with anything it starts that holds the pipes open
+        p = await asyncio.create_subprocess_exec(*cmd, stdin=PIPE, stdout=PIPE, stderr=PIPE, preexec_fn=preexec,
+                                                 start_new_session=True)
+    except OSError as exc:
+        raise SubprocessError('Command "{}" could not be run: {}'.format(' '.join(cmd), exc))
+    try:
+        svg, err = await asyncio.wait_for(p.communicate(pbm), timeout)
+    except asyncio.TimeoutError:
+        raise ScanTimeout('Command "{}" killed after {:.1f}s, at the scan time limit'.format(' '.join(cmd), timeout))
+    finally:
+        # also when the awaiting task is cancelled, so potrace is never left running
+        if p.returncode is None:
+            if hasattr(os, 'killpg'):
+                os.killpg(p.pid, signal.SIGKILL)
+            else:
+                p.kill()
+            await p.wait()
+    _potrace_check(cmd, p.returncode, svg, err, t, stats)
+    return await run_in_executor(executor, _potrace_parse, svg, stats)
+
+
+def _potrace_cmd(despeckle):
+    return ['potrace', '-s', '-t', str(despeckle), '-o', '-', '-']
+
+
+def _potrace_pack(bitmap, stats):
+    """Pack the bitmap as a binary PBM (P4), potrace's native input format (1 is black, rows byte padded)."""
+    t = timer()
+    h, w = bitmap.shape
+    pbm = 'P4\n{} {}\n'.format(w, h).encode() + np.packbits(bitmap, axis=1).tobytes()
+    stats['pack_time'] = timer() - t
+    stats['pack_bytes'] = len(pbm)
+    add_time('pack', stats['pack_time'])
+    add_count('bytes_in', stats['pack_bytes'])
+    return pbm
+
+
+def _potrace_check(cmd, returncode, svg, err, t, stats):
+    """Raise SubprocessError if potrace failed, else record the trace, started at time t."""
+    if returncode:
+        raise SubprocessError('Command "{}" failed with error code {}: {}'.format(
+            ' '.join(cmd), returncode, err.decode(errors='replace').strip()))
+    stats['trace_time'] = timer() - t
+    stats['svg_bytes'] = len(svg)
+    add_time('potrace', stats['trace_time'])
+    add_count('bytes_out', stats['svg_bytes'])
+
+
+def _potrace_parse(svg, stats):
+    """Parse the potrace svg buffer to extract the cubic bezier curve paths."""
+    t = timer()
+    paths, attributes, svg_attributes = svg_parse(svg)
+    stats['parse_time'] = timer() - t
+    stats['paths'] = len(paths)
+    add_time('parse', stats['parse_time'])
+    add_count('paths', stats['paths'])
+
+    logger.debug('potrace: piped {} bytes in, {} bytes out, {} paths (pack {:.3f}s, trace {:.3f}s, parse {:.3f}s)'.format(
+        stats['pack_bytes'], stats['svg_bytes'], stats['paths'],
+        stats['pack_time'], stats['trace_time'], stats['parse_time']))
+
+    return paths, attributes, svg_attributes
+
+
+def svg_parse(svg):
+    """Parse the <path> elements of an svg document held in a bytes (or str) buffer.
+
+    Returns the tuple (paths, attributes, svg_attributes) in the manner of svgpathtools.svg2paths2().
+    Transforms are not applied, as is the case with svg2paths2().
+    """
+    root = ET.fromstring(svg)
+    attributes = [dict(elem.attrib) for elem in root.iter(_SVG_PATH_TAG)]
+    paths = [path_parse(attr.get('d', '')) for attr in attributes]
+    return paths, attributes, dict(root.attrib)
+
+
+def path_parse(d):
+    """Parse svg path data like svgpathtools.parse_path(), keeping the segment index at which each sub-path
+    (each M or m move) starts as the tuple path.subpath_starts."""
+    path = Path()
+    starts = []
+    pos = 0j
+    for chunk in _SVG_MOVE.split(d):
+        if not chunk.strip():
+            continue
+        sub = parse_path(chunk, current_pos=pos)
+        if len(sub):
+            starts.append(len(path))
+            path.extend(sub)
+            pos = sub.end
+    path.subpath_starts = tuple(starts)
+    return path
+
+
+def path_outer(path):
+    """Return the first sub-path (for a traced path, the outer contour) of a path as a new Path.
+
+    Sub-path boundaries are read from path.subpath_starts when the tracer recorded them.  Otherwise the outer
+    contour is taken to end at the first segment end point that returns to the start of the path (or failing
+    that, the nearest one beyond the first tenth of the segments), found with a vectorized distance query over
+    all the segment end points.
+    """
+    starts = getattr(path, 'subpath_starts', None)
+    if starts is not None:
+        end = starts[1] if len(starts) > 1 else len(path)
+    else:
+        d = np.abs(np.array([seg.end for seg in path]) - path.start)
+        close = np.flatnonzero(d <= 1.0e-9 * max(1.0, abs(path.start)))
+        skip = len(path) // 10
+        end = int(close[0] if len(close) else skip + np.argmin(d[skip:])) + 1
+    outer = Path(*path[:end])
+    outer.subpath_starts = (0,)
+    return outer
+
+
+def path_translated(path, offset):
+    """Return path.translated(offset), keeping the sub-path boundaries."""
+    shifted = path.translated(offset)
+    if hasattr(path, 'subpath_starts'):
+        shifted.subpath_starts = path.subpath_starts
+    return shifted
+
+
+# Marching squares segment table.  A cell is the 2x2 block of pixels (a b / d c) and its case index is
+# a*8 + b*4 + c*2 + d*1 for ink pixels.  Each entry lists (from edge, to edge) so that ink is always on the
+# left, which makes outer contours counterclockwise as seen on the page.  The saddle cases 5 and 10 join
+# diagonal ink pixels (8-connected ink).
+_T, _R, _B, _L = range(4)
+_MS_CASES = {
+    1: [(_B, _L)], 2: [(_R, _B)], 3: [(_R, _L)], 4: [(_T, _R)], 5: [(_T, _L), (_B, _R)],
+    6: [(_T, _B)], 7: [(_T, _L)], 8: [(_L, _T)], 9: [(_B, _T)], 10: [(_R, _T), (_L, _B)],
+    11: [(_R, _T)], 12: [(_L, _R)], 13: [(_B, _R)], 14: [(_L, _B)],
+}
+
+
+def _ms_edges(bitmap):
+    """Vectorized marching squares over a boolean bitmap.
+
+    Returns the start point and the successor index of every contour segment.  Points are complex numbers in
+    pixel corner coordinates (the image spans 0..w, 0..h with y down) and lie at the midpoints of the cell edges.
+    """
+    h, w = bitmap.shape
+    padded = np.zeros((h + 2, w + 2), dtype=np.uint8)
+    padded[1:-1, 1:-1] = bitmap
+    case = (padded[:-1, :-1] << 3 | padded[:-1, 1:] << 2 | padded[1:, 1:] << 1 | padded[1:, :-1])
+
+    # unique integer keys for every cell edge: horizontal edges first, then vertical edges
+    rows, cols = padded.shape
+    n_h = rows * cols
+
+    def edge_key(edge, i, j):
+        return {_T: i * cols + j, _B: (i + 1) * cols + j, _L: n_h + i * cols + j, _R: n_h + i * cols + j + 1}[edge]
+
+    def edge_point(edge, i, j):
+        # padded pixel centers are at (j + .5, i + .5), so shift back by one pixel for the unpadded image
+        x = {_T: j, _B: j, _L: j - 0.5, _R: j + 0.5}[edge]
+        y = {_T: i - 0.5, _B: i + 0.5, _L: i, _R: i}[edge]
+        return x + 1j * y
+
+    # only cells on a boundary (neither all paper nor all ink) produce segments
+    flat = case.ravel()
+    cells = np.flatnonzero((flat != 0) & (flat != 15))
+    cases = flat[cells]
+
+    starts, ends, points = [], [], []
+    for c, segs in _MS_CASES.items():
+        i, j = np.divmod(cells[cases == c], cols - 1)
+        if not len(i):
+            continue
+        for e0, e1 in segs:
+            starts.append(edge_key(e0, i, j))
+            ends.append(edge_key(e1, i, j))
+            points.append(edge_point(e0, i, j))
+
+    if not starts:
+        return np.array([], dtype=complex), np.array([], dtype=int)
+
+    starts = np.concatenate(starts)
+    ends = np.concatenate(ends)
+    points = np.concatenate(points)
+
+    # every edge key is the start of exactly one segment and the end of exactly one other
+    order = np.argsort(starts)
+    nxt = order[np.searchsorted(starts[order], ends)]
+    return points, nxt
+
+
+def _ms_loops(nxt):
+    """Split the successor array into closed loops of segment indices."""
+    nxt = nxt.tolist()
+    seen = bytearray(len(nxt))
+    loops = []
+    for s in range(len(nxt)):
+        if seen[s]:
+            continue
+        loop = []
+        ix = s
+        while not seen[ix]:
+            seen[ix] = 1
+            loop.append(ix)
+            ix = nxt[ix]
+        loops.append(loop)
+    return loops
+
+
+def _polygon_area(pts):
+    """Signed shoelace area of a closed polygon of complex points (positive is counterclockwise, y up)."""
+    return 0.5 * np.sum((np.conj(pts) * np.roll(pts, -1)).imag)
+
+
+def native_trace(bitmap, despeckle=10, stats=None, max_error=1.0):
+    """Trace a bilevel bitmap with the built in marching squares tracer and return the bezier paths.
+
+    The bitmap is a 2D boolean NumPy array that is True for ink.  Contours enclosing no more than `despeckle`
+    pixels are dropped (as potrace -t) and the rest are fit with cubic beziers to within `max_error` pixels.
+    The result mimics potrace svg output: one path per ink blob holding the outer contour (counterclockwise,
+    starting at its top most point) followed by its holes (clockwise), in potrace units of 1/10 pixel with y
+    up.  Returns the tuple (paths, attributes, svg_attributes) in the manner of svgpathtools.svg2paths2().
+    """
+    if stats is None:
+        stats = {}
+    h, w = bitmap.shape
+
+    t = timer()
+    points, nxt = _ms_edges(bitmap)
+    stats['contour_time'] = timer() - t
+    stats['contour_points'] = len(points)
+    add_time('contour', stats['contour_time'])
+
+    # link the segments into closed contours, flip to y up, and drop the speckles
+    t = timer()
+    outers, holes = [], []
+    for loop in _ms_loops(nxt):
+        pts = np.conj(points[loop]) + 1j * h
+        area = _polygon_area(pts)
+        if abs(area) <= despeckle:
+            continue
+        (outers if area > 0 else holes).append(pts)
+
+    # assign each hole to the smallest outer contour that contains it
+    blobs = [[pts] for pts in sorted(outers, key=lambda pts: -pts.imag.max())]
+    if holes:
+        areas = np.array([_polygon_area(blob[0]) for blob in blobs])
+        bboxes = np.array([(pts.real.min(), pts.real.max(), pts.imag.min(), pts.imag.max()) for pts, in blobs])
+        for pts in holes:
+            p = pts[0]
+            inside = np.flatnonzero((bboxes[:, 0] < p.real) & (p.real < bboxes[:, 1]) &
+                                    (bboxes[:, 2] < p.imag) & (p.imag < bboxes[:, 3]))
+            inside = [ix for ix in inside if _point_in_polygon(p, blobs[ix][0])]
+            if inside:
+                blobs[min(inside, key=lambda ix: areas[ix])].append(pts)
+    stats['link_time'] = timer() - t
+    add_time('link', stats['link_time'])
+
+    # fit each contour (starting at its top most point) with cubic beziers
+    t = timer()
+    paths = []
+    for blob in blobs:
+        path = Path()
+        starts = []
+        for pts in blob:
+            starts.append(len(path))
+            pts = np.roll(pts, -int(np.argmax(pts.imag)))
+            # fit relative to a whole pixel origin, so a translated bitmap (see trace_bitmap) traces identically
+            origin = complex(np.floor(pts[0].real), np.floor(pts[0].imag))
+            pts = _polyline_smooth(pts - origin)
+            sub = bezier_fit_closed(10 * pts, 10 * max_error, corners=polyline_corners(pts))
+            # potrace writes whole units, which keeps the segment end points exact under evaluation
+            path.extend(CubicBezier(*[complex(round(p.real), round(p.imag)) + 10 * origin for p in seg.bpoints()])
+                        for seg in sub)
+        path.subpath_starts = tuple(starts)
+        paths.append(path)
+    stats['fit_time'] = timer() - t
+    stats['paths'] = len(paths)
+    add_time('fit', stats['fit_time'])
+    add_count('paths', stats['paths'])
+
+    logger.debug('native: {} contour points, {} paths (contour {:.3f}s, link {:.3f}s, fit {:.3f}s)'.format(
+        stats['contour_points'], stats['paths'], stats['contour_time'], stats['link_time'], stats['fit_time']))
+
+    svg_attributes = {'width': '{}pt'.format(w), 'height': '{}pt'.format(h), 'viewBox': '0 0 {} {}'.format(w, h)}
+    return paths, [{} for path in paths], svg_attributes
+
+
+def _polyline_smooth(pts):
+    """Knock the staircase off a closed marching squares contour with a [1 2 1] filter."""
+    if len(pts) < 8:
+        return pts
+    return 0.25 * np.roll(pts, 1) + 0.5 * pts + 0.25 * np.roll(pts, -1)
+
+
+def _point_in_polygon(p, pts):
+    """Even-odd ray casting test of the complex point p against a closed polygon of complex points."""
+    x0, y0 = pts.real, pts.imag
+    x1, y1 = np.roll(x0, -1), np.roll(y0, -1)
+    crosses = (y0 > p.imag) != (y1 > p.imag)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        x = x0 + (p.imag - y0) * (x1 - x0) / (y1 - y0)
+    return bool(np.count_nonzero(crosses & (p.real < x)) % 2)
+
+
+TRACERS = {
+    'potrace': potrace_trace,
+    'native': native_trace,
+}
+
+
+# blank pixels kept around the inked region of interest, so no outline touches the edge of the cropped bitmap
+ROI_MARGIN = 8
+
+
+def trace_bitmap(bitmap, despeckle=10, tracer='potrace', margin=ROI_MARGIN, stats=None):
+    """Trace only the inked region of interest of a bilevel bitmap.
+
+    The bitmap is cropped to the bounding box of its ink (grown by margin pixels) before it is handed to the
+    tracer, and the traced paths are shifted back to the coordinates of the whole bitmap.  As the tracers work
+    in whole potrace units (1/10 pixel, y up) the shift is exact, so the geometry is that of a full trace.
+    Returns the tuple (paths, attributes, svg_attributes) of the tracer, with the svg size of the whole bitmap.
+    """
+    if stats is None:
+        stats = {}
+    roi = _roi(bitmap, margin, stats)
+    if roi is None:
+        return TRACERS[tracer](bitmap, despeckle, stats=stats)
+
+    top, bottom, left, right = roi
+    traced = TRACERS[tracer](bitmap[top:bottom, left:right], despeckle, stats=stats)
+    return _roi_shift(traced, roi, bitmap.shape)
+
+
+async def trace_bitmap_async(bitmap, despeckle=10, tracer='potrace', margin=ROI_MARGIN, stats=None, executor=None):
+    """The asyncio version of trace_bitmap(): potrace runs as an asyncio subprocess (see potrace_trace_async),
+    and the native tracer in the (thread pool) executor."""
+    if stats is None:
+        stats = {}
+    roi = _roi(bitmap, margin, stats)
+    if roi is not None:
+        top, bottom, left, right = roi
+        bitmap, shape = bitmap[top:bottom, left:right], bitmap.shape
+    if tracer == 'potrace':
+        traced = await potrace_trace_async(bitmap, despeckle, stats=stats, executor=executor)
+    else:
+        traced = await run_in_executor(executor, TRACERS[tracer], bitmap, despeckle, stats=stats)
+    return traced if roi is None else _roi_shift(traced, roi, shape)
+
+
+def _roi(bitmap, margin, stats):
+    """Return the (top, bottom, left, right) region of interest of the bitmap to trace, or None for all of it."""
+    h, w = bitmap.shape
+    t = timer()
+    roi = bitmap_roi(bitmap, margin)
+    stats['roi_time'] = timer() - t
+    stats['roi'] = roi
+    add_time('roi', stats['roi_time'])
+    return None if roi is None or roi == (0, h, 0, w) else roi
+
+
+def _roi_shift(traced, roi, shape):
+    """Shift the (paths, attributes, svg_attributes) trace of a region of interest to the whole bitmap."""
+    paths, attributes, svg_attributes = traced
+    top, bottom, left, right = roi
+    h, w = shape
+    logger.debug('roi: traced {}x{} of {}x{} pixels'.format(right - left, bottom - top, w, h))
+
+    offset = complex(10 * left, 10 * (h - bottom))
+    paths = [path_translated(path, offset) for path in paths]
+    if 'viewBox' in svg_attributes:
+        svg_attributes = dict(svg_attributes, width='{:f}pt'.format(w), height='{:f}pt'.format(h),
+                              viewBox='0 0 {:f} {:f}'.format(w, h))
+    return paths, attributes, svg_attributes
+
+
+@lru_cache(maxsize=None)
+def tracer_version(tracer):
+    """Return a version string for a tracer (used to key cached scan results)."""
+    if tracer == 'native':
+        return 'native ' + NATIVE_VERSION
+    try:
+        p = Popen([tracer, '--version'], stdout=PIPE, stderr=PIPE)
+        out = p.communicate()[0]
+    except OSError:
+        return tracer + ' unknown'
+    return out.decode(errors='replace').splitlines()[0].strip() if out else tracer + ' unknown'
+
+
+# candidate thresholds swept by threshold_auto()
+THRESHOLDS = (128, 144, 160, 176, 192, 205, 220, 235)
+
+# the working image of a threshold sweep worker process (see _sweep_init)
+_sweep_gray = None
+_sweep_limits = None
+
+
+def _sweep_init(gray, limits=None):
+    """Process pool initializer, so the image (and the limits of the scan) are shipped to each worker once
+    rather than once per task."""
+    global _sweep_gray, _sweep_limits
+    _sweep_gray = gray
+    _sweep_limits = limits
+
+
+def closed_outlines(paths, min_height=0, size=None):
+    """Return the paths whose outer contour is a closed outline at least min_height tall.
+
+    Units are potrace 1/10 pixel.  If the (width, height) of the traced bitmap in pixels is given as `size`,
+    outlines touching the bitmap border are rejected too (a threshold above the paper shade turns the whole
+    page to ink).
+    """
+    outlines = []
+    for path in paths:
+        xmin, xmax, ymin, ymax = path.bbox()
+        if ymax - ymin < min_height:
+            continue
+        if size is not None:
+            w, h = size
+            if xmin < 10 or ymin < 10 or xmax > 10 * (w - 1) or ymax > 10 * (h - 1):
+                continue
+        if not path_outer(path).isclosed():
+            continue
+        outlines.append(path)
+    return outlines
+
+
+def _sweep_bitmap(gray, threshold, clean=None):
+    """Binarize a greyscale image at threshold, cleaned up by bitmap_clean(**clean) if given."""
+    bitmap = gray < threshold
+    if clean is not None:
+        bitmap = bitmap_clean(bitmap, **clean)
+    return bitmap
+
+
+def _sweep_trace(threshold, despeckle, tracer, clean=None):
+    """Trace the worker image binarized at threshold and measure its body candidates.  Returns the threshold,
+    the (paths, attributes, svg_attributes) of the trace if it found exactly one body (else None), and the
+    (count, outline length, outline area) of the candidates.
+
+    Only a trace of one body can be chosen (short of none being found at any threshold), so the others, often
+    cluttered and many megabytes pickled, aren't shipped back to the parent just to be thrown away.
+    """
+    h, w = _sweep_gray.shape
+    bitmap = _sweep_bitmap(_sweep_gray, threshold, clean)
+    with _sweep_limits.active() if _sweep_limits is not None else nullcontext():
+        paths, attributes, svg_attributes = trace_bitmap(bitmap, despeckle, tracer)
+
+    # a body candidate is a closed outline at least a quarter of the image tall that is clear of the border
+    bodies = closed_outlines(paths, min_height=10 * h / 4.0, size=(w, h))
+    length = area = 0.0
+    for path in bodies:
+        outer = path_outer(path)
+        outer_area = abs(bezier_area(path_bpoints(outer)))
+        if outer_area > area:
+            area = outer_area
+            length = outer.length()
+    traced = (paths, attributes, svg_attributes) if len(bodies) == 1 else None
+    return threshold, traced, (len(bodies), length, area)
+
+
+def threshold_auto(gray, despeckle=10, tracer='potrace', thresholds=THRESHOLDS, jobs=None, stats=None,
+                   clean=None):
+    """Trace a greyscale image at several thresholds concurrently and keep the best result.
+
+    Each candidate threshold is binarized (and cleaned up by bitmap_clean with the `clean` dict of keyword
+    arguments, if given) and traced in a process pool of `jobs` workers (default one per cpu).  A candidate
+    scores well when it yields exactly one closed body outline, when the outline area and length barely change
+    at the neighbouring thresholds (a stable edge), and when the outline is short (not ragged with clutter).
+    The workers return the traces of single body candidates only (see _sweep_trace).
+    Returns the chosen threshold and the (paths, attributes, svg_attributes) tuple of its trace.
+    """
+    if stats is None:
+        stats = {}
+    thresholds = sorted(thresholds)
+
+    t = timer()
+    with ProcessPoolExecutor(max_workers=min(jobs or os.cpu_count() or 1, len(thresholds)),
+                             initializer=_sweep_init, initargs=(gray, active_limits())) as pool:
+        results = list(pool.map(_sweep_trace, thresholds, repeat(despeckle), repeat(tracer), repeat(clean)))
+    stats['sweep_time'] = timer() - t
+    add_time('sweep', stats['sweep_time'])
+
+    bodies = np.array([r[2][0] for r in results])
+    length = np.array([r[2][1] for r in results])
+    area = np.array([r[2][2] for r in results])
+
+    # relative change of the body outline to the neighbouring thresholds that also found a single body
+    valid = bodies == 1
+
+    def instability(v):
+        d = np.full(len(v) + 1, np.nan)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            d[1:-1] = np.where(valid[:-1] & valid[1:], np.abs(np.diff(v)) / np.maximum(v[:-1], v[1:]), np.nan)
+        pair = np.stack((d[:-1], d[1:]))
+        n = np.sum(~np.isnan(pair), axis=0)
+        return np.where(valid & (n > 0), np.nansum(pair, axis=0) / np.maximum(n, 1), 1.0)
+
+    score = instability(area) + instability(length)
+    if np.any(valid):
+        score += np.where(valid, length / length[valid].min() - 1.0, 1.0)
+    score += 10.0 * ~valid
+    best = int(np.argmin(score))
+
+    stats['threshold'] = thresholds[best]
+    stats['threshold_scores'] = dict(zip(thresholds, np.round(score, 4).tolist()))
+    logger.debug('threshold sweep {:.3f}s: scores {}, chose {}'.format(
+        stats['sweep_time'], stats['threshold_scores'], stats['threshold']))
+
+    traced = results[best][1]
+    if traced is None:
+        # no threshold found a single body, so no trace came back from the workers: trace the best one again
+        traced = trace_bitmap(_sweep_bitmap(gray, thresholds[best], clean), despeckle, tracer)
+    return thresholds[best], traced